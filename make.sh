@@ -62,6 +62,11 @@ else
     NEO_USER=""
 fi
 
+# Fusion joins properties gathered in sets, and the order of sets depends on
+# strings hashes: fix the seed so that two builds on the same data are identical
+# (whatever the number of --jobs or --shards).
+export PYTHONHASHSEED=0
+
 py_args="-O" # Optimize = remove asserts and optimize bytecode.
 weave_args="-v INFO" # Default, for having clean progress bars.
 if [[ "$3" == "debug" ]] ; then
@@ -98,6 +103,8 @@ cmd="uv run python3 ${py_args} $script_dir/weave.py
     --open-targets-drug_mechanism_of_action $data_dir/OT/drug_mechanism_of_action/
     --open-targets-target                   $data_dir/OT/target/
     --oncokb-gene-status                    $decider_dir/oncokb_gene_status_info.csv
+    --cache-dir                             $work_dir/.oncodashkb_cache
+    --incremental
     ${sub_sample}
     ${weave_args}"
 echo "Weaving command:" >&2
@@ -0,0 +1,231 @@
+""" Persistent cache of parsed input files, addressed by the content of the files.
+
+Parsing some inputs is slow (e.g. Excel sheets with openpyxl), although they
+rarely change between two builds. The first time such an input is parsed,
+the result is pickled in the cache directory, under a key made from the hash
+of the source files' content and of the parameters of the parsing.
+Later runs load the pickle instead of parsing the files again.
+
+The cache is disabled until `configure` is called with a directory.
+
+To inspect or prune the cache:
+
+    python -m oncodashkb.cache --directory DIR list
+    python -m oncodashkb.cache --directory DIR prune [--stale] [--older-than DAYS]
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import logging
+import argparse
+import tempfile
+
+# Change this when the format of the cached objects changes,
+# so that older entries are not used anymore.
+VERSION = 1
+
+directory = None
+
+# Hashes of the files already seen by this process,
+# indexed by (path, size, modification time).
+digests = {}
+
+
+def configure(cache_dir):
+    """Enable the cache in the given directory (or disable it if None)."""
+    global directory
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok = True)
+        directory = os.path.realpath(cache_dir)
+    else:
+        directory = None
+
+
+def file_digest(filename):
+    """Hash of the content of a file (or of all the files within a directory).
+
+    The hash is computed only once per process for an unchanged file.
+    """
+    path = os.path.realpath(filename)
+    if os.path.isdir(path):
+        h = hashlib.sha256()
+        for root, dirs, files in sorted(os.walk(path)):
+            dirs.sort()
+            for name in sorted(files):
+                f = os.path.join(root, name)
+                h.update(os.path.relpath(f, path).encode())
+                h.update(file_digest(f).encode())
+        return h.hexdigest()
+
+    stat = os.stat(path)
+    seen = (path, stat.st_size, stat.st_mtime_ns)
+    if seen not in digests:
+        h = hashlib.sha256()
+        with open(path, "rb") as fd:
+            for block in iter(lambda: fd.read(2**20), b""):
+                h.update(block)
+        digests[seen] = h.hexdigest()
+    return digests[seen]
+
+
+def key(kind, sources, params):
+    """Address of an entry in the cache."""
+    h = hashlib.sha256()
+    h.update(f"{VERSION}:{kind}:{params}".encode())
+    for src in sources:
+        h.update(file_digest(src).encode())
+    return h.hexdigest()
+
+
+def load(kind, sources, build, params = None, pickler = pickle.Pickler):
+    """Return `build()`, from the cache if the sources did not change.
+
+    Example:
+        .. code-block:: python
+
+            table = cache.load("excel", [filename], lambda: pd.read_excel(filename))
+
+    Args:
+        kind: a short name for what is built, shown when listing the cache.
+        sources: the files read by `build`, whose content address the entry.
+        build: a function without arguments, parsing the sources, its result must be picklable.
+        params: anything else changing the result of `build`, its repr is part of the address.
+        pickler: the pickle.Pickler (sub)class saving the result.
+    """
+    if not directory:
+        return build()
+
+    try:
+        address = key(kind, sources, repr(params))
+    except OSError as e:
+        # Let `build` complain about missing files.
+        logging.debug(f"Cannot hash {sources} for the cache: {e}")
+        return build()
+
+    data_file = os.path.join(directory, f"{address}.pickle")
+    if os.path.exists(data_file):
+        try:
+            with open(data_file, "rb") as fd:
+                obj = pickle.load(fd)
+            logging.info(f"Loaded `{kind}` from the cache for: {', '.join(str(s) for s in sources)}")
+            return obj
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            logging.warning(f"Ignoring broken cache entry `{data_file}`: {e}")
+
+    obj = build()
+    try:
+        store(address, obj, {
+            "kind": kind,
+            "sources": [os.path.realpath(s) for s in sources],
+            "digests": [file_digest(s) for s in sources],
+            "created": time.time(),
+        }, pickler)
+    except (pickle.PicklingError, TypeError, AttributeError, RecursionError) as e:
+        logging.warning(f"Cannot keep `{kind}` in the cache: {e}")
+    return obj
+
+
+def store(address, obj, meta, pickler = pickle.Pickler):
+    """Atomically write an entry and its metadata in the cache directory."""
+    # Several processes (see `--jobs`) may write the same entry at the same time,
+    # write in a temporary file first and then rename it.
+    for ext, write in [
+            ("pickle", lambda fd: pickler(fd, protocol = pickle.HIGHEST_PROTOCOL).dump(obj)),
+            ("json", lambda fd: fd.write(json.dumps(meta, indent = 2).encode())),
+        ]:
+        fd, tmp = tempfile.mkstemp(dir = directory, suffix = ".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, os.path.join(directory, f"{address}.{ext}"))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def entries(cache_dir):
+    """Yield (address, metadata, size in bytes) for each entry in the cache directory."""
+    for name in sorted(os.listdir(cache_dir)):
+        if not name.endswith(".pickle"):
+            continue
+        address = name[:-len(".pickle")]
+        meta_file = os.path.join(cache_dir, f"{address}.json")
+        try:
+            with open(meta_file) as fd:
+                meta = json.load(fd)
+        except (OSError, ValueError):
+            meta = {}
+        yield address, meta, os.path.getsize(os.path.join(cache_dir, name))
+
+
+def is_stale(meta):
+    """True if one of the sources of an entry does not exist or changed."""
+    sources = meta.get("sources", [])
+    if not sources:
+        return True
+    try:
+        return [file_digest(s) for s in sources] != meta.get("digests", [])
+    except OSError:
+        return True
+
+
+def remove(cache_dir, address):
+    for ext in ["pickle", "json"]:
+        try:
+            os.unlink(os.path.join(cache_dir, f"{address}.{ext}"))
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Inspect or prune the cache of parsed input files.")
+
+    parser.add_argument("-d", "--directory", metavar="DIR", default=".oncodashkb_cache",
+                        help="The cache directory [default: %(default)s].")
+
+    sub = parser.add_subparsers(dest = "command", required = True)
+
+    sub.add_parser("list", help="List the entries in the cache.")
+
+    prune = sub.add_parser("prune", help="Remove entries from the cache (all of them, if no filter is given).")
+    prune.add_argument("-s", "--stale", action="store_true",
+                       help="Only remove entries whose source files are missing or changed.")
+    prune.add_argument("-o", "--older-than", metavar="DAYS", type=float,
+                       help="Only remove entries created more than DAYS days ago.")
+
+    asked = parser.parse_args()
+
+    if not os.path.isdir(asked.directory):
+        print(f"No cache in `{asked.directory}`.", file=sys.stderr)
+        sys.exit(0)
+
+    now = time.time()
+    total = 0
+    removed = 0
+    for address, meta, size in entries(asked.directory):
+        age = (now - meta.get("created", now)) / 86400
+        if asked.command == "list":
+            state = "stale" if is_stale(meta) else "ok"
+            print(f"{address[:12]}  {meta.get('kind', '?'):<12}  {size / 2**20:8.1f} MiB  {age:6.1f} days  {state:<5}  {', '.join(meta.get('sources', []))}")
+            total += size
+        else:
+            if asked.older_than is not None and age <= asked.older_than:
+                continue
+            if asked.stale and not is_stale(meta):
+                continue
+            remove(asked.directory, address)
+            removed += size
+
+    if asked.command == "prune" and not asked.stale and asked.older_than is None:
+        # Temporary files left by interrupted runs.
+        for name in os.listdir(asked.directory):
+            if name.endswith(".tmp"):
+                os.unlink(os.path.join(asked.directory, name))
+
+    if asked.command == "list":
+        print(f"Total: {total / 2**20:.1f} MiB", file=sys.stderr)
+    else:
+        print(f"Removed: {removed / 2**20:.1f} MiB", file=sys.stderr)
@@ -0,0 +1,93 @@
+""" Save the state of a build after each of its stages, so that it can be resumed later on.
+
+A checkpoint is a file holding a stream of pickled (kind, list) records,
+where kind is either "node" or "edge". It is written in a temporary file,
+which is renamed only once the stage is over, so that the checkpoint
+of a stage that crashed never replaces the last good one.
+
+The stages are:
+    - weaving: the tuples made by the adapters, in the order in which they came,
+    - congregation: the groups of duplicated tuples, in the order of their first occurrence
+      (records hold lists of groups, each group being a list of tuples),
+    - fusion: the fused tuples.
+"""
+import os
+import pickle
+import logging
+import contextlib
+
+STAGES = ["weaving", "congregation", "fusion"]
+
+
+def path(directory, stage):
+    assert(stage in STAGES)
+    return os.path.join(directory, f"{stage}.pickle")
+
+
+@contextlib.contextmanager
+def writing(directory, stage):
+    """Context yielding a function that saves one (kind, list) record in the stage's checkpoint.
+
+    If directory is None, checkpoints are disabled and the function does nothing.
+
+    Example:
+        .. code-block:: python
+
+            with checkpoint.writing(directory, "weaving") as save:
+                for n,e in batches:
+                    save("node", n)
+                    save("edge", e)
+    """
+    if not directory:
+        yield lambda kind, tuples: None
+        return
+
+    os.makedirs(directory, exist_ok = True)
+    final = path(directory, stage)
+    tmp = final + ".tmp"
+    try:
+        with open(tmp, "wb") as fd:
+            pickler = pickle.Pickler(fd, protocol = pickle.HIGHEST_PROTOCOL)
+
+            def save(kind, tuples):
+                if tuples:
+                    pickler.dump((kind, tuples))
+                    # The pickler would otherwise keep a reference on everything it saved.
+                    pickler.clear_memo()
+
+            yield save
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    os.replace(tmp, final)
+    logging.info(f"Saved the {stage} checkpoint in `{final}`.")
+
+
+def save_chunks(save, kind, items, size = 10000):
+    """Save an iterable in records of at most `size` items."""
+    chunk = []
+    for t in items:
+        chunk.append(t)
+        if len(chunk) >= size:
+            save(kind, chunk)
+            chunk = []
+    save(kind, chunk)
+
+
+def reading(directory, stage, kind = None):
+    """Yield the (kind, tuples) records saved in the stage's checkpoint.
+
+    Args:
+        kind: if not None, yield only the records of this kind.
+    """
+    filename = path(directory, stage)
+    logging.info(f"Load the {stage} checkpoint from `{filename}`...")
+    with open(filename, "rb") as fd:
+        while True:
+            try:
+                # The pickler cleared its memo after each record, so must the unpickler.
+                record = pickle.load(fd)
+            except EOFError:
+                return
+            if kind is None or record[0] == kind:
+                yield record
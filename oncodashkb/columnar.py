@@ -0,0 +1,180 @@
+""" Columnar fusion of nodes and edges, using grouped aggregations on tables.
+
+Does the same fusion as OntoWeaver's `fusion.Reduce`, with the `fuse.Members` fusers used in `weave.py`,
+but without making one Python object per element and merging them pair by pair:
+
+- nodes are congregated on their ID (as `serialize.ID`):
+    - the ID is the key (as `merge.string.UseKey`),
+    - labels must all be the same (as `merge.string.EnsureIdentical`),
+    - the distinct values of each property are joined with the separator (as `merge.dictry.Append`),
+- edges are congregated on their source, target and label (as `serialize.edge.SourceTargetLabel`):
+    - the distinct IDs are joined with the separator, in the order in which they came (as `merge.string.OrderedSet`),
+    - labels must all be the same (as `merge.string.EnsureIdentical`),
+    - the distinct values of each property are joined with the separator (as `merge.dictry.Append`),
+    - the source and target are the ones of the last duplicate (as `merge.string.UseLast`).
+
+The only difference is that the values joined by `Append` come in the order in which they were seen,
+instead of the order of a Python set (which depends on `PYTHONHASHSEED`).
+This is the same as with `oncodashkb.merge.Accumulate`, which also supports the same cap
+on the number of distinct values per property.
+"""
+import logging
+
+import pandas as pd
+
+import ontoweaver
+
+# Stands for a property holding an empty list, which is kept, with an empty string (as `merge.dictry.Append` does).
+NO_VALUE = object()
+
+
+class Table:
+    """Gather BioCypher tuples until they are fused.
+
+    It has the same `push`/`count`/`close` interface as a stream.Feeder,
+    and can be used in its place.
+    """
+
+    def __init__(self):
+        self.tuples = []
+
+    @property
+    def count(self):
+        return len(self.tuples)
+
+    def push(self, biocypher_tuples):
+        self.tuples.extend(biocypher_tuples)
+
+    def close(self):
+        return self
+
+
+def ensure_identical(keys, codes, values, what):
+    """Raise an ontoweaver.exceptions.RunError if a group has several distinct values."""
+    distinct = pd.DataFrame({"code": codes, "value": values}).drop_duplicates()
+    if len(distinct) > len(keys):
+        code = distinct.code[distinct.code.duplicated()].iloc[0]
+        seen = distinct.value[distinct.code == code].tolist()
+        raise ontoweaver.exceptions.RunError(f"Merged {what} `{seen[0]}`/`{seen[1]}` not identical, for key `{keys[code]}`.")
+
+
+def joined_properties(codes, nb_groups, properties, sep, cap = None):
+    """Join the distinct values of each property of each group.
+
+    Args:
+        codes: the group of each element.
+        nb_groups: the number of groups.
+        properties: the properties dictionary of each element.
+        sep: the separator used to join values.
+        cap: the maximum number of distinct values to keep for each property, or None.
+
+    Returns:
+        A list holding the properties dictionary of each group.
+    """
+    # Long format: one row per (element, property, value).
+    rows = []
+    props = []
+    values = []
+    for row, p in enumerate(properties):
+        for k, v in p.items():
+            if isinstance(v, (set, list)) and v:
+                for item in v:
+                    rows.append(row)
+                    props.append(k)
+                    values.append(item)
+            elif isinstance(v, (set, list)):
+                rows.append(row)
+                props.append(k)
+                values.append(NO_VALUE)
+            else:
+                rows.append(row)
+                props.append(k)
+                values.append(v)
+
+    fused = [{} for c in range(nb_groups)]
+    if not rows:
+        return fused
+
+    long = pd.DataFrame({"code": codes[rows], "prop": props, "value": values})
+    long = long.drop_duplicates()
+
+    # An aggregation with a Python function would make a Series per group,
+    # a single pass over the (already de-duplicated) values is way faster.
+    nb_dropped = 0
+    for code, prop, value in zip(long.code.tolist(), long.prop.tolist(), long.value.tolist()):
+        kept = fused[code].setdefault(prop, [])
+        if value is NO_VALUE:
+            continue
+        if cap is not None and len(kept) >= cap:
+            nb_dropped += 1
+        else:
+            kept.append(value)
+    if nb_dropped:
+        logging.warning(f"Dropped {nb_dropped} distinct values of properties, over the cap of {cap} distinct values per property.")
+    for p in fused:
+        for prop, values in p.items():
+            p[prop] = sep.join(values)
+    return fused
+
+
+def fuse_nodes(tuples, sep, cap = None):
+    """Fuse the nodes having the same ID.
+
+    Args:
+        tuples: a list of BioCypher nodes tuples.
+        sep: the separator used to join properties values.
+        cap: the maximum number of distinct values to keep for each property, or None.
+
+    Returns:
+        a list of fused BioCypher nodes tuples.
+    """
+    if not tuples:
+        return []
+    # Same conversions as base.Node.
+    ids = [str(t[0]) if t[0] else "" for t in tuples]
+    labels = [str(t[1]) if t[1] else ontoweaver.base.Node.__name__ for t in tuples]
+
+    # Groups, numbered in the order of their first occurrence.
+    codes, keys = pd.factorize(pd.Series(ids, dtype = object))
+    ensure_identical(keys, codes, labels, "label")
+
+    # Labels are all the same within a group, take the first one.
+    first = pd.Series(labels, dtype = object).groupby(codes, sort = True).first()
+    properties = joined_properties(codes, len(keys), [t[2] for t in tuples], sep, cap)
+
+    return list(zip(keys.tolist(), first.tolist(), properties))
+
+
+def fuse_edges(tuples, sep, cap = None):
+    """Fuse the edges having the same source, target and label.
+
+    Args:
+        tuples: a list of BioCypher edges tuples.
+        sep: the separator used to join IDs and properties values.
+        cap: the maximum number of distinct values to keep for each property, or None.
+
+    Returns:
+        a list of fused BioCypher edges tuples.
+    """
+    if not tuples:
+        return []
+    # Same conversions as base.Edge.
+    ids = [str(t[0]) if t[0] else "" for t in tuples]
+    sources = [str(t[1]) for t in tuples]
+    targets = [str(t[2]) for t in tuples]
+    labels = [str(t[3]) if t[3] else ontoweaver.base.GenericEdge.__name__ for t in tuples]
+
+    table = pd.DataFrame({"id": ids, "source": sources, "target": targets, "label": labels}, dtype = object)
+    codes, keys = pd.factorize(table.source + table.target + table.label)
+    table["code"] = codes
+    # NOTE: labels are part of the key, hence always identical within a group.
+
+    distinct = table[["code", "id"]].drop_duplicates()
+    fused_ids = [[] for k in keys]
+    for code, id in zip(distinct.code.tolist(), distinct.id.tolist()):
+        fused_ids[code].append(id)
+    fused_ids = [sep.join(ids) for ids in fused_ids]
+    last = table.drop_duplicates(subset = "code", keep = "last").sort_values("code")
+    properties = joined_properties(codes, len(keys), [t[4] for t in tuples], sep, cap)
+
+    return list(zip(fused_ids, last.source.tolist(), last.target.tolist(), last.label.tolist(), properties))
@@ -0,0 +1,84 @@
+""" Save parsed mappings, so that unchanged ones are not parsed again.
+
+Parsing a mapping builds all its transformers, which may load translation
+tables. The parsed mapping holds the node and edge classes that the parser
+declared on the fly, which cannot be pickled as usual: they are not
+reachable by their name once the parser is gone. The Pickler of this module
+saves them by value, and they are declared again when loading.
+
+Example:
+    .. code-block:: python
+
+        mapping = cache.load("mapping", [mapping_file], lambda: parse(mapping_file), pickler = compiled.Pickler)
+"""
+import abc
+import types
+import pickle
+import inspect
+import importlib
+
+import ontoweaver
+
+# Change this when the way mappings are saved changes,
+# so that older cache entries are not used anymore.
+VERSION = 1
+
+
+def declared_class(name, bases):
+    """Declare again a class saved by `Pickler`, its attributes are set by `set_class_state`."""
+    return types.new_class(name, bases, {}, lambda ns: ns.update({"__module__": ontoweaver.types.__name__}))
+
+
+def constant(value):
+    return lambda: value
+
+
+def set_class_state(cls, state):
+    values, static = state
+    for name, value in values.items():
+        setattr(cls, name, value)
+    # Declared classes answer their fields and types with functions, see ontoweaver.base.Declare.
+    for name, value in static.items():
+        setattr(cls, name, staticmethod(constant(value)))
+    # The abstract methods were computed before they were set.
+    return abc.update_abstractmethods(cls)
+
+
+def constant_value(cls, name, function):
+    """The value answered by a static method without parameter,
+    which is saved instead of the function (which cannot be pickled).
+
+    Raises:
+        pickle.PicklingError: if the method has parameters, its results cannot be saved.
+    """
+    try:
+        nb_parameters = len(inspect.signature(function).parameters)
+    except (TypeError, ValueError):
+        nb_parameters = None
+    if nb_parameters != 0:
+        raise pickle.PicklingError(f"Cannot save the static method `{name}` of the declared class `{cls.__name__}`, it has parameters.")
+    return function()
+
+
+class Pickler(pickle.Pickler):
+    """Pickle a parsed mapping, including the classes it declared and the modules it refers to."""
+
+    def reducer_override(self, obj):
+        if isinstance(obj, types.ModuleType):
+            return importlib.import_module, (obj.__name__,)
+
+        if isinstance(obj, type) and obj.__module__ == ontoweaver.types.__name__ and issubclass(obj, ontoweaver.base.Element):
+            values = {}
+            static = {}
+            for name, value in vars(obj).items():
+                # Dunders and ABC's caches are made again with the class.
+                if name.startswith("_"):
+                    continue
+                if isinstance(value, staticmethod):
+                    static[name] = constant_value(obj, name, value.__func__)
+                else:
+                    values[name] = value
+            # The state is set once the class exists, so that it may refer to the class itself.
+            return declared_class, (obj.__name__, obj.__bases__), (values, static), None, None, set_class_state
+
+        return NotImplemented
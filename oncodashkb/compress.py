@@ -0,0 +1,192 @@
+""" Write BioCypher's part files compressed with gzip, compressing blocks of each file in parallel.
+
+`neo4j-admin import` reads gzip-compressed files directly. Each part file is
+cut in blocks, which are compressed at the same time by a pool of threads
+(zlib releases the GIL), and joined in a single gzip stream, the way `pigz`
+does: each block is compressed with the end of the previous one as its
+dictionary, so that the file is nearly as small as if compressed at once.
+Blocks are compressed as the lines are encoded, and written as soon as they
+are compressed, so that a whole file is never held in memory.
+
+This replaces methods of BioCypher's batch writer, if it does not have the
+expected ones, a warning is logged and the files are left uncompressed.
+
+Example:
+    .. code-block:: python
+
+        compress.configure(6, threads = 8)
+        compress.use(bc._writer)
+        bc.write_nodes(nodes)
+        compress.report()
+"""
+import os
+import re
+import glob
+import time
+import zlib
+import struct
+import logging
+import functools
+import collections
+import concurrent.futures
+
+try:
+    from biocypher.output.write._batch_writer import parse_label
+except ImportError:
+    # See `use`.
+    parse_label = None
+
+# Disabled unless `configure` is given a level.
+level = None
+jobs = 1
+block_size = 128 * 2**10
+
+# Deflate can refer to that much of the data that came before.
+WINDOW = 32 * 2**10
+
+# The attributes of BioCypher's batch writer used here.
+WRITER_ATTRIBUTES = ["_write_next_part", "_construct_import_call", "translator", "outdir", "parts", "import_call_nodes", "import_call_edges"]
+
+# What was compressed by this process, see `report`.
+stats = {"files": 0, "raw_bytes": 0, "bytes": 0, "seconds": 0.0}
+
+
+def configure(compress_level, threads = None):
+    """Enable the compression at the given level, using `threads` threads (default: as many as CPUs),
+    or disable it if the level is None."""
+    global level, jobs
+    level = compress_level
+    jobs = threads or os.cpu_count()
+
+
+def deflate(block, zdict, last):
+    """Raw deflate data of a block, that can be followed by the one of the next block."""
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # A sync flush ends the block on a byte boundary, without ending the stream.
+    return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def encoded(lines):
+    """Yield the lines encoded in UTF-8, gathered in blocks of at least `block_size` bytes
+    (but the last one, which may be empty)."""
+    block = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        block.append(data)
+        size += len(data)
+        if size >= block_size:
+            yield b"".join(block)
+            block = []
+            size = 0
+    yield b"".join(block)
+
+
+def gzip_chunks(blocks):
+    """Yield the gzip file of the given blocks of bytes, piece by piece.
+
+    At most two blocks per thread are being compressed (or waiting to be written) at once.
+    """
+    # Header: magic, deflate, no flag, no time, no extra flag, unknown OS.
+    yield struct.pack("<BBBBIBB", 0x1f, 0x8b, 8, 0, 0, 0, 255)
+    crc = 0
+    size = 0
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        pending = collections.deque()
+        zdict = None
+        previous = None
+        for block in blocks:
+            if previous is not None:
+                pending.append(executor.submit(deflate, previous, zdict, False))
+                zdict = previous[-WINDOW:]
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            previous = block
+            while len(pending) > 2 * jobs:
+                yield pending.popleft().result()
+        # The last block ends the stream.
+        pending.append(executor.submit(deflate, previous or b"", zdict, True))
+        while pending:
+            yield pending.popleft().result()
+    yield struct.pack("<II", crc, size & 0xffffffff)
+
+
+def write_next_part(writer, label, lines):
+    """Replaces `_write_next_part` of a BioCypher batch writer, writing a gzip file."""
+    label_pascal = writer.translator.name_sentence_to_pascal(parse_label(label))
+
+    # Numbered after the ones already there, as BioCypher does.
+    files = glob.glob(os.path.join(writer.outdir, f"{label_pascal}-part*.csv.gz"))
+    numbers = [int(re.search(r"-part(\d+)\.csv\.gz$", f).group(1)) for f in files]
+    part = f"{label_pascal}-part{max(numbers, default = -1) + 1:03d}.csv.gz"
+    logging.info(f"Writing {len(lines)} entries to {part}")
+
+    start = time.perf_counter()
+    raw_bytes = 0
+    nb_bytes = 0
+    def counted(blocks):
+        nonlocal raw_bytes
+        for block in blocks:
+            raw_bytes += len(block)
+            yield block
+
+    with open(os.path.join(writer.outdir, part), "wb") as fd:
+        for chunk in gzip_chunks(counted(encoded(lines))):
+            fd.write(chunk)
+            nb_bytes += len(chunk)
+    stats["files"] += 1
+    stats["raw_bytes"] += raw_bytes
+    stats["bytes"] += nb_bytes
+    stats["seconds"] += time.perf_counter() - start
+
+    writer.parts.setdefault(label, []).append(part)
+
+
+def construct_import_call(writer, construct):
+    """Replaces `_construct_import_call` of a BioCypher batch writer, calling the import on gzip files."""
+    for calls in [writer.import_call_nodes, writer.import_call_edges]:
+        for header, parts in list(calls):
+            if parts.endswith("-part.*"):
+                calls.remove((header, parts))
+                calls.add((header, parts + ".csv.gz"))
+    return construct()
+
+
+def use(writer):
+    """Make the given BioCypher batch writer write gzip part files, if the compression is enabled.
+
+    The headers are small, and are left uncompressed.
+
+    Returns:
+        bool: whether the writer will compress.
+    """
+    if level is None:
+        return False
+    missing = [attr for attr in WRITER_ATTRIBUTES if not hasattr(writer, attr)]
+    if parse_label is None:
+        missing.append("biocypher.output.write._batch_writer.parse_label")
+    if missing:
+        logging.warning(f"Cannot compress the files of BioCypher's writer, which lacks `{'`, `'.join(missing)}`, they are left uncompressed.")
+        return False
+    writer._write_next_part = functools.partial(write_next_part, writer)
+    writer._construct_import_call = functools.partial(construct_import_call, writer, writer._construct_import_call)
+    return True
+
+
+def add(other):
+    """Add the stats of another process."""
+    for key, value in other.items():
+        stats[key] += value
+
+
+def report():
+    """Log what was compressed."""
+    if not stats["files"]:
+        return
+    mib = 2**20
+    logging.info(f" | Compressed {stats['raw_bytes'] / mib:.1f} MiB into {stats['bytes'] / mib:.1f} MiB"
+        f" ({100 * stats['bytes'] / max(1, stats['raw_bytes']):.0f}%) in {stats['files']} files,"
+        f" at {stats['raw_bytes'] / mib / max(stats['seconds'], 1e-9):.1f} MiB/s per writer (threads per writer: {jobs}).")
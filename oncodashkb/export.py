@@ -0,0 +1,310 @@
+""" Write the Neo4j import files of each label in its own worker process.
+
+BioCypher formats all the nodes and edges in the calling process, one at a
+time, from lists holding the whole graph. Here, the fused tuples are sent,
+by chunks, to worker processes, each one writing the files of some of the
+labels with its own BioCypher writer. All the tuples of a label go to the
+same worker, in the same order, so that each label gets the same part files
+and header as with a single writer. What the workers wrote is then added to
+the writer of the calling process, so that `bc.write_import_call()` calls
+`neo4j-admin import` on all the files.
+
+This relies on internals of BioCypher (see `supported`), if they are not
+the expected ones, the tuples are written by the calling process only.
+
+Example:
+    .. code-block:: python
+
+        export.write(bc, nodes, edges, jobs = 8, config = "config/neo4j.yaml")
+        import_file = bc.write_import_call()
+"""
+import time
+import heapq
+import operator
+import queue
+import logging
+import itertools
+import traceback
+import collections
+import multiprocessing
+import importlib.metadata
+
+import biocypher
+
+from oncodashkb import stream
+from oncodashkb import compress
+
+# The edges of the relationships that are represented as nodes all go in the
+# same IS_SOURCE_OF, IS_TARGET_OF or IS_PART_OF files, hence in the same worker.
+RELATIONSHIPS_AS_NODES = ("relationships", "as nodes")
+
+# What the writer of a worker holds about the files it wrote.
+WRITER_STATE = ["import_call_nodes", "import_call_edges", "node_property_dict", "edge_property_dict", "parts"]
+
+# The BioCypher versions (major, minor) whose internals are used here, from the first to the last.
+BIOCYPHER_VERSIONS = ((0, 12), (0, 16))
+
+# The internals used here, of the BioCypher instance, of its writer, and of its translator.
+INTERNALS = {
+    "BioCypher": ["_writer", "_initialize_writer", "_get_translator", "_ontology", "_schema_config_path", "_output_directory"],
+    "writer": WRITER_STATE,
+    "translator": ["_get_ontology_mapping", "ontology.mapping.extended_schema"],
+}
+
+
+def supported(bc):
+    """Whether the internals of BioCypher used by the parallel writing are the expected ones.
+
+    Initializes the writer of the BioCypher instance, if it is not already.
+    Logs why, if they are not.
+    """
+    version = importlib.metadata.version("biocypher")
+    try:
+        major_minor = tuple(int(n) for n in version.split(".")[:2])
+    except ValueError:
+        major_minor = None
+    if major_minor is None or not BIOCYPHER_VERSIONS[0] <= major_minor <= BIOCYPHER_VERSIONS[1]:
+        logging.warning(f"Cannot write with several processes with BioCypher {version}, only versions {'.'.join(map(str, BIOCYPHER_VERSIONS[0]))} to {'.'.join(map(str, BIOCYPHER_VERSIONS[1]))} are supported.")
+        return False
+
+    missing = [attr for attr in INTERNALS["BioCypher"] if not hasattr(bc, attr)]
+    if not missing:
+        # Fixes the output directory for all the workers.
+        if bc._writer is None:
+            bc._initialize_writer()
+        for name, obj in [("writer", bc._writer), ("translator", bc._get_translator())]:
+            for attr in INTERNALS[name]:
+                try:
+                    operator.attrgetter(attr)(obj)
+                except AttributeError:
+                    missing.append(f"{name}.{attr}")
+    if missing:
+        logging.warning(f"Cannot write with several processes with BioCypher {version}, which lacks `{'`, `'.join(missing)}`.")
+        return False
+    return True
+
+
+def label_file(translator, kind, label):
+    """The label under which BioCypher writes the tuples of the given input label,
+    or None if it does not know it (and will thus drop them)."""
+    ontology_class = translator._get_ontology_mapping(label)
+    if ontology_class is None or kind == "node":
+        return ontology_class
+    schema = translator.ontology.mapping.extended_schema[ontology_class]
+    if schema["represented_as"] == "node":
+        return RELATIONSHIPS_AS_NODES
+    return schema.get("label_as_edge") or ontology_class
+
+
+def input_label(kind, t):
+    # Edges may be 4-tuples (without ID) or 5-tuples, properties come last.
+    return t[1] if kind == "node" else t[-2]
+
+
+def received(inbox, counter):
+    """Yield the tuples of the chunks put in the inbox, until None."""
+    while (chunk := inbox.get()) is not None:
+        counter[0] += len(chunk)
+        yield from chunk
+
+
+def work(index, inbox, outbox, config, schema, output_directory, ontology, level, compress_level, compress_jobs):
+    """Write the nodes, then the edges, received in the inbox, and put the state of the writer in the outbox."""
+    logging.basicConfig()
+    logging.getLogger().setLevel(level)
+    compress.configure(compress_level, compress_jobs)
+    try:
+        start = time.perf_counter()
+        bc = biocypher.BioCypher(
+            biocypher_config_path = config,
+            schema_config_path = schema,
+            output_directory = output_directory,
+        )
+        biocypher._logger.logger.setLevel(level)
+        bc._ontology = ontology
+        bc._initialize_writer()
+        compress.use(bc._writer)
+        counter = [0]
+        for write in [bc.write_nodes, bc.write_edges]:
+            # A worker may have no node (or no edge) label.
+            first = inbox.get()
+            if first is not None:
+                counter[0] += len(first)
+                write(itertools.chain(first, received(inbox, counter)))
+        state = {name: getattr(bc._writer, name) for name in WRITER_STATE}
+        stats = {"elements": counter[0], "seconds": time.perf_counter() - start, "peak_rss": stream.peak_rss()[0],
+            "compression": compress.stats}
+        outbox.put((index, state, stats))
+    except Exception as e:
+        logging.error(f"The writer process #{index} failed: {e}")
+        outbox.put((index, None, traceback.format_exc()))
+
+
+class Worker:
+    """A process writing the files of some labels, fed by chunks of tuples."""
+
+    def __init__(self, index, context, outbox, args, queue_size):
+        self.index = index
+        self.labels = []
+        # A bounded inbox keeps the pending chunks from piling up in memory.
+        self.inbox = context.Queue(queue_size)
+        self.process = context.Process(target = work, args = (index, self.inbox, outbox) + args,
+            name = f"writer-{index}", daemon = True)
+
+    def check(self, running = False):
+        """Raise if the process died, or if it stopped while it should be running."""
+        if self.process.exitcode not in (None, 0) or (running and self.process.exitcode is not None):
+            raise RuntimeError(f"The writer process #{self.index} stopped before the end of the writing (exit code {self.process.exitcode}), see its errors above.")
+
+    def send(self, chunk):
+        while True:
+            try:
+                self.inbox.put(chunk, timeout = 1)
+                return
+            except queue.Full:
+                # It may have failed, and thus stopped reading its inbox.
+                self.check(running = True)
+
+
+def progressed(tuples, progress):
+    """Iterate over the tuples, calling `progress` once for each."""
+    for t in tuples:
+        progress()
+        yield t
+
+
+def drained(tuples):
+    """Iterate over the tuples, removing them from the given list (if it is one)."""
+    if not isinstance(tuples, list):
+        # Like spill.Spool, which is read from the disk.
+        yield from tuples
+        return
+    # Pop from the end, in the original order.
+    tuples.reverse()
+    while tuples:
+        yield tuples.pop()
+
+
+def assign(loads, jobs):
+    """Assign labels to at most `jobs` workers, the largest first, to the least loaded one.
+
+    Args:
+        loads: the number of tuples of each label.
+
+    Returns:
+        list: the labels of each worker.
+    """
+    workers = [(0, i, []) for i in range(min(jobs, len(loads)))]
+    for label, load in sorted(loads.items(), key = lambda l: (-l[1], str(l[0]))):
+        total, i, labels = heapq.heappop(workers)
+        labels.append(label)
+        heapq.heappush(workers, (total + load, i, labels))
+    return [labels for total, i, labels in sorted(workers, key = lambda w: w[1])]
+
+
+def write(bc, nodes, edges, jobs, config, chunk_size = 10000, progress = None):
+    """Write the import files of the given tuples in `jobs` worker processes.
+
+    Workers write gzip part files if `compress` is configured to.
+    If BioCypher's internals are not `supported`, the calling process writes the tuples.
+
+    The tuples are read twice: once to balance the labels between the workers,
+    and once to send them. Lists are emptied while their tuples are sent,
+    so that the memory they hold is given back as the writing goes.
+
+    Args:
+        bc: the BioCypher instance, whose ontology is set.
+        nodes: a list (or a spill.Spool) of BioCypher node tuples.
+        edges: a list (or a spill.Spool) of BioCypher edge tuples.
+        jobs: the maximum number of worker processes.
+        config: the BioCypher configuration file, read again by the workers.
+        chunk_size: the number of tuples sent at once to a worker.
+        progress: if not None, called once for each tuple sent.
+    """
+    if not supported(bc):
+        logging.info(f" | Write with a single process...")
+        for tuples, write_tuples in [(nodes, bc.write_nodes), (edges, bc.write_edges)]:
+            if len(tuples):
+                write_tuples(progressed(tuples, progress) if progress else tuples)
+        return
+
+    translator = bc._get_translator()
+
+    files = {"node": {}, "edge": {}}
+    loads = collections.Counter()
+    for kind, tuples in [("node", nodes), ("edge", edges)]:
+        for t in tuples:
+            label = input_label(kind, t)
+            if label not in files[kind]:
+                files[kind][label] = label_file(translator, kind, label)
+            loads[files[kind][label]] += 1
+
+    # Workers are forked from a server process that imported BioCypher once,
+    # and that does not hold the graph, contrary to the current one.
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["biocypher", __name__])
+    outbox = context.Queue()
+    args = (config, bc._schema_config_path, bc._output_directory, bc._ontology, logging.getLogger().level,
+        compress.level, compress.jobs)
+    workers = []
+    worker_of = {}
+    for i, labels in enumerate(assign(loads, jobs)):
+        worker = Worker(i, context, outbox, args, queue_size = 4)
+        worker.labels = labels
+        worker.process.start()
+        workers.append(worker)
+        worker_of.update((l, worker) for l in labels)
+    logging.info(f" | Write {len(loads)} labels with {len(workers)} processes...")
+
+    done = False
+    try:
+        for kind, tuples in [("node", nodes), ("edge", edges)]:
+            chunks = collections.defaultdict(list)
+            for t in drained(tuples):
+                label = files[kind][input_label(kind, t)]
+                chunk = chunks[label]
+                chunk.append(t)
+                if len(chunk) >= chunk_size:
+                    worker_of[label].send(chunk)
+                    chunks[label] = []
+                if progress:
+                    progress()
+            for label, chunk in chunks.items():
+                if chunk:
+                    worker_of[label].send(chunk)
+            # Go from nodes to edges.
+            for worker in workers:
+                worker.send(None)
+
+        for _ in workers:
+            while True:
+                try:
+                    index, state, stats = outbox.get(timeout = 1)
+                    break
+                except queue.Empty:
+                    for worker in workers:
+                        worker.check()
+            if state is None:
+                raise RuntimeError(f"The writer process #{index} failed:\n{stats}")
+            merge(bc._writer, state)
+            compress.add(stats["compression"])
+            worker = workers[index]
+            logging.info(f" |  | Writer #{index}: {stats['elements']} elements of {len(worker.labels)} labels, in {stats['seconds']:.2f}s (peak RSS: {stats['peak_rss']:.0f} MiB).")
+        done = True
+    finally:
+        for worker in workers:
+            # Do not wait for the others if one failed,
+            # nor for their inbox to be read.
+            if not done:
+                worker.process.terminate()
+                worker.inbox.cancel_join_thread()
+            worker.process.join()
+
+
+def merge(writer, state):
+    """Add what a worker's writer wrote to the given writer."""
+    writer.import_call_nodes |= state.get("import_call_nodes", set())
+    writer.import_call_edges |= state.get("import_call_edges", set())
+    writer.node_property_dict.update(state.get("node_property_dict", {}))
+    writer.edge_property_dict.update(state.get("edge_property_dict", {}))
+    writer.parts.update(state.get("parts", {}))
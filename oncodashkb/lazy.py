@@ -0,0 +1,31 @@
+""" Import modules only when they are first used.
+
+Importing pandas, OntoWeaver or BioCypher takes seconds, which is longer than
+some commands take (e.g. `weave.py --help`). A module returned by `module`
+is actually imported at the first access to one of its attributes.
+
+Example:
+    .. code-block:: python
+
+        pd = lazy.module("pandas")
+        # Imports pandas.
+        table = pd.read_csv(filename)
+"""
+import sys
+import importlib.util
+
+
+def module(name):
+    """Return the module with the given name, which is imported when it is first used."""
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name = name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    loader.exec_module(mod)
+    return mod
@@ -0,0 +1,99 @@
+""" Mergers for the fusion of duplicated elements.
+"""
+import logging
+
+import ontoweaver
+
+
+class Accumulate(ontoweaver.merge.dictry.DictryMerger):
+    """Merge properties dictionaries by collecting the distinct values of each property,
+    and joining them only once, when the fused element is made.
+
+    Does the same as `ontoweaver.merge.dictry.Append`, except that:
+        - values are joined in the order in which they were first seen,
+        - the number of distinct values kept for each property can be capped.
+
+    `Append` makes a new set of all the values seen so far at each merge,
+    which makes fusing the thousands of duplicates of a hub node quadratic.
+    Here, each merge only adds the values of the merged element, in place.
+    Values are joined by `get`, use it with `Reduce`, which calls it once per fused element.
+
+    Args:
+        reconciliate_sep: the separator used to join values.
+        cap: the maximum number of distinct values to keep for each property,
+             or None to keep all of them.
+    """
+
+    def __init__(self, reconciliate_sep = "|", cap = None):
+        self.reconciliate_sep = reconciliate_sep
+        self.cap = cap
+        # Number of distinct values of each element that were dropped because of the cap.
+        self.nb_dropped = 0
+        self.merged = {}
+        self.dropped = {}
+
+    def add(self, prop, value):
+        # A dict is an insertion-ordered set.
+        values = self.merged.setdefault(prop, {})
+        if value in values:
+            return
+        if self.cap is not None and len(values) >= self.cap:
+            # Counted once, however many duplicates hold it, as `columnar` does.
+            dropped = self.dropped.setdefault(prop, set())
+            if value not in dropped:
+                dropped.add(value)
+                self.nb_dropped += 1
+            return
+        values[value] = None
+
+    def set(self, merged) -> None:
+        assert(isinstance(merged, dict))
+        # fuse.Members sets back what was merged after each merge,
+        # there is nothing new in it.
+        if merged is self.merged:
+            return
+        for k,v in merged.items():
+            # As with `Append`, a property without value is kept, as an empty string.
+            self.merged.setdefault(k, {})
+            if isinstance(v, (set, list)):
+                for item in v:
+                    self.add(k, item)
+            else:
+                self.add(k, v)
+
+    def merge(self, key, lhs: dict[str,str], rhs: dict[str,str]):
+        self.set(lhs)
+        self.set(rhs)
+
+    def get(self) -> dict[str,str]:
+        return {k: self.reconciliate_sep.join(v) for k,v in self.merged.items()}
+
+    def reset(self):
+        self.merged = {}
+        self.dropped = {}
+
+    def log_dropped(self, what):
+        if self.nb_dropped:
+            logging.warning(f"Dropped {self.nb_dropped} distinct values of {what} properties, over the cap of {self.cap} distinct values per property.")
+
+
+class Reduce(ontoweaver.fusion.Reduce):
+    """Fuse the duplicated elements of a congregater, as OntoWeaver's `fusion.Reduce` does.
+
+    OntoWeaver's `Reduce` formats debug messages holding the fused element
+    after each merge, even when they are not logged. Each one joins all
+    the values merged so far, which makes fusing the thousands of duplicates
+    of a hub node quadratic. Here, the fused element is got only once.
+    """
+
+    def step(self, key, elem_list):
+        self.fuser.reset()
+        # Manual functools.reduce without initial state.
+        it = iter(elem_list)
+        lhs = next(it)
+        self.fuser(key, lhs, lhs)
+        self.nb_fusions += 1
+        for rhs in it:
+            self.fuser(key, lhs, rhs)
+            self.nb_fusions += 1
+        return self.fuser.get()
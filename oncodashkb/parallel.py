@@ -0,0 +1,181 @@
+""" Run independent weaving tasks, either serially or in a pool of worker processes.
+"""
+import sys
+import math
+import time
+import logging
+import collections
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from oncodashkb import stream
+from oncodashkb import profiling
+
+
+class Task:
+    """A named unit of work that does not depend on any other task.
+
+    Calling a Task calls `function(*args)`, which should return an iterable
+    of (nodes, edges) batches, each being a list of BioCypher tuples.
+
+    Because a Task may be sent to a worker process, `function` must be
+    a module-level function and `args` must be picklable.
+    The batches must be picklable as well, which is why weaving tasks
+    yield BioCypher tuples and not ontoweaver.base.Element objects
+    (whose classes are declared at run time by the mapping parser).
+
+    The `sources` are the files (or directories) read by the task,
+    which allows to know when its result may have changed.
+    """
+
+    def __init__(self, name, function, *args, sources = []):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.sources = list(sources)
+
+    def __call__(self):
+        return self.function(*self.args)
+
+    def __repr__(self):
+        return f"<Task {self.name}>"
+
+
+class Timed:
+    """Iterate over batches, measuring the wall and CPU time spent in producing them.
+
+    The times are available in the `duration` and `cpu` members, once the iteration is over,
+    along with what the producing code counted (see `profiling.counts`) in `counts`.
+    If the batches were produced in a worker process, its peak RSS (in MiB) is in `peak_rss`.
+    """
+
+    def __init__(self, batches, duration = 0.0, cpu = 0.0, counts = None, peak_rss = None):
+        self.batches = batches
+        self.duration = duration
+        self.cpu = cpu
+        # Given by the worker process, or gathered here while iterating.
+        self.counts = counts
+        self.peak_rss = peak_rss
+
+    def __iter__(self):
+        it = iter(self.batches)
+        while True:
+            start = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                batch = next(it)
+            except StopIteration:
+                self.duration += time.perf_counter() - start
+                self.cpu += time.process_time() - cpu
+                if self.counts is None:
+                    self.counts = dict(profiling.counts)
+                return
+            self.duration += time.perf_counter() - start
+            self.cpu += time.process_time() - cpu
+            yield batch
+
+
+def collect(task):
+    """Run a task, gathering all its batches in a single one.
+
+    Returns:
+        The batches, and the Timed measures of the task (without the batches).
+    """
+    start = time.perf_counter()
+    cpu = time.process_time()
+    profiling.counts.clear()
+    nodes = []
+    edges = []
+    for n,e in task():
+        nodes += n
+        edges += e
+    timed = Timed(None, time.perf_counter() - start, time.process_time() - cpu, dict(profiling.counts), stream.peak_rss()[0])
+    return [(nodes, edges)], timed
+
+
+def run(tasks, jobs = 1, initializer = None, initargs = ()):
+    """Run the given tasks, and yield their batches.
+
+    Tasks are yielded in the order of `tasks`, whatever the order in which
+    the workers actually finish them, so that the output does not depend on `jobs`.
+
+    When running serially, a task's batches are produced while being iterated,
+    so that they can be consumed without being stored.
+    When running in worker processes, each task's batches are gathered
+    and sent back to the current process.
+
+    Args:
+        tasks: a list of Task.
+        jobs: number of worker processes, if lower than 2, run everything in the current process.
+        initializer: a function called at the start of each worker process.
+        initargs: arguments passed to `initializer`.
+
+    Yields:
+        tuple: the task and a Timed iterable over its batches.
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            # Tasks may load their data before returning their batches.
+            start = time.perf_counter()
+            cpu = time.process_time()
+            profiling.counts.clear()
+            batches = task()
+            yield task, Timed(batches, time.perf_counter() - start, time.process_time() - cpu)
+    else:
+        workers = min(jobs, len(tasks))
+        logging.info(f"Run {len(tasks)} tasks with {workers} worker processes...")
+        with ProcessPoolExecutor(max_workers = workers, initializer = initializer, initargs = initargs) as executor:
+            futures = collections.deque(executor.submit(collect, task) for task in tasks)
+            for task in tasks:
+                # A future holds its result as long as it is referenced,
+                # do not keep the batches alive until the end of the pool.
+                batches, timed = futures.popleft().result()
+                timed.batches = batches
+                del batches
+                yield task, timed
+                del timed
+
+
+def fork_pool(jobs, initializer = None, initargs = ()):
+    """A pool of worker processes that are forked from the current one.
+
+    Forked workers inherit the state of the parent process at the time
+    the tasks are submitted, which avoids pickling large or unpicklable
+    objects (like DataFrames or parsed mappings) to send them to workers.
+    """
+    return ProcessPoolExecutor(
+        max_workers = jobs,
+        mp_context = multiprocessing.get_context("fork"),
+        initializer = initializer,
+        initargs = initargs,
+    )
+
+
+def row_shards(nb_rows, nb_shards):
+    """Split `nb_rows` rows in at most `nb_shards` contiguous chunks of (almost) equal sizes.
+
+    Returns:
+        list: the (begin, end) bounds of each chunk, in order.
+    """
+    size = max(1, math.ceil(nb_rows / max(1, nb_shards)))
+    return [(begin, min(begin + size, nb_rows)) for begin in range(0, nb_rows, size)]
+
+
+def report(timings, wall_time, file = sys.stderr):
+    """Print a table of the wall time taken by each task.
+
+    Args:
+        timings: a list of (task name, seconds) pairs.
+        wall_time: the total wall time of the run, in seconds.
+        file: where to print the table.
+    """
+    if not timings:
+        return
+    width = max(len(name) for name, _ in timings)
+    total = sum(duration for _, duration in timings)
+    print(f"{'Adapter':<{width}}  Wall time (s)", file = file)
+    for name, duration in sorted(timings, key = lambda t: t[1], reverse = True):
+        print(f"{name:<{width}}  {duration:13.2f}", file = file)
+    print(f"{'Sum of adapters':<{width}}  {total:13.2f}", file = file)
+    print(f"{'Elapsed':<{width}}  {wall_time:13.2f}", file = file)
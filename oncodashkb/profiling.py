@@ -0,0 +1,350 @@
+""" Measure where the time and the memory of a build go, adapter by adapter and stage by stage.
+"""
+import os
+import sys
+import json
+import time
+import tracemalloc
+import collections
+
+from oncodashkb import lazy
+from oncodashkb import stream
+
+# Only needed for counting the transformers' calls.
+yaml = lazy.module("yaml")
+ontoweaver = lazy.module("ontoweaver")
+scan = lazy.module("oncodashkb.scan")
+
+# What the code being measured counts (e.g. the rows it read), gathered for each task by `parallel.Timed`.
+counts = collections.Counter()
+
+# Whether to count the calls of the transformers, see `instrument`.
+transformer_counters = False
+
+
+def traced():
+    """Bytes currently allocated by Python, if tracemalloc is tracing, or None."""
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return None
+
+
+def current_rss():
+    """Current resident memory of this process, in MiB, or None if it cannot be known."""
+    try:
+        with open("/proc/self/statm") as fd:
+            return int(fd.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+class Measure:
+    """The wall time, CPU time, memory and Python allocations of a part of the build.
+
+    Use it as a context manager around the measured code (or call `start` and `stop`),
+    possibly several times, measures being accumulated.
+
+    The Python allocations are the change in the number of memory blocks allocated
+    by Python, and, if tracemalloc is tracing (e.g. with `python -X tracemalloc`),
+    the change in allocated bytes. A positive change means that the measured
+    code left that much more memory alive.
+
+    Args:
+        kind: either "adapter" or "stage".
+        name: the name of the adapter or stage.
+        clocks: if False, the context manager does not measure times,
+                which are then `add`ed by the caller.
+    """
+
+    def __init__(self, kind, name, clocks = True):
+        self.kind = kind
+        self.name = name
+        self.clocks = clocks
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.blocks = 0
+        self.traced = None
+        # Set by the caller, if they make sense for what is measured.
+        self.rows = None
+        self.elements = None
+        # Time taken by parsing the mapping, for adapters.
+        self.mapping = None
+        # Of this process, when the measure ends.
+        self.peak_rss = None
+        self.rss = None
+
+    def add(self, wall, cpu):
+        self.wall += wall
+        self.cpu += cpu
+
+    def start(self):
+        self.started = (time.perf_counter(), time.process_time(), sys.getallocatedblocks(), traced())
+
+    def stop(self):
+        wall, cpu, blocks, nb_bytes = self.started
+        if self.clocks:
+            self.add(time.perf_counter() - wall, time.process_time() - cpu)
+        self.blocks += sys.getallocatedblocks() - blocks
+        if nb_bytes is not None and traced() is not None:
+            self.traced = (self.traced or 0) + traced() - nb_bytes
+        self.peak_rss = stream.peak_rss()[0]
+        self.rss = current_rss()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "wall_s": self.wall,
+            "cpu_s": self.cpu,
+            "rows": self.rows,
+            "elements": self.elements,
+            "mapping_s": self.mapping,
+            "rows_per_s": self.rows / self.wall if self.rows is not None and self.wall else None,
+            "elements_per_s": self.elements / self.wall if self.elements is not None and self.wall else None,
+            "peak_rss_mib": self.peak_rss,
+            "rss_mib": self.rss,
+            "allocated_blocks": self.blocks,
+            "allocated_mib": self.traced / 2**20 if self.traced is not None else None,
+        }
+
+
+class TimedFeeder:
+    """Measure the time taken by pushing tuples into a feeder (see `stream.Feeder`), that is: by the congregation.
+
+    It has the same `push`/`count`/`close` interface as the feeder it wraps.
+    Pushing is measured with clocks only, which costs next to nothing,
+    closing is fully measured.
+    """
+
+    def __init__(self, feeder, measure):
+        self.feeder = feeder
+        self.measure = measure
+
+    def __getattr__(self, name):
+        # Anything else is the feeder's (e.g. its `count`).
+        return getattr(self.feeder, name)
+
+    def push(self, biocypher_tuples):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self.feeder.push(biocypher_tuples)
+        self.measure.add(time.perf_counter() - wall, time.process_time() - cpu)
+
+    def close(self):
+        with self.measure:
+            return self.feeder.close()
+
+
+class Profiler:
+    """Gather the measures of a build, print them in a table and save them in JSON.
+
+    Example:
+        .. code-block:: python
+
+            profiler = Profiler()
+            with profiler.measure("stage", "fuse") as m:
+                fused = fuse(elements)
+                m.rows = len(elements)
+                m.elements = len(fused)
+            profiler.report()
+            profiler.save("profile.json")
+    """
+
+    def __init__(self):
+        self.measures = []
+        self.start = (time.perf_counter(), time.process_time())
+
+    def measure(self, kind, name, clocks = True):
+        """Return a new Measure, kept in this profiler."""
+        m = Measure(kind, name, clocks)
+        self.measures.append(m)
+        return m
+
+    def total(self):
+        wall, cpu = self.start
+        return {"wall_s": time.perf_counter() - wall, "cpu_s": time.process_time() - cpu}
+
+    def report(self, file = sys.stderr):
+        """Print a table of the measures."""
+        if not self.measures:
+            return
+
+        def number(x, fmt):
+            return format(x, fmt) if x is not None else "-"
+
+        width = max(len(f"{m.kind} {m.name}") for m in self.measures)
+        print(f"{'Part':<{width}}  {'Wall (s)':>9}  {'CPU (s)':>9}  {'Rows':>10}  {'Elements':>10}  {'Rows/s':>9}  {'Elem./s':>9}  {'Peak RSS (MiB)':>14}  {'Allocated blocks':>16}", file = file)
+        # Adapters first, then stages, in the order they were measured.
+        for m in sorted(self.measures, key = lambda m: m.kind != "adapter"):
+            d = m.as_dict()
+            print(f"{m.kind + ' ' + m.name:<{width}}"
+                  f"  {d['wall_s']:9.2f}  {d['cpu_s']:9.2f}"
+                  f"  {number(d['rows'], '10d'):>10}  {number(d['elements'], '10d'):>10}"
+                  f"  {number(d['rows_per_s'], '9.0f'):>9}  {number(d['elements_per_s'], '9.0f'):>9}"
+                  f"  {number(d['peak_rss_mib'], '14.0f'):>14}  {d['allocated_blocks']:+16d}", file = file)
+        total = self.total()
+        print(f"{'Total':<{width}}  {total['wall_s']:9.2f}  {total['cpu_s']:9.2f}", file = file)
+
+    def save(self, filename, **info):
+        """Save the measures in a JSON file, along with the given information."""
+        with open(filename, "w") as fd:
+            json.dump({
+                **info,
+                "total": self.total(),
+                "tracemalloc": tracemalloc.is_tracing(),
+                "adapters": [m.as_dict() for m in self.measures if m.kind == "adapter"],
+                "stages": [m.as_dict() for m in self.measures if m.kind == "stage"],
+            }, fd, indent = 4)
+
+
+class TransformerCounter:
+    """The calls, emitted items, delayed warnings and cumulative time of a transformer.
+
+    Args:
+        transformer: the counted transformer.
+        position: where it is declared, as "<mapping file>:<line>".
+    """
+
+    def __init__(self, transformer, position):
+        self.transformer = transformer
+        self.position = position
+        self.name = type(transformer).__name__
+        self.columns = ", ".join(str(c) for c in transformer.columns or [])
+        self.calls = 0
+        self.items = 0
+        self.time = 0.0
+        self.warnings = 0
+        self.warnings_before = self.delayed_warnings()
+
+    def delayed_warnings(self):
+        t = self.transformer
+        return sum(len(getattr(m, "delayed_warnings", [])) for m in [t, t.value_maker, t.label_maker, t.output_validator])
+
+    def state(self):
+        """The counts since the transformer was instrumented, to be `merge`d into another counter."""
+        return self.calls, self.items, self.time, self.warnings + self.delayed_warnings() - self.warnings_before
+
+    def merge(self, state):
+        calls, items, duration, warnings = state
+        self.calls += calls
+        self.items += items
+        self.time += duration
+        self.warnings += warnings
+
+
+# One counting subclass for each transformer class.
+counting_classes = {}
+
+def counting_class(cls):
+    """Return a subclass of the transformer class `cls`, counting the calls of its instances."""
+    if cls not in counting_classes:
+        def __call__(self, row, i):
+            counter = self.counter
+            counter.calls += 1
+            # Transformers are generators: only count the time spent in making each item.
+            start = time.perf_counter()
+            items = iter(cls.__call__(self, row, i))
+            while True:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    counter.time += time.perf_counter() - start
+                    return
+                counter.time += time.perf_counter() - start
+                counter.items += 1
+                yield item
+                start = time.perf_counter()
+
+        # Same name, so that error messages are unchanged.
+        counting_classes[cls] = type(cls.__name__, (cls,), {"__call__": __call__, "__module__": cls.__module__})
+    return counting_classes[cls]
+
+
+def yaml_entries(mapping_file):
+    """Return the (line, transformer type, fields) of each transformer declared in a YAML mapping.
+
+    The subject's entry comes first.
+    """
+    with open(mapping_file) as fd:
+        text = fd.read()
+    # The lines are in the nodes, the values in the loaded document.
+    root = yaml.compose(text)
+    ymapping = yaml.full_load(text)
+    nodes = {key.value: value for key, value in root.value}
+
+    def entry(node, item):
+        if not hasattr(item, "items"):
+            item = {item: {}}
+        kind, fields = next(iter(item.items()))
+        return node.start_mark.line + 1, kind, fields or {}
+
+    entries = []
+    for key in ontoweaver.base.MappingParser.k_row:
+        if key in ymapping:
+            entries.append(entry(nodes[key], ymapping[key]))
+            break
+    for key in ontoweaver.base.MappingParser.k_transformer:
+        for node, item in zip(nodes[key].value if key in nodes else [], ymapping.get(key) or []):
+            entries.append(entry(node, item))
+    return entries
+
+
+def instrument(mapping, mapping_file):
+    """Count the calls of the transformers of a parsed mapping.
+
+    The counted transformers are changed in place, the ones of a mapping
+    which is not instrumented run at their usual speed.
+
+    Returns:
+        A list of TransformerCounter, one for each transformer of the mapping.
+    """
+    def key(kind, columns, fields):
+        is_property = any(k in fields for k in ontoweaver.base.MappingParser.k_properties)
+        return kind, tuple(str(c) for c in columns or []), is_property
+
+    # Transformers are matched to the YAML entries on their type, columns,
+    # and whether they make properties. Same ones are in the order of the file.
+    positions = collections.defaultdict(list)
+    entries = yaml_entries(mapping_file)
+    name = os.path.basename(mapping_file)
+    for line, kind, fields in entries[1:]:
+        columns = next((fields[k] for k in ontoweaver.base.MappingParser.k_columns if k in fields), [])
+        if not isinstance(columns, list):
+            columns = [columns]
+        positions[key(kind, columns, fields)].append(f"{name}:{line}")
+
+    counters = []
+    for transformer in scan.mapping_transformers(mapping):
+        if hasattr(transformer, "counter"):
+            # Already instrumented.
+            continue
+        if transformer is mapping[0] and entries:
+            position = f"{name}:{entries[0][0]}"
+        else:
+            same = positions[key(type(transformer).__name__, transformer.columns, getattr(transformer, "kwargs", {}))]
+            position = same.pop(0) if same else f"{name}:?"
+        transformer.counter = TransformerCounter(transformer, position)
+        transformer.__class__ = counting_class(type(transformer))
+        counters.append(transformer.counter)
+    return counters
+
+
+def report_transformers(counters, file = sys.stderr):
+    """Print a table of the counted transformers, the slowest first."""
+    if not counters:
+        return
+    total = sum(c.time for c in counters)
+    rows = [(c.position, c.name, c.columns, *c.state()) for c in counters]
+    width = max(len(f"{position} {name}") for position, name, *_ in rows)
+    print(f"{'Transformer':<{width}}  {'Calls':>9}  {'Items':>9}  {'Warnings':>8}  {'Time (s)':>8}  {'us/call':>8}  {'Time %':>6}  Columns", file = file)
+    for position, name, columns, calls, items, duration, warnings in sorted(rows, key = lambda r: r[5], reverse = True):
+        per_call = 1e6 * duration / calls if calls else 0
+        share = 100 * duration / total if total else 0
+        print(f"{position + ' ' + name:<{width}}  {calls:9d}  {items:9d}  {warnings:8d}  {duration:8.2f}  {per_call:8.1f}  {share:6.1f}  {columns}", file = file)
@@ -0,0 +1,326 @@
+""" Read the input data quickly, and only the part of it that a mapping actually uses.
+"""
+import io
+import os
+import logging
+import concurrent.futures
+
+import pandas as pd
+import fastparquet
+
+import ontoweaver
+
+
+def transformer_properties(transformer):
+    """Return the transformers making the properties of a transformer."""
+    properties = []
+    if isinstance(transformer.properties_of, dict):
+        properties += list(transformer.properties_of)
+    if isinstance(transformer.branching_properties, dict):
+        for props in transformer.branching_properties.values():
+            if isinstance(props, dict):
+                properties += list(props)
+    # The properties of edges are held by the edge classes declared by the mapping.
+    for types in (transformer.multi_type_dict or {}).values():
+        for edge_t in [types.get("via_relation"), types.get("reverse_relation")]:
+            if edge_t is not None and isinstance(edge_t.fields(), dict):
+                properties += list(edge_t.fields())
+    return [prop for prop in properties if isinstance(prop, ontoweaver.base.Transformer)]
+
+
+def mapping_transformers(mapping):
+    """Return all the transformers of a parsed mapping (the subject's, the targets' and their properties'), each once."""
+    found = {}
+
+    def add(transformer):
+        if id(transformer) not in found:
+            found[id(transformer)] = transformer
+            for prop in transformer_properties(transformer):
+                add(prop)
+
+    for item in mapping:
+        if isinstance(item, ontoweaver.base.Transformer):
+            add(item)
+        elif isinstance(item, list):
+            for transformer in item:
+                if isinstance(transformer, ontoweaver.base.Transformer):
+                    add(transformer)
+    return list(found.values())
+
+
+def mapping_columns(mapping):
+    """Return the sorted list of the input columns used by a parsed mapping.
+
+    This includes the columns that the input validator checks,
+    and the ones on which the types of the elements are matched.
+    """
+    columns = set()
+    for transformer in mapping_transformers(mapping):
+        columns.update(transformer.columns or [])
+        # See translate_cat_format, whose columns are the fields of its format string.
+        columns.update(getattr(transformer.value_maker, "fields", []))
+        # See `match_type_from_column`, held by the label maker.
+        type_column = getattr(transformer.label_maker, "match_type_from_column", None)
+        if type_column is not None:
+            columns.add(type_column)
+    for item in mapping:
+        if isinstance(item, ontoweaver.validate.Validator) and item.validation_rules:
+            columns.update(item.validation_rules.columns)
+    return sorted(str(c) for c in columns)
+
+
+def subject_columns(mapping):
+    """Return the columns from which the subject of a parsed mapping is made."""
+    return [str(c) for c in (mapping[0].columns or [])]
+
+
+class Projection:
+    """A `usecols` callable for pandas' readers, keeping only the given columns.
+
+    The columns it rejects are kept in `skipped`, to be logged.
+
+    Example:
+        .. code-block:: python
+
+            usecols = Projection(mapping_columns(mapping) + ["treatment"])
+            table = pd.read_table(filename, usecols = usecols)
+            usecols.log(filename)
+
+    Args:
+        columns: the columns to keep, as named in the table once loaded.
+        renamed: the columns renamed after loading, as a {name in the file: name once loaded} dictionary.
+    """
+
+    def __init__(self, columns, renamed = {}):
+        names = {new: old for old, new in renamed.items()}
+        self.columns = set(names.get(c, c) for c in columns)
+        self.skipped = []
+
+    def __call__(self, column):
+        if column in self.columns:
+            return True
+        if column not in self.skipped:
+            self.skipped.append(column)
+        return False
+
+    def __repr__(self):
+        # Part of the cache's keys.
+        return f"Projection({sorted(self.columns)})"
+
+    def log(self, filename):
+        if self.skipped:
+            logging.debug(f"Skipped {len(self.skipped)} columns unused by the mapping in `{filename}`: {', '.join(str(c) for c in self.skipped)}")
+
+
+class ProgressReader(io.RawIOBase):
+    """A raw binary stream, calling `callback(nb_bytes)` each time some bytes are read."""
+
+    def __init__(self, raw, callback):
+        self.raw = raw
+        self.callback = callback
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        nb = self.raw.readinto(buffer)
+        if nb:
+            self.callback(nb)
+        return nb
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def read_table(filename, progress = None, sep = "\t", usecols = None, engine = "c", **kwargs):
+    """Read a (possibly compressed) tabular file in a single pandas.DataFrame.
+
+    The file is parsed in a single call, by pandas' C engine, or by the multi-threaded pyarrow engine.
+    Both engines give the same values: the temporal columns that pyarrow would parse
+    are kept as their text, and missing strings are NaN.
+
+    Args:
+        filename: the file to read.
+        progress: a function called with the number of bytes read (on disk) since its last call.
+        sep: the field separator.
+        usecols: the columns to read, either a list or a callable (see `Projection`), or None to read all of them.
+        engine: the parser, either "c" or "pyarrow" (which needs the pyarrow package).
+        kwargs: additional arguments passed to pandas.read_csv.
+    """
+    compression = pd.io.common.infer_compression(filename, "infer")
+
+    if engine == "pyarrow":
+        if callable(usecols):
+            # The pyarrow engine does not support callables, pass the list of selected columns.
+            header = pd.read_csv(filename, sep = sep, compression = compression, nrows = 0, **kwargs)
+            usecols = [c for c in header.columns if usecols(c)]
+        kwargs["engine"] = "pyarrow"
+    else:
+        kwargs["low_memory"] = False
+
+    raw = open(filename, "rb", buffering = 0)
+    if progress:
+        raw = ProgressReader(raw, progress)
+    with io.BufferedReader(raw, buffer_size = 2**20) as fd:
+        df = pd.read_csv(fd, sep = sep, compression = compression, usecols = usecols, **kwargs)
+
+    if engine == "pyarrow":
+        df = as_c_engine(df, filename, sep)
+    return df
+
+
+def as_c_engine(df, filename, sep):
+    """Make the values of a table read by the pyarrow engine the same as those of the C engine."""
+    import pyarrow
+    import pyarrow.csv
+    from pandas._libs.parsers import STR_NA_VALUES
+
+    # pyarrow parses dates, times and timestamps, the C engine keeps their text.
+    temporal = [c for c in df.columns
+        if pd.api.types.is_datetime64_any_dtype(df[c])
+        or pd.api.types.infer_dtype(df[c], skipna = True) in ("date", "time")]
+    if temporal:
+        logging.debug(f"Read the temporal columns of `{filename}` again, as text: {', '.join(temporal)}")
+        text = pyarrow.csv.read_csv(filename,
+            parse_options = pyarrow.csv.ParseOptions(delimiter = sep),
+            convert_options = pyarrow.csv.ConvertOptions(
+                include_columns = temporal,
+                column_types = {c: pyarrow.string() for c in temporal},
+                null_values = list(STR_NA_VALUES),
+                strings_can_be_null = True,
+            ),
+        ).to_pandas()
+        df[temporal] = text[temporal]
+
+    # Missing strings are None with pyarrow, NaN with the C engine.
+    strings = df.select_dtypes(include = "object").columns
+    df[strings] = df[strings].where(df[strings].notna(), float("nan"))
+    return df
+
+
+def read_filtered(filename, filters, progress = None, chunksize = 100000, sep = "\t", usecols = None, **kwargs):
+    """Read a (possibly compressed) tabular file by chunks, keeping only the rows passing all the filters.
+
+    Only the kept rows of each chunk are gathered, so that the memory taken
+    is proportional to the filtered table, not to the whole file.
+
+    Args:
+        filename: the file to read.
+        filters: a list of (name, function) pairs, each function taking a chunk
+                 and returning the rows to keep (possibly modified).
+                 Filters are applied in turn, put the ones dropping the most rows for the least work first.
+        progress: a function called with the number of bytes read (on disk) since its last call.
+        chunksize: the number of lines in a chunk.
+        sep: the field separator.
+        usecols: the columns to read, either a list or a callable (see `Projection`), or None to read all of them.
+        kwargs: additional arguments passed to pandas.read_csv.
+
+    Returns:
+        The filtered pandas.DataFrame, and a {filter name: number of dropped rows} dictionary.
+    """
+    compression = pd.io.common.infer_compression(filename, "infer")
+    dropped = {name: 0 for name, keep in filters}
+    kept = []
+
+    raw = open(filename, "rb", buffering = 0)
+    if progress:
+        raw = ProgressReader(raw, progress)
+    with io.BufferedReader(raw, buffer_size = 2**20) as fd:
+        for chunk in pd.read_csv(fd, sep = sep, compression = compression, usecols = usecols, chunksize = chunksize, low_memory = False, **kwargs):
+            for name, keep in filters:
+                nb = len(chunk)
+                chunk = keep(chunk)
+                dropped[name] += nb - len(chunk)
+            kept.append(chunk)
+
+    return pd.concat(kept, ignore_index = True), dropped
+
+
+def projection(mapping, also = [], renamed = {}):
+    """Return the `usecols` reading only the columns used by the mapping,
+    and `also` the ones needed before weaving (or None, if the mapping uses no column).
+    """
+    columns = mapping_columns(mapping)
+    if not columns:
+        return None
+    return Projection(columns + list(also), renamed)
+
+
+class Sampler:
+    """Keep the rows of a deterministic part of all the possible keys.
+
+    A row is kept if the seeded hash of its key falls in the first `percent`
+    of the hashes range. The same key is thus kept (or dropped) in every table
+    and at every run with the same seed, whatever the order of the rows,
+    so that a sub-sampled graph keeps all the data about the kept keys.
+
+    Rows without key columns are sampled on their position in the file.
+
+    It has the same interface as the filters of `read_filtered`.
+
+    Args:
+        percent: the percentage of keys to keep.
+        seed: changes the kept keys.
+        key: the columns making the key.
+    """
+
+    def __init__(self, percent, seed = 0, key = []):
+        self.percent = percent
+        # The hash key must be 16 characters.
+        self.hash_key = f"{seed:016d}"[-16:]
+        self.key = list(key)
+
+    def __call__(self, table):
+        key = [c for c in self.key if c in table.columns]
+        if key:
+            values = table[key].astype(str)
+        else:
+            values = pd.Series(table.index)
+        hashes = pd.util.hash_pandas_object(values, index = False, hash_key = self.hash_key)
+        return table[(hashes.to_numpy() % 1000000 < self.percent * 10000)]
+
+    def __repr__(self):
+        # Part of the cache's keys.
+        return f"Sampler({self.percent}, {self.hash_key}, {self.key})"
+
+
+def read_parquet_part(filename, columns = None, not_null = [], sampler = None):
+    if columns is not None:
+        # Parts may not all have the same columns.
+        available = fastparquet.ParquetFile(filename).columns
+        columns = [c for c in columns if c in available]
+    df = pd.read_parquet(filename, columns = columns)
+    if not_null:
+        # Filter each part as soon as it is read, so that
+        # the dropped rows are never concatenated.
+        df = df.dropna(subset = [c for c in not_null if c in df.columns])
+    if sampler:
+        df = sampler(df)
+    return df
+
+
+def read_parquet_dir(directory, columns = None, not_null = [], jobs = None, sampler = None):
+    """Read the parquet files of a directory, concurrently, in a single table.
+
+    Args:
+        directory: the directory holding the part files.
+        columns: the columns to read, or None to read all of them.
+        not_null: the columns in which a null value discards the row.
+        jobs: the number of files to read at the same time (default: as many as CPUs).
+        sampler: a `Sampler` applied to each part, or None.
+
+    Returns:
+        A pandas.DataFrame, holding the parts in the order of their file names.
+    """
+    parquet_files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.parquet'))
+    if not parquet_files:
+        return pd.DataFrame(columns = columns)
+
+    # Decompression and decoding release the GIL, threads are enough.
+    with concurrent.futures.ThreadPoolExecutor(jobs or os.cpu_count()) as executor:
+        parts = list(executor.map(lambda f: read_parquet_part(f, columns, not_null, sampler), parquet_files))
+
+    df = pd.concat(parts, ignore_index = True)
+    logging.debug(f"Read {len(df)} rows and {len(df.columns)} columns from {len(parquet_files)} parquet files in `{directory}`.")
+    return df
@@ -0,0 +1,213 @@
+""" Out-of-core congregation and fusion, for graphs that do not fit in memory.
+
+Instead of congregating all the woven tuples in a single dictionary,
+tuples are partitioned in files on disk (buckets), according to the hash
+of the key on which duplicates are detected. All the duplicates of an element
+are thus in the same bucket, and buckets can be congregated and fused
+one at a time, keeping only one of them in memory.
+
+Tuples are kept in the order in which they came within a bucket,
+so that each group of duplicates is fused exactly as it would be in memory.
+"""
+import os
+import zlib
+import pickle
+import logging
+
+import ontoweaver
+
+# Rough ratio between the memory taken by congregated elements
+# and the size of their pickled tuples on disk.
+EXPANSION = 10
+
+# Rough size of a pickled tuple, until some are written.
+TUPLE_BYTES = 200
+
+# Share of the memory budget that the tuples waiting to be written may take.
+PENDING_SHARE = 0.25
+
+
+def dump(fd, tuples):
+    pickler = pickle.Pickler(fd, protocol = pickle.HIGHEST_PROTOCOL)
+    pickler.dump(tuples)
+
+
+def load(filename):
+    """Yield the items of all the lists pickled in the given file."""
+    with open(filename, "rb") as fd:
+        while True:
+            try:
+                chunk = pickle.load(fd)
+            except EOFError:
+                return
+            yield from chunk
+
+
+class Buckets:
+    """Partition BioCypher tuples in files, and yield one Congregater per file.
+
+    It has the same `push`/`count`/`close` interface as a stream.Feeder,
+    and can be used in its place.
+
+    Iterating over Buckets yields a congregater for each bucket, in turn.
+    If a bucket would not fit in the memory budget, it is split again,
+    until it does (or until it holds a single key), and its file is removed.
+    Buckets can be iterated over several times.
+
+    Example:
+        .. code-block:: python
+
+            nodes = Buckets(ontoweaver.base.Node, ontoweaver.serialize.ID(), directory, 2**30)
+            for n,e in batches:
+                nodes.push(n)
+            nodes.close()
+            for congregater in nodes:
+                for fused in fusioner(congregater):
+                    ...
+    """
+
+    def __init__(self, elem_cls, serializer, directory, memory_budget, nb_buckets = 64, chunk_size = 10000):
+        """Constructor.
+
+        Args:
+            elem_cls: either ontoweaver.base.Node or ontoweaver.base.GenericEdge.
+            serializer: the ontoweaver.serialize.Serializer giving the key on which to detect duplicates.
+            directory: where to write the buckets' files.
+            memory_budget: the maximum memory (in bytes) that congregating a bucket should take.
+            nb_buckets: number of buckets at first.
+            chunk_size: maximum number of tuples to gather in memory before writing them in a bucket,
+                less if all the buckets' pending tuples would not fit in a share of the memory budget.
+        """
+        self.elem_cls = elem_cls
+        self.serializer = serializer
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.nb_buckets = nb_buckets
+        self.chunk_size = chunk_size
+        self.count = 0
+        # To estimate the memory taken by pending tuples.
+        self.dumped_bytes = 0
+        self.dumped_tuples = 0
+        self.flush_size = self.threshold()
+        # The files of the buckets that were split.
+        self.splits = {}
+
+        os.makedirs(directory, exist_ok = True)
+        self.files = [self.bucket_file(os.path.join(directory, elem_cls.__name__), b) for b in range(nb_buckets)]
+        self.fds = [open(f, "wb") for f in self.files]
+        self.pending = [[] for b in range(nb_buckets)]
+
+    def bucket_file(self, prefix, bucket):
+        return f"{prefix}_{bucket}.pickle"
+
+    def threshold(self):
+        """Number of tuples above which a bucket's pending tuples are written,
+        so that the pending tuples of all the buckets fit in PENDING_SHARE of the memory budget."""
+        tuple_bytes = self.dumped_bytes / self.dumped_tuples if self.dumped_tuples else TUPLE_BYTES
+        per_bucket = PENDING_SHARE * self.memory_budget / (self.nb_buckets * tuple_bytes * EXPANSION)
+        return max(1, min(self.chunk_size, int(per_bucket)))
+
+    def flush(self, fd, tuples):
+        """Write the tuples, and adjust the threshold to the size they took."""
+        start = fd.tell()
+        dump(fd, tuples)
+        self.dumped_bytes += fd.tell() - start
+        self.dumped_tuples += len(tuples)
+        self.flush_size = self.threshold()
+
+    def bucket(self, t, salt, nb_buckets):
+        key = str(self.elem_cls.from_tuple(t, serializer = self.serializer))
+        # Not Python's hash, which changes with each process (unless PYTHONHASHSEED is set).
+        return zlib.crc32(f"{salt}{key}".encode()) % nb_buckets
+
+    def push(self, biocypher_tuples):
+        """Add the given tuples into their buckets."""
+        for t in biocypher_tuples:
+            b = self.bucket(t, "", self.nb_buckets)
+            self.pending[b].append(t)
+            if len(self.pending[b]) >= self.flush_size:
+                self.flush(self.fds[b], self.pending[b])
+                self.pending[b] = []
+            self.count += 1
+
+    def close(self):
+        """Write the remaining tuples."""
+        for b, fd in enumerate(self.fds):
+            if self.pending[b]:
+                dump(fd, self.pending[b])
+            fd.close()
+        self.pending = []
+        self.fds = []
+        return self
+
+    def __iter__(self):
+        for filename in self.files:
+            yield from self.congregaters(filename, depth = 0)
+
+    def congregaters(self, filename, depth):
+        if filename in self.splits:
+            for f in self.splits[filename]:
+                yield from self.congregaters(f, depth + 1)
+            return
+
+        size = os.path.getsize(filename)
+        if size == 0:
+            return
+
+        if size * EXPANSION > self.memory_budget and depth < 8:
+            logging.debug(f"Split bucket `{filename}` ({size / 2**20:.0f} MiB on disk) in {self.nb_buckets}")
+            prefix = os.path.splitext(filename)[0]
+            files = [self.bucket_file(prefix, b) for b in range(self.nb_buckets)]
+            chunks = [[] for b in range(self.nb_buckets)]
+            fds = [open(f, "wb") for f in files]
+            for t in load(filename):
+                b = self.bucket(t, depth + 1, self.nb_buckets)
+                chunks[b].append(t)
+                if len(chunks[b]) >= self.flush_size:
+                    self.flush(fds[b], chunks[b])
+                    chunks[b] = []
+            for b, fd in enumerate(fds):
+                if chunks[b]:
+                    dump(fd, chunks[b])
+                fd.close()
+            # Its tuples are all in the new buckets.
+            os.unlink(filename)
+            self.splits[filename] = files
+            yield from self.congregaters(filename, depth)
+            return
+
+        congregater = ontoweaver.congregate.Congregate(self.elem_cls, self.serializer)
+        for e in congregater(load(filename)):
+            pass
+        yield congregater
+
+
+class Spool:
+    """A list-like store of BioCypher tuples on disk, that can only be appended to and iterated over.
+
+    Used to hold the fused elements, that may not fit in memory either.
+    """
+
+    def __init__(self, filename, chunk_size = 10000):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.pending = []
+        self.nb = 0
+        self.fd = open(filename, "wb")
+
+    def append(self, biocypher_tuple):
+        self.pending.append(biocypher_tuple)
+        self.nb += 1
+        if len(self.pending) >= self.chunk_size:
+            dump(self.fd, self.pending)
+            self.pending = []
+
+    def __len__(self):
+        return self.nb
+
+    def __iter__(self):
+        if self.pending:
+            dump(self.fd, self.pending)
+            self.pending = []
+        self.fd.flush()
+        yield from load(self.filename)
@@ -0,0 +1,62 @@
+""" Stream woven elements into OntoWeaver's congregaters, without gathering them in lists first.
+"""
+import sys
+import resource
+
+from collections import deque
+
+
+class Feeder:
+    """Push BioCypher tuples, one batch at a time, into an ontoweaver.congregate.Congregater.
+
+    A Congregater consumes an iterable in a single call.
+    The Feeder calls it once, on a source that yields whatever has just been
+    pushed, and advances the congregation of one element for each pushed tuple.
+    This allows to congregate nodes and edges at the same time, from the same
+    stream of (nodes, edges) batches, without keeping more than one batch in memory.
+
+    Example:
+        .. code-block:: python
+
+            nodes = Feeder(ontoweaver.congregate.Nodes(ontoweaver.serialize.ID()))
+            edges = Feeder(ontoweaver.congregate.Edges(ontoweaver.serialize.edge.SourceTargetLabel()))
+            for n,e in batches:
+                nodes.push(n)
+                edges.push(e)
+            nodes.close()
+            edges.close()
+    """
+
+    def __init__(self, congregater):
+        self.congregater = congregater
+        self.pending = deque()
+        self.count = 0
+        self.consumer = congregater(self._source())
+
+    def _source(self):
+        # Only called when something has just been pushed,
+        # stops (and thus ends the congregation) when called on an empty queue.
+        while self.pending:
+            yield self.pending.popleft()
+
+    def push(self, biocypher_tuples):
+        """Congregate the given tuples."""
+        for t in biocypher_tuples:
+            self.pending.append(t)
+            next(self.consumer)
+            self.count += 1
+
+    def close(self):
+        """Ends the congregation, returns the congregater."""
+        for e in self.consumer:
+            pass
+        return self.congregater
+
+
+def peak_rss():
+    """Peak resident memory of this process and of its (finished) children, in MiB."""
+    # ru_maxrss is in KiB on Linux, but in bytes on macOS.
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return own / 2**20, children / 2**20
@@ -1,9 +1,172 @@
+import os
 import logging
 import pandas as pd
 import re
+import string
 
 import ontoweaver
 
+from oncodashkb import cache
+
+
+def loader_arguments(kwargs, discard = []):
+    """Keep only the user-passed arguments that are not in possible YAML keywords,
+    those are for the function loading the translations file.
+    """
+    # Possible arguments from the `translate` section.
+    mapping_args = ["translations", "translations_file", "translate_from", "translate_to"]
+    # Possible Python attributes.
+    mapping_args += ["subclass"]
+    # Discard match
+    mapping_args += ["match"]
+    mapping_args += discard
+    # All possible arguments found in a YAML mapping.
+    for attr in dir(ontoweaver.base.MappingParser):
+        if re.match("^k_", attr):
+            mapping_args += getattr(ontoweaver.base.MappingParser, attr)
+
+    more_args = {k:v for k,v in kwargs.items() if k not in mapping_args}
+    if 'sep' in more_args and more_args['sep'] == 'TAB': # FIXME why the fuck is this changed somehow?
+        more_args['sep'] = '\t'
+    return more_args
+
+
+def build_translations(df, translate_from, translate_to, translations_file = None, nb_examples = 5):
+    """Make a translation dictionary from two columns of a DataFrame, without iterating over its rows.
+
+    Pairs having an empty source or target are ignored.
+    If a source is given several targets, the last one is used.
+
+    Args:
+        df: the pandas.DataFrame holding the translations.
+        translate_from: The column containing what to replace.
+        translate_to: The column containing the replacement string.
+        translations_file: where the DataFrame comes from, for the warnings.
+        nb_examples: how many problematic values are shown in the warnings.
+
+    Returns:
+        The dictionary and a list of warnings summarizing the invalid pairs and duplicated sources.
+    """
+    frm = df[translate_from]
+    to = df[translate_to]
+    warnings = []
+
+    valid = frm.astype(bool) & to.astype(bool)
+    if not valid.all():
+        invalid = df.index[~valid]
+        examples = ", ".join(f"row {i}: `{f}` => `{t}`" for i,f,t in zip(invalid[:nb_examples], frm[~valid], to[~valid]))
+        warnings.append(f"Cannot translate from `{translate_from}` to `{translate_to}`, {len(invalid)} invalid translations values in file `{translations_file}` ({examples}{', …' if len(invalid) > nb_examples else ''}). I will ignore those translations.")
+
+    pairs = pd.DataFrame({"frm": frm[valid], "to": to[valid]})
+
+    try:
+        targets = pairs.groupby("frm", sort = False)["to"].nunique()
+        compared = pairs
+    except TypeError:
+        # Unhashable targets (e.g. lists read from a parquet file), compare their representations.
+        compared = pairs.assign(to = pairs["to"].map(repr))
+        targets = compared.groupby("frm", sort = False)["to"].nunique()
+    conflicts = targets.index[targets > 1]
+    if len(conflicts) > 0:
+        examples = ", ".join(f"`{k}` => `{'`|`'.join(str(t) for t in compared.loc[compared.frm == k, 'to'].unique())}`" for k in conflicts[:nb_examples])
+        warnings.append(f"{len(conflicts)} keys have several translations in the translation table of file `{translations_file}`, only the last one is used ({examples}{', …' if len(conflicts) > nb_examples else ''}). You may want to avoid such duplicates in translation tables.")
+
+    last = pairs.drop_duplicates(subset = "frm", keep = "last")
+    return dict(zip(last["frm"], last["to"])), warnings
+
+
+class TranslationTables:
+    """Process-wide registry of the translation tables loaded from files.
+
+    Several transformers (and several mappings) use the same translations file
+    with the same columns, this loads and parses it only once per process.
+
+    Tables are identified by the file (path and modification time),
+    the source and target columns, and the arguments passed to the loader.
+
+    The warnings raised while building a table are kept along with it,
+    and returned again to each transformer using the table.
+
+    If the `oncodashkb.cache` is enabled, tables are also kept across runs.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, translations_file, translate_from, translate_to, loader_args):
+        path = os.path.realpath(translations_file)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            # Let the loader complain.
+            mtime = None
+        # Loader arguments may be lists (e.g. `usecols`), hence not hashable.
+        args = repr(sorted(loader_args.items()))
+        return (path, mtime, translate_from, translate_to, args)
+
+    def get(self, transformer, translations_file, translate_from, translate_to, **loader_args):
+        """Return the translation dictionary from the given file,
+        and the list of warnings raised while building it.
+
+        Args:
+            transformer: the transformer asking for the table, used to report errors.
+            translations_file: A filename pointing to a tabular file readable by an ontoweaver.loader.
+            translate_from: The column in the file containing what to replace.
+            translate_to: The column in the file containing the replacement string.
+            loader_args: Additional arguments to pass to the loader.
+        """
+        key = self.key(translations_file, translate_from, translate_to, loader_args)
+        if key in self.tables:
+            self.hits += 1
+            logging.debug(f"\t\t\tTranslation table from `{translations_file}` already loaded.")
+            translate, warnings = self.tables[key]
+        else:
+            self.misses += 1
+            translate, warnings = cache.load("translation", [translations_file],
+                lambda: self.load(transformer, translations_file, translate_from, translate_to, **loader_args),
+                params = (translate_from, translate_to, key[-1]))
+            self.tables[key] = (translate, warnings)
+
+        return translate, warnings
+
+    def load(self, transformer, translations_file, translate_from, translate_to, **loader_args):
+        lpf = ontoweaver.loader.LoadPandasFile()
+        lpd = ontoweaver.loader.LoadPandasDataframe()
+        lrf = ontoweaver.loader.LoadOWLFile()
+        lrg = ontoweaver.loader.LoadOWLGraph()
+
+        df = pd.DataFrame()
+        for with_loader in [lpf, lpd, lrf, lrg]:
+            if with_loader.allows([translations_file]):
+                logging.debug(f"\t\t\tUsing loader: {type(with_loader).__name__}")
+                df = with_loader.load([translations_file], **loader_args)
+                break
+
+        logging.debug(f"Columns in the translation file:{df.columns}")
+
+        if df.empty:
+            transformer.error(f"I was not able to load a valid translations_file from: `{translations_file}`")
+
+        logging.debug(f"Loaded a DataFrame: {df}")
+
+        if translate_from not in df.columns:
+            transformer.error(f"Source column `{translate_from}` not found in {type(transformer).__name__} transformer’s translations file `{translations_file}`, available headers: `{','.join(df.columns)}`.", section="translate.init", exception = ontoweaver.exceptions.TransformerDataError)
+
+        if translate_to not in df.columns:
+            transformer.error(f"Target column `{translate_to}` not found in {type(transformer).__name__} transformer’s translations file `{translations_file}`, available headers: `{','.join(df.columns)}`.", section="translate.init", exception = ontoweaver.exceptions.TransformerDataError)
+
+        return build_translations(df, translate_from, translate_to, translations_file)
+
+    def log_stats(self):
+        if self.hits or self.misses:
+            logging.info(f"Translation tables: {self.misses} loaded, {self.hits} reused.")
+
+
+# Shared by all the translation transformers of this process.
+translation_tables = TranslationTables()
+
 
 class translate_cat_format(ontoweaver.base.Transformer):
 
@@ -21,11 +184,25 @@ class translate_cat_format(ontoweaver.base.Transformer):
             self.translate_from = translate_from
             self.translate_to = translate_to
             self.format_string = format_string
+            # The columns referenced by the format string, e.g. "{hugoSymbol}:{gene_role}" => ["hugoSymbol", "gene_role"].
+            self.fields = self.parse_fields(format_string) if format_string else []
             super().__init__(raise_errors)
 
+        @staticmethod
+        def parse_fields(format_string):
+            fields = []
+            for literal, field, spec, conversion in string.Formatter().parse(format_string):
+                if field:
+                    # Only the column name, without attribute or index access.
+                    name = re.split(r"[.\[]", field, maxsplit = 1)[0]
+                    if name not in fields:
+                        fields.append(name)
+            return fields
+
         def __call__(self, columns, row, i):
 
-            translated_row = row.copy()
+            # Only the columns used by the format string, instead of a copy of the whole row.
+            translated_row = {field: row[field] for field in self.fields if field in row}
             for key in self.column_to_translate:
                 if key not in row:
                     self.error(f"Column '{key}' not found in data", section="translate_cat_format", 
@@ -59,12 +236,8 @@ class translate_cat_format(ontoweaver.base.Transformer):
 
         # self.map = map(properties_of, label_maker, branching_properties, columns, output_validator, multi_type_dict)
 
-        lpf = ontoweaver.loader.LoadPandasFile()
-        lpd = ontoweaver.loader.LoadPandasDataframe()
-        lrf = ontoweaver.loader.LoadOWLFile()
-        lrg = ontoweaver.loader.LoadOWLGraph()
-
         # Since we cannot expand kwargs, let's recover what we have inside.
+        warnings = []
         self.translations = kwargs.get("translations", None)
         self.translations_file = kwargs.get("translations_file", None)
         self.translate_from = kwargs.get("translate_from", None)
@@ -83,55 +256,12 @@ class translate_cat_format(ontoweaver.base.Transformer):
             if not self.translate_to:
                 self.error(f"No translation target column declared for the `{type(self).__name__}` transformer using translations_file=`{self.translations_file}`, did you forget to add a `translate_to` keyword?", section="translate.init", exception = ontoweaver.exceptions.TransformerInterfaceError)
             else:
-
-                # Possible arguments from the `translate` section.
-                mapping_args = ["translations", "translations_file", "translate_from", "translate_to"]
-                # Possible Python attributes.
-                mapping_args += ["subclass"]
-                # Discard match
-                mapping_args += ["match"]
                 # Discard columns to translate
-                mapping_args += ["column_to_translate", "format_string"]
-                # All possible arguments found in a YAML mapping.
-                for attr in dir(ontoweaver.base.MappingParser):
-                    if re.match("^k_", attr):
-                        mapping_args += getattr(ontoweaver.base.MappingParser, attr)
-
-                # Keep only the user-passed arguments that are not in possible YAML keywords.
-                more_args = {k:v for k,v in kwargs.items() if k not in mapping_args}
-                if more_args['sep'] == 'TAB': # FIXME why the fuck is this changed somehow?
-                    more_args['sep'] = '\t'
+                more_args = loader_arguments(kwargs, ["column_to_translate", "format_string"])
 
                 logging.debug(f"\t\t\tAdditional user-passed arguments for the load function: {more_args}")
 
-                self.df = pd.DataFrame()
-                for with_loader in [lpf, lpd, lrf, lrg]:
-                    if with_loader.allows([self.translations_file]):
-                        logging.debug(f"\t\t\tUsing loader: {type(with_loader).__name__}")
-                        self.df = with_loader.load([self.translations_file], **more_args)
-                        break
-
-                if self.df.empty:
-                    self.error(f"I was not able to load a valid translations_file from: `{self.translations_file}`")
-
-                logging.debug(f"Loaded a DataFrame: {self.df}")
-
-                if self.translate_from not in self.df.columns:
-                    self.error(f"Source column `{self.translate_from}` not found in {type(self).__name__} transformer’s translations file `{self.translations_file}`, available headers: `{','.join(self.df.columns)}`.", section="translate.init", exception = ontoweaver.exceptions.TransformerDataError)
-
-                if self.translate_to not in self.df.columns:
-                    self.error(f"Target column `{self.translate_to}` not found in {type(self).__name__} transformer’s translations file `{self.translations_file}`, available headers: `{','.join(self.df.columns)}`.", section="translate.init", exception = ontoweaver.exceptions.TransformerDataError)
-
-                self.translate = {}
-                for i,row in self.df.iterrows():
-                    frm = row[self.translate_from]
-                    to = row[self.translate_to]
-                    if frm in self.translate and self.translate[frm] != to:
-                        self.delay_warning(f"The key `{frm}` already exists in the translation table, and translated to `{self.translate[frm]}`. It now translates to `{to}`. You may want to avoid such duplicates in translation tables.")
-                    if frm and to:
-                        self.translate[frm] = to
-                    else:
-                        self.delay_warning(f"Cannot translate frm `{self.translate_from}` to `{self.translate_to}`, invalid translations values at row {i} of file `{self.translations_file}`: `{frm}` => `{to}`. I will ignore this translation.")
+                self.translate, warnings = translation_tables.get(self, self.translations_file, self.translate_from, self.translate_to, **more_args)
 
         else:
             self.error(f"When using a {type(self).__name__} transformer, you must define either `translations` or `translations_file`.", section="translate.init", exception = ontoweaver.exceptions.TransformerInterfaceError)
@@ -169,16 +299,57 @@ class translate_cat_format(ontoweaver.base.Transformer):
             **kwargs
         )
 
+        # Only now that the ErrorManager is initialized.
+        for msg in warnings:
+            self.delay_warning(msg)
+
 class translate_sample_ids(ontoweaver.base.Transformer):
     """Translate the targeted cell value using a tabular mapping and yield a node with using the translated ID."""
 
     class ValueMaker(ontoweaver.make_value.ValueMaker):
+        # The patient part of a sample ID.
+        patient_id = re.compile("^([A-Z]+[0-9]+)")
+
+        # Marks the cells in which no patient ID was found.
+        NOT_AN_ID = object()
+
         def __init__(self, translate, translate_from, translate_to, raise_errors: bool = True):
             self.translate = translate
             self.translate_from = translate_from
             self.translate_to = translate_to
+            # Translations of the cells already seen, None if the patient ID is not in the table.
+            self.translated = {}
             super().__init__(raise_errors)
 
+        def translate_cell(self, cell):
+            patient_id_search = self.patient_id.search(cell)
+            if not patient_id_search:
+                return self.NOT_AN_ID
+            publication_patient_id = self.translate.get(patient_id_search.group(0), None)
+            if publication_patient_id is None:
+                return None
+            return publication_patient_id + cell[patient_id_search.end():]
+
+        def translate_cells(self, cells):
+            """Translate a whole column at once.
+
+            Each distinct sample ID is translated only once, with vectorized string operations,
+            and the results are kept to be served to the rows later on.
+
+            Args:
+                cells: a pandas.Series of sample IDs.
+            """
+            uniq = pd.Series([c for c in pd.unique(cells) if isinstance(c, str) and c not in self.translated], dtype = object)
+            if uniq.empty:
+                return
+            found = uniq.str.extract(self.patient_id, expand = False)
+            publication = found.map(self.translate)
+            suffix = uniq.str.replace(self.patient_id, "", n = 1, regex = True)
+            translated = (publication + suffix).astype(object)
+            translated[publication.isna()] = None
+            translated[found.isna()] = self.NOT_AN_ID
+            self.translated.update(zip(uniq, translated))
+
         def __call__(self, columns, row, i):
 
             # here key will be sample_id
@@ -187,16 +358,18 @@ class translate_sample_ids(ontoweaver.base.Transformer):
                     self.error(f"Column '{key}' not found in data", section="translate", 
                                exception = ontoweaver.exceptions.TransformerDataError)
                 cell = row[key]
-                patient_id_search = re.search("^([A-Z]+[0-9]+)", cell)
-                if patient_id_search:
-                    patient_id = patient_id_search.group(0)
+                if isinstance(cell, str):
+                    if cell not in self.translated:
+                        self.translated[cell] = self.translate_cell(cell)
+                    translation = self.translated[cell]
                 else:
+                    # Missing values (NaN) hold no patient ID, and each one is a distinct key.
+                    translation = self.NOT_AN_ID
+
+                if translation is self.NOT_AN_ID:
                     logging.error(f"Row {i} does not contain something to be translated from `{self.translate_from}` to `{self.translate_to}` in the sample id `{key}`.")
-                if patient_id in self.translate:
-                    publication_patient_id = self.translate[patient_id]
-                    yield re.sub(pattern = "^([A-Z]+[0-9]+)",
-                                 repl = publication_patient_id,
-                                 string = cell)
+                elif translation is not None:
+                    yield translation
                 else:
                     # logging.warning(f"VALUE TO TRANSLATE: {key}")
                     self.delay_warning(f"Row {i} does not contain something to be translated from `{self.translate_from}` to `{self.translate_to}` at column `{key}`.")
@@ -234,12 +407,8 @@ class translate_sample_ids(ontoweaver.base.Transformer):
 
         # self.map = map(properties_of, label_maker, branching_properties, columns, output_validator, multi_type_dict, **kwargs)
 
-        lpf = ontoweaver.loader.LoadPandasFile()
-        lpd = ontoweaver.loader.LoadPandasDataframe()
-        lrf = ontoweaver.loader.LoadOWLFile()
-        lrg = ontoweaver.loader.LoadOWLGraph()
-
         # Since we cannot expand kwargs, let's recover what we have inside.
+        warnings = []
         self.translations = kwargs.get("translations", None)
         self.translations_file = kwargs.get("translations_file", None)
         self.translate_from = kwargs.get("translate_from", None)
@@ -262,54 +431,11 @@ class translate_sample_ids(ontoweaver.base.Transformer):
                 # self.translate_from = translate_from
                 # self.translate_to = translate_to
 
-                # Possible arguments from the `translate` section.
-                mapping_args = ["translations", "translations_file", "translate_from", "translate_to"]
-                # Possible Python attributes.
-                mapping_args += ["subclass"]
-                # Discard match
-                mapping_args += ["match"]
-                # All possible arguments found in a YAML mapping.
-                for attr in dir(ontoweaver.base.MappingParser):
-                    if re.match("^k_", attr):
-                        mapping_args += getattr(ontoweaver.base.MappingParser, attr)
-
-                # Keep only the user-passed arguments that are not in possible YAML keywords.
-                more_args = {k:v for k,v in kwargs.items() if k not in mapping_args}
-                if 'sep' in  more_args and more_args['sep'] == 'TAB': # FIXME why the fuck is this changed somehow?
-                    more_args['sep'] = '\t'
+                more_args = loader_arguments(kwargs)
 
                 logging.debug(f"\t\t\tAdditional user-passed arguments for the load function: {more_args}")
 
-                self.df = pd.DataFrame()
-                for with_loader in [lpf, lpd, lrf, lrg]:
-                    if with_loader.allows([self.translations_file]):
-                        logging.debug(f"\t\t\tUsing loader: {type(with_loader).__name__}")
-                        self.df = with_loader.load([self.translations_file], **more_args)
-                        break
-                
-                logging.debug(f"Columns in the translation file:{self.df.columns}")
-
-                if self.df.empty:
-                    self.error(f"I was not able to load a valid translations_file from: `{self.translations_file}`")
-
-                logging.debug(f"Loaded a DataFrame: {self.df}")
-
-                if self.translate_from not in self.df.columns:
-                    self.error(f"Source column `{self.translate_from}` not found in {type(self).__name__} transformer’s translations file `{self.translations_file}`, available headers: `{','.join(self.df.columns)}`.", section="translate.init", exception = exceptions.TransformerDataError)
-
-                if self.translate_to not in self.df.columns:
-                    self.error(f"Target column `{self.translate_to}` not found in {type(self).__name__} transformer’s translations file `{self.translations_file}`, available headers: `{','.join(self.df.columns)}`.", section="translate.init", exception = exceptions.TransformerDataError)
-
-                self.translate = {}
-                for i,row in self.df.iterrows():
-                    frm = row[self.translate_from]
-                    to = row[self.translate_to]
-                    if frm in self.translate and self.translate[frm] != to:
-                        self.delay_warning(f"The key `{frm}` already exists in the translation table, and translated to `{self.translate[frm]}`. It now translates to `{to}`. You may want to avoid such duplicates in translation tables.")
-                    if frm and to:
-                        self.translate[frm] = to
-                    else:
-                        self.delay_warning(f"Cannot translate frm `{self.translate_from}` to `{self.translate_to}`, invalid translations values at row {i} of file `{self.translations_file}`: `{frm}` => `{to}`. I will ignore this translation.")
+                self.translate, warnings = translation_tables.get(self, self.translations_file, self.translate_from, self.translate_to, **more_args)
 
         else:
             self.error(f"When using a {type(self).__name__} transformer, you must define either `translations` or `translations_file`.", section="translate.init", exception = ontoweaver.exceptions.TransformerInterfaceError)
@@ -335,7 +461,21 @@ class translate_sample_ids(ontoweaver.base.Transformer):
             raise_errors=raise_errors,
             **kwargs
         )
-        
+
+        # Only now that the ErrorManager is initialized.
+        for msg in warnings:
+            self.delay_warning(msg)
+
+    def prepare(self, table):
+        """Translate the columns of the whole table at once, before the rows are processed.
+
+        Args:
+            table: the pandas.DataFrame that is going to be woven.
+        """
+        for key in self.columns or []:
+            if key in table.columns:
+                self.value_maker.translate_cells(table[key])
+
     def __call__(self, row, i):
         """
         Process a row and yield cell values as node IDs.
@@ -351,7 +491,115 @@ class translate_sample_ids(ontoweaver.base.Transformer):
             Warning: If the cell value or the translation is invalid.
         """
         if not self.columns:
-            self.error(f"No column declared for the {type(self).__name__} transformer, did you forgot to add a `columns` keyword?", section="translate", exception = exceptions.TransformerDataError)
+            self.error(f"No column declared for the {type(self).__name__} transformer, did you forgot to add a `columns` keyword?", section="translate", exception = ontoweaver.exceptions.TransformerDataError)
 
         for item in super().__call__(row, i):
-            yield item
\ No newline at end of file
+            yield item
+
+class translate(ontoweaver.transformer.translate):
+    """OntoWeaver's `translate` transformer, loading its translations file through the `translation_tables`.
+
+    It is registered in place of OntoWeaver's one, so that the transformers
+    using the same translations file share a single table.
+    """
+
+    def __init__(self,
+            properties_of,
+            label_maker = None,
+            branching_properties = None,
+            columns=None,
+            output_validator: ontoweaver.validate.OutputValidator = None,
+            multi_type_dict = None,
+            raise_errors = True,
+            **kwargs
+        ):
+        warnings = []
+        translations_file = kwargs.get("translations_file", None)
+        translate_from = kwargs.get("translate_from", None)
+        translate_to = kwargs.get("translate_to", None)
+        # Otherwise, let OntoWeaver's translate complain.
+        if translations_file and translate_from and translate_to and not kwargs.get("translations", None):
+            # For the errors raised while loading, before the ErrorManager is initialized.
+            self.raise_errors = raise_errors
+            more_args = loader_arguments(kwargs, ["on_unknown_value"])
+            logging.debug(f"\t\t\tAdditional user-passed arguments for the load function: {more_args}")
+            translations, warnings = translation_tables.get(self, translations_file, translate_from, translate_to, **more_args)
+            if not translations:
+                self.error("No translation found, did you forget the `translations` keyword?", section="translate.init", exception = ontoweaver.exceptions.TransformerInterfaceError)
+
+            if "on_unknown_value" not in kwargs:
+                ontoweaver.logger.warning("You did not specify how a translate transformer" \
+                    f" (`{translate_from}` => `{translate_to}`) should" \
+                    " handle values that are not in translate tables." \
+                    " The default is to `on_unknown_value: skip` them.")
+                kwargs["on_unknown_value"] = "skip"
+
+            # OntoWeaver's translate uses the given table as is.
+            kwargs = {k: v for k, v in kwargs.items() if k != "translations_file"}
+            kwargs["translations"] = translations
+
+        super().__init__(properties_of,
+            label_maker,
+            branching_properties,
+            columns,
+            output_validator,
+            multi_type_dict,
+            raise_errors=raise_errors,
+            **kwargs
+        )
+        self.translations_file = translations_file
+
+        # Only now that the ErrorManager is initialized.
+        for msg in warnings:
+            self.delay_warning(msg)
+
+
+class split_translate(ontoweaver.transformer.split_translate):
+    """OntoWeaver's `split_translate` transformer, translating with the project's `translate`."""
+
+    def __init__(self,
+        properties_of,
+        label_maker = None,
+        branching_properties = None,
+        columns=None,
+        output_validator: ontoweaver.validate.OutputValidator = None,
+        multi_type_dict = None,
+        raise_errors = True,
+        separator = None,
+        **kwargs
+    ):
+        self.split = ontoweaver.transformer.split(
+            properties_of,
+            label_maker,
+            branching_properties,
+            columns,
+            output_validator,
+            multi_type_dict,
+            raise_errors=raise_errors,
+            separator = separator,
+            **kwargs,
+        )
+
+        self.translate = translate(
+            properties_of,
+            label_maker,
+            branching_properties,
+            columns,
+            output_validator,
+            multi_type_dict,
+            raise_errors=raise_errors,
+            **kwargs,
+        )
+
+        # Not OntoWeaver's split_translate.__init__, which would load the translations file again.
+        ontoweaver.base.Transformer.__init__(self,
+            properties_of,
+            self.split.value_maker,
+            label_maker,
+            branching_properties,
+            columns,
+            output_validator,
+            multi_type_dict,
+            raise_errors=raise_errors,
+            **kwargs
+        )
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+""" Benchmark weave.py on synthetic data, at several scales.
+
+Each run is made in its own directory, holding a copy of weave.py, of the `oncodashkb`
+package and of the `config` directory, taken from the given checkout,
+and a `data` link to the synthetic data (see `tests/synthetic_data.py`).
+This is because weave.py and the mappings use paths relative to the current directory,
+and so that any version of the code can be benchmarked on the same data.
+
+The time taken by each stage is measured from the time at which weave.py logs
+the start and the end of the stage (with `--verbose INFO`):
+    - startup: before the first adapter (imports, BioCypher's ontology),
+    - for each adapter: load (reading the input files) and weave,
+    - weave: all the adapters, including the congregation,
+      which is done while the adapters' elements come,
+    - fuse: the fusion of the duplicated elements,
+    - write: the export of the graph in files.
+The memory is measured by the peak RSS that weave.py logs after each stage,
+and the CPU time and peak RSS of the whole process by the operating system.
+
+Results are saved in JSON, along with the version of the code, so that versions can be compared:
+
+    .. code-block:: sh
+
+        python3 tests/benchmark.py --scales 1 10 --repeat 3 --output before.json
+        git checkout my_branch
+        python3 tests/benchmark.py --scales 1 10 --repeat 3 --output after.json
+        python3 tests/benchmark.py --compare before.json after.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import glob
+import shutil
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import subprocess
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, here)
+import synthetic_data
+
+# The inputs of weave.py, as: (option, mapping, path in the data directory).
+INPUTS = [
+    ("--clinical", "clinical.yaml", f"{synthetic_data.DECIDER}/clinical_export.xlsx"),
+    ("--short-mutations-local", "short_mutations_local.yaml", f"{synthetic_data.DECIDER}/short_mutations_local.csv"),
+    ("--structural-variants-2", "structural_variants_2.yaml", f"{synthetic_data.DECIDER}/structural_variants_2.csv"),
+    ("--short-mutations-external", "short_mutations_external.yaml", f"{synthetic_data.DECIDER}/short_mutations_external.csv"),
+    ("--copy-number-amplifications-local", "copy_number_amplifications_local.yaml", f"{synthetic_data.DECIDER}/cnas_local.csv"),
+    ("--copy-number-amplifications-external", "copy_number_amplifications_external.yaml", f"{synthetic_data.DECIDER}/cnas_external.csv"),
+    ("--structural-variants", "structural_variants.yaml", f"{synthetic_data.DECIDER}/structural_variants.xlsx"),
+    ("--oncokb", "oncokb.yaml", f"{synthetic_data.DECIDER}/treatments_oncokb.csv"),
+    ("--omnipath-networks", "omnipath_networks.yaml", "omnipath_networks/omnipath_webservice_interactions__latest.tsv.gz"),
+    ("--open-targets-drug-molecule", "open_targets_drug_molecule.yaml", "OT/drug_molecule/"),
+    ("--open-targets-drug_mechanism_of_action", "open_targets_drug_mechanism_of_action.yaml", "OT/drug_mechanism_of_action/"),
+    ("--open-targets-target", "open_targets_target.yaml", "OT/target/"),
+    ("--oncokb-gene-status", "oncokb_gene_status.yaml", f"{synthetic_data.DECIDER}/oncokb_gene_status_info.csv"),
+]
+
+# Log messages of weave.py marking the stages.
+ADAPTER = re.compile(r"#+ Adapter #\d+/\d+: (\S+) #+")
+WOVE = re.compile(r" \| OK, wove: (\d+) nodes, (\d+) edges")
+PEAK_RSS = re.compile(r"Peak RSS after (.+): (\d+) MiB \(worker processes: (\d+) MiB\)")
+FUSED = re.compile(r"Fused into (\d+) nodes and (\d+) edges")
+MARKS = {
+    "load": " |  | Load",
+    "weave": " |  | Process ",
+    "fuse": "Reconciliate properties in elements",
+    "fused": "Fused into ",
+    "write": "Write the final SKG into files",
+    "wrote": "OK, wrote files.",
+}
+
+
+def version(checkout):
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd = checkout,
+            capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def prepare(checkout, data_dir, run_dir):
+    """Make a directory in which weave.py can run on the data, and return the options of its inputs."""
+    shutil.copy(os.path.join(checkout, "weave.py"), run_dir)
+    for directory in ["oncodashkb", "config"]:
+        shutil.copytree(os.path.join(checkout, directory), os.path.join(run_dir, directory),
+            ignore = shutil.ignore_patterns("__pycache__"))
+    os.symlink(os.path.abspath(data_dir), os.path.join(run_dir, "data"))
+
+    # As prepare.sh does.
+    adapters_dir = os.path.join(run_dir, "oncodashkb", "adapters")
+    for template in glob.glob(os.path.join(adapters_dir, "template__*.yaml")):
+        with open(template) as fd:
+            mapping = fd.read().replace("{{{DECIDER_DIR}}}", f"data/{synthetic_data.DECIDER}")
+        with open(os.path.join(adapters_dir, os.path.basename(template).replace("template__", "")), "w") as fd:
+            fd.write(mapping)
+
+    options = []
+    for option, mapping, path in INPUTS:
+        if not os.path.exists(os.path.join(adapters_dir, mapping)):
+            logging.warning(f"Mapping `{mapping}` not found in the checkout, `{option}` will not be benchmarked.")
+        elif not os.path.exists(os.path.join(data_dir, path)):
+            logging.warning(f"Data `{path}` not found, `{option}` will not be benchmarked.")
+        else:
+            options += [option, os.path.join("data", path)]
+    return options
+
+
+def parse(lines):
+    """Compute the stages' durations from the (time, line) logged by weave.py."""
+    adapters = {}
+    peak_rss = {}
+    counts = {}
+    marks = {}
+    # Adapters are started before they are announced (and are loaded at that time),
+    # the marks seen since the end of the previous adapter are thus the ones of the next one.
+    pending = {}
+    adapter = None
+    for t, line in lines:
+        if m := ADAPTER.search(line):
+            adapter = {"start": pending.get("load", t), **pending}
+            adapters[m.group(1)] = adapter
+            marks.setdefault("adapters", adapter["start"])
+            pending = {}
+        elif m := WOVE.search(line):
+            if adapter:
+                adapter["end"] = t
+                adapter["nodes"], adapter["edges"] = int(m.group(1)), int(m.group(2))
+            adapter = None
+        elif m := PEAK_RSS.search(line):
+            peak_rss[m.group(1)] = int(m.group(2))
+            marks.setdefault(m.group(1), t)
+        elif m := FUSED.search(line):
+            counts["nodes"], counts["edges"] = int(m.group(1)), int(m.group(2))
+        for mark, text in MARKS.items():
+            if text in line:
+                if mark in ("load", "weave"):
+                    (adapter if adapter is not None else pending).setdefault(mark, t)
+                else:
+                    marks.setdefault(mark, t)
+
+    for name, a in adapters.items():
+        end = a.get("end", a["start"])
+        timing = {"total": end - a["start"], "nodes": a.get("nodes"), "edges": a.get("edges")}
+        if "load" in a and "weave" in a:
+            timing["load"] = a["weave"] - a["load"]
+            timing["weave"] = end - a["weave"]
+        adapters[name] = timing
+
+    def between(start, end):
+        if start in marks and end in marks:
+            return marks[end] - marks[start]
+        return None
+
+    stages = {
+        "startup": marks.get("adapters"),
+        "weave": between("adapters", "weaving and congregation"),
+        "fuse": between("fuse", "fused"),
+        "write": between("write", "wrote"),
+    }
+    return stages, adapters, peak_rss, counts
+
+
+def run(run_dir, options, python, extra, log_file):
+    """Run weave.py and return its measurements."""
+    command = [python, "weave.py", "--verbose", "INFO"] + options + extra
+    logging.debug(" ".join(command))
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    lines = []
+    with subprocess.Popen(command, cwd = run_dir, stdout = subprocess.PIPE, stderr = subprocess.PIPE, text = True) as process:
+        for line in process.stderr:
+            lines.append((time.perf_counter() - start, line.rstrip("\n")))
+            log_file.write(line)
+        stdout = process.stdout.read()
+    wall = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    if process.returncode != 0:
+        logging.error(f"weave.py failed with code {process.returncode}, see its log in `{log_file.name}`.")
+
+    stages, adapters, peak_rss, counts = parse(lines)
+
+    # weave.py prints the import script, in the output directory.
+    output_bytes = 0
+    if process.returncode == 0 and stdout.strip():
+        output_dir = os.path.dirname(os.path.join(run_dir, stdout.strip().splitlines()[-1]))
+        output_bytes = sum(os.path.getsize(f) for f in glob.glob(os.path.join(output_dir, "**"), recursive = True) if os.path.isfile(f))
+
+    return {
+        "returncode": process.returncode,
+        "wall": wall,
+        "cpu_user": after.ru_utime - before.ru_utime,
+        "cpu_system": after.ru_stime - before.ru_stime,
+        # ru_maxrss is in KiB on Linux, and the maximum of all the children so far.
+        "max_rss_mib": after.ru_maxrss / 1024,
+        "stages": stages,
+        "adapters": adapters,
+        "peak_rss_mib": peak_rss,
+        "fused": counts,
+        "output_bytes": output_bytes,
+    }
+
+
+def summary(runs):
+    """Return the median of the stages' durations over the successful runs."""
+    ok = [r for r in runs if r["returncode"] == 0]
+    if not ok:
+        return {}
+    medians = {"wall": statistics.median(r["wall"] for r in ok),
+               "cpu": statistics.median(r["cpu_user"] + r["cpu_system"] for r in ok),
+               "max_rss_mib": max(r["max_rss_mib"] for r in ok)}
+    for stage in ok[0]["stages"]:
+        durations = [r["stages"][stage] for r in ok if r["stages"].get(stage) is not None]
+        if durations:
+            medians[stage] = statistics.median(durations)
+    for name in ok[0]["adapters"]:
+        durations = [r["adapters"][name]["total"] for r in ok if name in r["adapters"]]
+        medians[f"adapter:{name}"] = statistics.median(durations)
+    return medians
+
+
+def compare(files, out = sys.stdout):
+    """Print the median durations of the results files side by side, for each scale."""
+    results = []
+    for filename in files:
+        with open(filename) as fd:
+            results.append(json.load(fd))
+
+    names = [r["version"] for r in results]
+    scales = sorted({s for r in results for s in r["summary"]}, key = float)
+    for scale in scales:
+        print(f"Scale {scale}:", file = out)
+        print(f"    {'measure':<45}" + "".join(f"{n:>22}" for n in names), file = out)
+        measures = []
+        for r in results:
+            measures += [m for m in r["summary"].get(scale, {}) if m not in measures]
+        for measure in measures:
+            values = [r["summary"].get(scale, {}).get(measure) for r in results]
+            cells = []
+            for v in values:
+                if v is None:
+                    cells.append(f"{'-':>22}")
+                elif values[0]:
+                    cells.append(f"{v:>13.2f} ({v / values[0]:5.2f}x)")
+                else:
+                    cells.append(f"{v:>22.2f}")
+            print(f"    {measure:<45}" + "".join(cells), file = out)
+
+
+if __name__ == "__main__":
+    usage = "Benchmark each stage of weave.py on synthetic data, at several scales, and save the results in JSON."
+    parser = argparse.ArgumentParser(description = usage)
+
+    parser.add_argument("-c", "--checkout", metavar = "DIR", default = os.path.join(here, ".."),
+                        help = "The source code to benchmark [default: this one].")
+
+    parser.add_argument("-d", "--data-dir", metavar = "DIR", default = "benchmark_data",
+                        help = "Where to generate the synthetic data, in a sub-directory for each scale (existing data are reused) [default: %(default)s].")
+
+    parser.add_argument("-x", "--scales", metavar = "FACTOR", type = float, nargs = "+", default = [1],
+                        help = "The scales of the synthetic data, e.g. 1 10 100 [default: 1].")
+
+    parser.add_argument("-r", "--repeat", metavar = "N", type = int, default = 1,
+                        help = "Run each scale N times, the summary holds the median durations [default: %(default)s].")
+
+    parser.add_argument("-s", "--seed", metavar = "SEED", type = int, default = 0,
+                        help = "Seed of the synthetic data generator [default: %(default)s].")
+
+    parser.add_argument("-p", "--python", metavar = "EXE", default = sys.executable,
+                        help = "The Python interpreter running weave.py [default: this one].")
+
+    parser.add_argument("-o", "--output", metavar = "JSON", default = "benchmark.json",
+                        help = "The results file [default: %(default)s].")
+
+    parser.add_argument("-k", "--keep", action = "store_true",
+                        help = "Do not remove the runs' directories (holding weave.py's logs and outputs).")
+
+    parser.add_argument("-C", "--compare", metavar = "JSON", nargs = "+",
+                        help = "Do not run anything, but compare the given results files, relatively to the first one.")
+
+    parser.add_argument("-v", "--verbose", choices = ["DEBUG", "INFO", "WARNING", "ERROR"], default = "INFO",
+                        help = "Set the verbose level [default: %(default)s].")
+
+    parser.add_argument("weave_args", metavar = "-- ARGS", nargs = argparse.REMAINDER,
+                        help = "Additional arguments passed to weave.py, after a `--` (e.g. `-- --fusion-backend columnar`).")
+
+    asked = parser.parse_args()
+    logging.basicConfig(level = asked.verbose, format = "%(message)s")
+
+    if asked.compare:
+        compare(asked.compare)
+        sys.exit(0)
+
+    extra = [a for a in asked.weave_args if a != "--"]
+    checkout = os.path.abspath(asked.checkout)
+    results = {
+        "version": version(checkout),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": {"system": platform.system(), "cpus": os.cpu_count()},
+        "weave_args": extra,
+        "runs": [],
+        "summary": {},
+    }
+
+    for scale in asked.scales:
+        data_dir = os.path.join(asked.data_dir, f"scale_{scale:g}")
+        if not os.path.exists(os.path.join(data_dir, "synthetic.json")):
+            logging.info(f"Generate synthetic data at scale {scale:g} in `{data_dir}`...")
+            synthetic_data.generate(data_dir, scale, asked.seed)
+
+        runs = []
+        for repeat in range(asked.repeat):
+            run_dir = tempfile.mkdtemp(prefix = f"oncodashkb_benchmark_{scale:g}_")
+            options = prepare(checkout, data_dir, run_dir)
+            logging.info(f"Run #{repeat + 1}/{asked.repeat} at scale {scale:g} in `{run_dir}`...")
+            with open(os.path.join(run_dir, "weave.log"), "w") as log_file:
+                measures = run(run_dir, options, asked.python, extra, log_file)
+            measures.update({"scale": scale, "repeat": repeat})
+            logging.info(f" | {measures['wall']:.2f}s, {measures['max_rss_mib']:.0f} MiB: "
+                + ", ".join(f"{s} {d:.2f}s" for s, d in measures["stages"].items() if d is not None))
+            runs.append(measures)
+            if not asked.keep:
+                shutil.rmtree(run_dir)
+
+        results["runs"] += runs
+        results["summary"][f"{scale:g}"] = summary(runs)
+
+    with open(asked.output, "w") as fd:
+        json.dump(results, fd, indent = 4)
+    logging.info(f"Results saved in `{asked.output}`.")
+
+    if any(r["returncode"] != 0 for r in results["runs"]):
+        sys.exit(1)
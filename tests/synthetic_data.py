@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+""" Generate synthetic versions of all the input files of weave.py, at a given scale.
+
+The files are laid out as `prepare.sh` does in `data/`, so that weave.py can run on them
+without the confidential DECIDER data, for instance to benchmark it (see `tests/benchmark.py`).
+
+The columns of each table are the ones used by the adapters' mappings and checked by their validators.
+Values follow the validators' types and checks, and the values expected by the mappings
+(booleans, translations, match types). Identifiers are shared across tables
+(patients, samples, genes, mutations, drugs), so that the translations work
+and the fusion finds as many duplicates as on the real data.
+Genes, mutations and drugs follow a power law, so that some of them are hub nodes.
+
+Example:
+    .. code-block:: sh
+
+        python3 tests/synthetic_data.py --scale 10 --output data_synthetic
+"""
+import os
+import sys
+import json
+import string
+import logging
+import argparse
+import importlib.util
+
+import yaml
+import numpy as np
+import pandas as pd
+
+here = os.path.dirname(os.path.abspath(__file__))
+adapters_dir = os.path.join(here, "..", "oncodashkb", "adapters")
+validators_dir = os.path.join(here, "..", "oncodashkb", "validators")
+
+# The name of the DECIDER snapshot, in the output directory.
+DECIDER = "DECIDER_synthetic"
+
+# The part of the drug molecules hardcoded as a translation table in the mappings.
+DRUG_MOLECULE_PART = "part-00000-871f412e-aec4-4d33-a50d-feee532ddcd2-c000.snappy.parquet"
+
+COHORT_CODE = "Patient card::Patient cohort code_Patient Card"
+PUBLICATION_CODE = "Patient card::Publication code"
+
+# The DECIDER tables, as: (file, mapping, validator, number of rows at scale 1, columns renamed in the file).
+DECIDER_TABLES = [
+    ("short_mutations_local.csv", "template__short_mutations_local.yaml", "short_mutations_local.yaml", 20000, {}),
+    ("short_mutations_external.csv", "template__short_mutations_external.yaml", "short_mutations_external.yaml", 20000, {}),
+    ("cnas_local.csv", "template__copy_number_amplifications_local.yaml", "copy_number_amplification_local.yaml", 10000, {}),
+    ("cnas_external.csv", "template__copy_number_amplifications_external.yaml", "copy_number_amplifications_external.yaml", 10000, {}),
+    ("structural_variants_2.csv", "template__structural_variants_2.yaml", None, 5000, {}),
+    ("structural_variants.xlsx", "template__structural_variants.yaml", None, 2000, {"Gene_type": "Gene.type"}),
+    ("treatments_oncokb.csv", "oncokb.yaml", None, 5000, {}),
+    ("oncokb_gene_status_info.csv", "oncokb_gene_status.yaml", None, 2000, {"Gene_type": "Gene.type"}),
+]
+
+# Number of rows at scale 1 of the other inputs.
+NB_PATIENTS = 100
+NB_GENES = 2000
+NB_MUTATIONS = 5000
+NB_DRUGS = 500
+NB_INTERACTIONS = 20000
+NB_MECHANISMS = 2000
+
+# Fraction of missing values in nullable columns.
+NULLS = 0.05
+
+CHROMOSOMES = np.array([str(c) for c in range(1, 23)] + ["X"])
+BASES = np.array(list("ACTG"))
+SAMPLE_SITES = np.array(["_pOme1", "_pOvaR1", "_iOme1", "_iAsc1", "_rPer1", "_rAsc1"])
+
+
+def zipf(rng, nb, size, exponent = 1.1):
+    """Draw `size` indices in [0, nb), the first ones being way more frequent than the last ones."""
+    weights = 1.0 / np.arange(1, nb + 1) ** exponent
+    return rng.choice(nb, size = size, p = weights / weights.sum())
+
+
+def words(prefix, nb):
+    return np.array([f"{prefix}_{i}" for i in range(nb)], dtype = object)
+
+
+class Universe:
+    """The identifiers shared by all the tables."""
+
+    def __init__(self, rng, scale):
+        self.rng = rng
+
+        nb_patients = max(1, int(NB_PATIENTS * scale))
+        self.patients = np.array([f"SYN{i:04d}" for i in range(nb_patients)], dtype = object)
+        self.publications = np.array([f"PUB{i:04d}" for i in range(nb_patients)], dtype = object)
+
+        # There are only so many genes and drugs.
+        nb_genes = int(min(NB_GENES * scale, 40000))
+        self.genes = np.array([f"SG{i}" for i in range(nb_genes)], dtype = object)
+        self.ensembl = np.array([f"ENSG{i:011d}" for i in range(nb_genes)], dtype = object)
+
+        nb_mutations = int(NB_MUTATIONS * scale)
+        self.mutation_genes = zipf(rng, nb_genes, nb_mutations)
+        self.chromosomes = rng.choice(CHROMOSOMES, nb_mutations)
+        self.positions = rng.integers(10000, 200000000, nb_mutations)
+        refs = rng.integers(0, len(BASES), nb_mutations)
+        self.refs = BASES[refs]
+        # Never the same base as the reference.
+        self.alts = BASES[(refs + rng.integers(1, len(BASES), nb_mutations)) % len(BASES)]
+
+        nb_drugs = int(min(NB_DRUGS * scale, 10000))
+        syllables = ["ola", "nira", "ruca", "tala", "beva", "carbo", "pacli", "doce", "gem", "trame", "dabra", "vemu", "sora", "suni", "pazo", "lenva", "cabo", "ima", "erlo", "gefi"]
+        suffixes = ["parib", "tinib", "mab", "platin", "taxel"]
+        names = [f"{a}{b}{s}" for s in suffixes for a in syllables for b in syllables if a != b]
+        rng.shuffle(names)
+        self.drugs = np.array([names[i % len(names)] + (str(i // len(names)) if i >= len(names) else "") for i in range(nb_drugs)], dtype = object)
+        self.chembl = np.array([f"CHEMBL{100000 + i}" for i in range(nb_drugs)], dtype = object)
+
+
+class Rows:
+    """The identifiers of the rows of a table: each row is about a patient's sample, and a mutation in a gene."""
+
+    def __init__(self, universe, nb):
+        rng = universe.rng
+        patient = rng.integers(0, len(universe.patients), nb)
+        self.patient = universe.patients[patient]
+        self.sample = self.patient + rng.choice(SAMPLE_SITES, nb)
+        mutation = zipf(rng, len(universe.mutation_genes), nb)
+        gene = universe.mutation_genes[mutation]
+        self.gene = universe.genes[gene]
+        self.ensembl = universe.ensembl[gene]
+        self.chromosome = universe.chromosomes[mutation]
+        self.position = universe.positions[mutation]
+        self.ref = universe.refs[mutation]
+        self.alt = universe.alts[mutation]
+
+    def mutations(self, sep = ":"):
+        return self.gene + ":chr" + self.chromosome + ":" + self.position.astype(str) + ":" + self.ref + sep + self.alt
+
+
+def drug_lists(universe, nb, sep, upper = False):
+    """Lists of one to three drugs, as in OncoKB's treatments."""
+    rng = universe.rng
+    names = universe.drugs if upper else np.array([d.capitalize() for d in universe.drugs], dtype = object)
+    lists = names[zipf(rng, len(names), nb)]
+    for i in range(2):
+        more = rng.random(nb) < 0.3
+        lists[more] = lists[more] + sep + names[zipf(rng, len(names), more.sum())]
+    return lists
+
+
+# Generators for the regular expressions checked by the validators, as {pattern: function(universe, rows, nb)}.
+PATTERNS = {
+    r"^chr[\d|X]+$": lambda u, r, nb: "chr" + r.chromosome,
+    r"^[ACTG]+$": lambda u, r, nb: u.rng.choice(BASES, nb),
+    r"^[a-zA-Z0-9-,]+$": lambda u, r, nb: r.gene,
+    r"^[a-zA-Z0-9-]+$": lambda u, r, nb: r.gene,
+    r"^[a-zA-Z0-9-,]+:chr[\d|X|Y]{1,2}:\d+:[ACTG]+:[ACTG]+$": lambda u, r, nb: r.mutations(":"),
+    r"^[a-zA-Z0-9-,]+:chr[\d|X|Y]{1,2}:\d+:[ACTG]+>[ACTG]+$": lambda u, r, nb: r.mutations(">"),
+    r"^[0-9]{7,}(,[0-9]{7,})*$": lambda u, r, nb: pmids(u.rng, nb, ","),
+    r"^[0-9]{7,}(?:,(?:[0-9]{6,}|\s[0-9]{6,}))*$": lambda u, r, nb: pmids(u.rng, nb, ", "),
+    r"^[ABCD]\([^\d]+\)$": lambda u, r, nb: u.rng.choice(np.array(list("ABCD"), dtype = object), nb) + "(evidence)",
+}
+
+# Generators for the columns holding identifiers, as {column: function(universe, rows, nb)}.
+IDENTIFIERS = {
+    "patient_id": lambda u, r, nb: r.patient,
+    "patient": lambda u, r, nb: r.patient,
+    "sample_id": lambda u, r, nb: r.sample,
+    "sample": lambda u, r, nb: r.sample,
+    "hugoSymbol": lambda u, r, nb: r.gene,
+    "gene": lambda u, r, nb: r.gene,
+    "primary_gene": lambda u, r, nb: r.gene,
+    "ensembl_id": lambda u, r, nb: r.ensembl,
+    "chromosome": lambda u, r, nb: "chr" + r.chromosome,
+    "position": lambda u, r, nb: r.position,
+    "reference_allele": lambda u, r, nb: r.ref,
+    "sample_allele": lambda u, r, nb: r.alt,
+    # Upper-cased by weave.py.
+    "treatment": lambda u, r, nb: drug_lists(u, nb, ";") + np.where(u.rng.random(nb) < 0.2, ";", ""),
+    # Upper-cased by weave.py, which also removes what is in parentheses. Combinations are joined by "+".
+    "Drugs": lambda u, r, nb: drug_lists(u, nb, ",") + np.where(u.rng.random(nb) < 0.2, " (inhibitor)", "")
+                              + np.where(u.rng.random(nb) < 0.2, "," + drug_lists(u, nb, "+"), ""),
+    # Semicolons are replaced by commas in weave.py.
+    "mutation": lambda u, r, nb: np.where(u.rng.random(nb) < 0.7, "deletion", "duplication;inversion"),
+}
+
+# Generators for the columns that the validators do not check, as {column: function(universe, rows, nb)}.
+DEFAULTS = {
+    # OncoKB's alterations are the same as the short mutations (SNV) or the amplified genes (CNA).
+    "alteration": lambda u, r, nb: np.where(u.rng.random(nb) < 0.7, r.mutations(":"), r.gene + ":AMPLIFICATION"),
+    # Semicolons are replaced by commas in the mapping.
+    "citations": lambda u, r, nb: pmids(u.rng, nb, ";"),
+    "GoF_LoF": lambda u, r, nb: u.rng.choice(np.array(["GoF", "LoF"], dtype = object), nb),
+}
+
+
+def pmids(rng, nb, sep):
+    one = rng.integers(1000000, 40000000, nb).astype(str).astype(object)
+    two = rng.integers(1000000, 40000000, nb).astype(str).astype(object)
+    return np.where(rng.random(nb) < 0.5, one, one + sep + two)
+
+
+def named_columns(node):
+    """Return the columns named in a transformer's YAML."""
+    listed = node.get("columns") or []
+    if isinstance(listed, str):
+        listed = [listed]
+    return [c for c in [node.get("column"), node.get("id_from_column")] + list(listed) if isinstance(c, str)]
+
+
+def harvest(node, columns):
+    """Gather the input columns of a mapping, with the values the mapping expects in them, if any.
+
+    Args:
+        node: a part of the parsed YAML mapping.
+        columns: a {column: list of values} dictionary, updated in place.
+    """
+    def expect(column, values):
+        expected = columns.setdefault(column, [])
+        expected += [v for v in values if v not in expected]
+
+    if isinstance(node, dict):
+        for column in named_columns(node):
+            columns.setdefault(column, [])
+        if "format_string" in node:
+            for text, field, spec, conversion in string.Formatter().parse(node["format_string"]):
+                if field:
+                    columns.setdefault(field, [])
+        if "consider_true" in node or "consider_false" in node:
+            for column in named_columns(node):
+                expect(column, list(node.get("consider_true") or []) + list(node.get("consider_false") or []))
+        if isinstance(node.get("translations"), dict):
+            for column in node.get("column_to_translate") or named_columns(node):
+                expect(column, list(node["translations"]))
+        if "match_type_from_column" in node:
+            expect(node["match_type_from_column"], [list(m)[0] for m in node.get("match", [])])
+        for value in node.values():
+            harvest(value, columns)
+    elif isinstance(node, list):
+        for value in node:
+            harvest(value, columns)
+
+
+def load_mapping(mapping_file, decider_dir):
+    with open(os.path.join(adapters_dir, mapping_file)) as fd:
+        return yaml.safe_load(fd.read().replace("{{{DECIDER_DIR}}}", decider_dir))
+
+
+def schema(mapping, validator_file = None):
+    """Return the columns of a table, as a {column: (values expected by the mapping, validator's rules)} dictionary.
+
+    If the validator is strict, the table has only the columns it checks
+    (and the ones used by the mapping), otherwise the ones of the mapping come first.
+    """
+    columns = {}
+    harvest({k: mapping[k] for k in ("row", "transformers") if k in mapping}, columns)
+    if validator_file:
+        with open(os.path.join(validators_dir, validator_file)) as fd:
+            validate = yaml.safe_load(fd)["validate"]
+    else:
+        validate = mapping.get("validate", {})
+
+    rules = validate.get("columns", {}) or {}
+    names = list(columns) + [c for c in rules if c not in columns]
+    return {c: (columns.get(c, []), rules.get(c, {}) or {}) for c in names}
+
+
+def column_values(name, values, rules, universe, rows, nb):
+    """Make the values of a column, from the most specific information to the least."""
+    rng = universe.rng
+    checks = rules.get("checks", {}) or {}
+    if name in IDENTIFIERS:
+        column = IDENTIFIERS[name](universe, rows, nb)
+    elif values:
+        column = rng.choice(np.array(values, dtype = object), nb)
+    elif "isin" in checks:
+        isin = checks["isin"]
+        column = rng.choice(np.array(isin["value"] if isinstance(isin, dict) else isin, dtype = object), nb)
+    elif "str_matches" in checks:
+        pattern = checks["str_matches"]
+        if pattern not in PATTERNS:
+            logging.warning(f"No generator for the pattern `{pattern}` of column `{name}`, values will not match.")
+            column = words(name, 50)[zipf(rng, 50, nb)]
+        else:
+            column = PATTERNS[pattern](universe, rows, nb)
+    elif name in DEFAULTS:
+        column = DEFAULTS[name](universe, rows, nb)
+    elif rules.get("dtype") == "int64":
+        column = rng.integers(0, 100, nb)
+    elif rules.get("dtype") == "float64":
+        column = rng.random(nb).round(4)
+    else:
+        column = words(name, 50)[zipf(rng, 50, nb)]
+
+    if rules.get("nullable", False):
+        column = pd.Series(column, dtype = object)
+        column[rng.random(nb) < NULLS] = None
+    return column
+
+
+def make_table(mapping, validator_file, universe, nb):
+    rows = Rows(universe, nb)
+    return pd.DataFrame({name: column_values(name, values, rules, universe, rows, nb)
+        for name, (values, rules) in schema(mapping, validator_file).items()})
+
+
+def make_clinical(mapping, universe):
+    """The clinical sheet: one row per patient, the first columns being those of the translation table."""
+    nb = len(universe.patients)
+    rows = Rows(universe, nb)
+    table = pd.DataFrame({COHORT_CODE: universe.patients, PUBLICATION_CODE: universe.publications})
+    for name, (values, rules) in schema(mapping).items():
+        if name not in table.columns:
+            table[name] = column_values(name, values, rules, universe, rows, nb)
+    return table
+
+
+def make_hgnc(universe):
+    nb = len(universe.genes)
+    ensembl = pd.Series(universe.ensembl, dtype = object)
+    # Some genes have no Ensembl ID.
+    ensembl[universe.rng.random(nb) < NULLS] = None
+    return pd.DataFrame({
+        "hgnc_id": [f"HGNC:{i + 1}" for i in range(nb)],
+        "symbol": universe.genes,
+        "name": [f"synthetic gene {i}" for i in range(nb)],
+        "locus_group": universe.rng.choice(["protein-coding gene", "non-coding RNA", "pseudogene"], nb, p = [0.8, 0.15, 0.05]),
+        "ensembl_gene_id": ensembl,
+    })
+
+
+def make_omnipath(universe, nb):
+    rng = universe.rng
+    # Interactions are mostly between proteins, some with unknown or lower-cased symbols.
+    symbols = np.concatenate([universe.genes, words("UNKNOWN", len(universe.genes) // 20 + 1)])
+    tables = {}
+    for side in ["source", "target"]:
+        symbol = symbols[zipf(rng, len(symbols), nb)]
+        lower = rng.random(nb) < 0.05
+        symbol[lower] = np.array([s.lower() for s in symbol[lower]], dtype = object)
+        tables[side] = "UPR" + pd.Series(symbol).str.replace("_", "")
+        tables[f"{side}_genesymbol"] = symbol
+        tables[f"entity_type_{side}"] = rng.choice(["protein", "complex", "small_molecule"], nb, p = [0.9, 0.07, 0.03])
+        tables[f"ncbi_tax_id_{side}"] = rng.choice([9606, 10090, 10116], nb, p = [0.85, 0.1, 0.05])
+    for flag in ["is_directed", "is_stimulation", "is_inhibition", "consensus_direction", "consensus_stimulation", "consensus_inhibition"]:
+        tables[flag] = rng.integers(0, 2, nb)
+    tables["type"] = rng.choice(["post_translational", "transcriptional", "mirna_transcriptional"], nb)
+    tables["curation_effort"] = rng.integers(0, 20, nb)
+    tables["references"] = np.array([f"SIGNOR:{p}" for p in rng.integers(1000000, 40000000, nb)], dtype = object)
+    tables["sources"] = rng.choice(["SIGNOR", "SIGNOR;SignaLink3", "KEGG;SIGNOR;SPIKE"], nb)
+    tables["n_references"] = rng.integers(1, 10, nb)
+    tables["n_sources"] = rng.integers(1, 4, nb)
+    return pd.DataFrame(tables)
+
+
+def make_open_targets(universe, nb_mechanisms):
+    """The targets, drug molecules and drugs mechanisms of action of Open Targets, as pandas.DataFrame."""
+    rng = universe.rng
+    nb_genes = len(universe.genes)
+    nb_drugs = len(universe.drugs)
+    target = pd.DataFrame({
+        "id": universe.ensembl,
+        "approvedSymbol": universe.genes,
+        "approvedName": [f"synthetic gene {i}" for i in range(nb_genes)],
+        "biotype": rng.choice(["protein_coding", "lncRNA", "miRNA"], nb_genes, p = [0.8, 0.15, 0.05]),
+        "transcriptIds": [[f"ENST{i:011d}", f"ENST{i + nb_genes:011d}"] for i in range(nb_genes)],
+        "proteinIds": [[{"id": f"UPR{g.replace('_', '')}", "source": "uniprot_swissprot"}] for g in universe.genes],
+    })
+    drug_molecule = pd.DataFrame({
+        "id": universe.chembl,
+        "name": universe.drugs,
+        "drugType": rng.choice(["Small molecule", "Antibody", "Protein"], nb_drugs, p = [0.8, 0.15, 0.05]),
+        "maximumClinicalTrialPhase": rng.choice([1.0, 2.0, 3.0, 4.0], nb_drugs),
+        "isApproved": rng.random(nb_drugs) < 0.4,
+        "synonyms": [[d.capitalize(), f"{d}-{i}"] for i, d in enumerate(universe.drugs)],
+        "tradeNames": [[d.capitalize() + "x"] for d in universe.drugs],
+        "description": [f"Synthetic drug {d}" for d in universe.drugs],
+    })
+    drugs = zipf(rng, nb_drugs, nb_mechanisms)
+    targets = zipf(rng, nb_genes, nb_mechanisms)
+    drug_mechanism_of_action = pd.DataFrame({
+        "actionType": rng.choice(["INHIBITOR", "ANTAGONIST", "AGONIST", "BLOCKER"], nb_mechanisms),
+        "mechanismOfAction": [f"{universe.genes[t]} inhibitor" for t in targets],
+        "chemblIds": [[universe.chembl[d]] for d in drugs],
+        "targetName": [f"synthetic gene {t}" for t in targets],
+        "targetType": rng.choice(["single protein", "protein complex"], nb_mechanisms, p = [0.9, 0.1]),
+        "targets": [[universe.ensembl[t]] for t in targets],
+        "references": [[{"source": "PubMed", "ids": [str(p)], "urls": [f"http://europepmc.org/abstract/MED/{p}"]}]
+                       for p in rng.integers(1000000, 40000000, nb_mechanisms)],
+    })
+    return {"target": target, "drug_molecule": drug_molecule, "drug_mechanism_of_action": drug_mechanism_of_action}
+
+
+def write_parquet(table, directory, rows_per_part, first_part = None):
+    """Write a table in parts, as Open Targets does."""
+    os.makedirs(directory, exist_ok = True)
+    nested = [c for c in table.columns if len(table) and isinstance(table[c].iloc[0], (list, dict))]
+    if nested and not importlib.util.find_spec("pyarrow"):
+        # fastparquet cannot write nested types.
+        logging.warning(f"pyarrow is not installed, nested columns are written as JSON strings: {', '.join(nested)}")
+        table = table.assign(**{c: table[c].map(json.dumps) for c in nested})
+    nb_parts = max(1, -(-len(table) // rows_per_part))
+    for p in range(nb_parts):
+        name = first_part if p == 0 and first_part else f"part-{p:05d}-synthetic-c000.snappy.parquet"
+        part = table.iloc[p * rows_per_part:(p + 1) * rows_per_part].reset_index(drop = True)
+        part.to_parquet(os.path.join(directory, name), index = False)
+
+
+def generate(output, scale = 1.0, seed = 0, tables = None):
+    """Write all the synthetic inputs of weave.py in `output`.
+
+    Args:
+        output: the data directory to make.
+        scale: multiplies the number of rows of each table.
+        seed: the seed of the random generator, the same seed and scale always give the same files.
+        tables: the names of the files or directories to make, or None to make all of them.
+    """
+    rng = np.random.default_rng(seed)
+    universe = Universe(rng, scale)
+    decider_dir = os.path.join(output, DECIDER)
+    os.makedirs(decider_dir, exist_ok = True)
+
+    def wanted(name):
+        return tables is None or name in tables
+
+    def log(filename, table):
+        logging.info(f"Wrote {len(table)} rows and {len(table.columns)} columns in `{filename}`")
+
+    if wanted("clinical_export.xlsx"):
+        filename = os.path.join(decider_dir, "clinical_export.xlsx")
+        # The first column is an index, see `index_col: 0` in the mappings.
+        table = make_clinical(load_mapping("clinical.yaml", decider_dir), universe)
+        table.to_excel(filename, index = True)
+        log(filename, table)
+
+    for filename, mapping_file, validator_file, nb, renamed in DECIDER_TABLES:
+        if not wanted(filename):
+            continue
+        filename = os.path.join(decider_dir, filename)
+        table = make_table(load_mapping(mapping_file, decider_dir), validator_file, universe, max(1, int(nb * scale)))
+        table = table.rename(columns = renamed)
+        if filename.endswith(".xlsx"):
+            table.to_excel(filename, index = False)
+        else:
+            # DECIDER's CSVs are actually tab-separated.
+            table.to_csv(filename, sep = "\t", index = False)
+        log(filename, table)
+
+    if wanted("HGNC"):
+        filename = os.path.join(output, "HGNC", "hgnc_complete_set.txt")
+        os.makedirs(os.path.dirname(filename), exist_ok = True)
+        table = make_hgnc(universe)
+        table.to_csv(filename, sep = "\t", index = False)
+        log(filename, table)
+
+    if wanted("omnipath_networks"):
+        filename = os.path.join(output, "omnipath_networks", "omnipath_webservice_interactions__latest.tsv.gz")
+        os.makedirs(os.path.dirname(filename), exist_ok = True)
+        table = make_omnipath(universe, int(NB_INTERACTIONS * scale))
+        table.to_csv(filename, sep = "\t", index = False)
+        log(filename, table)
+
+    if wanted("OT"):
+        for name, table in make_open_targets(universe, int(NB_MECHANISMS * scale)).items():
+            directory = os.path.join(output, "OT", name)
+            # The translation tables are read from the first part of the drug molecules only.
+            write_parquet(table, directory, 50000, DRUG_MOLECULE_PART if name == "drug_molecule" else None)
+            log(directory, table)
+
+    # Whatever was generated, keep a record of how.
+    with open(os.path.join(output, "synthetic.json"), "w") as fd:
+        json.dump({"scale": scale, "seed": seed, "patients": len(universe.patients),
+                   "genes": len(universe.genes), "drugs": len(universe.drugs)}, fd, indent = 4)
+
+
+if __name__ == "__main__":
+    usage = f"Generate synthetic versions of the input files of weave.py, laid out as `prepare.sh` does in `data/` (the DECIDER snapshot being in `{DECIDER}/`)."
+    parser = argparse.ArgumentParser(description = usage)
+
+    parser.add_argument("-o", "--output", metavar = "DIR", default = "data_synthetic",
+                        help = "The directory in which to write the data [default: %(default)s].")
+
+    parser.add_argument("-x", "--scale", metavar = "FACTOR", type = float, default = 1.0,
+                        help = "Multiply the number of rows of every table by FACTOR, e.g. 1, 10 or 100 [default: %(default)s].")
+
+    parser.add_argument("-s", "--seed", metavar = "SEED", type = int, default = 0,
+                        help = "Seed of the random generator [default: %(default)s].")
+
+    parser.add_argument("-t", "--tables", metavar = "NAME", nargs = "+",
+                        help = "Only generate the given files (e.g. `cnas_local.csv`) or directories (`HGNC`, `omnipath_networks`, `OT`) [default: all].")
+
+    parser.add_argument("-v", "--verbose", choices = ["DEBUG", "INFO", "WARNING", "ERROR"], default = "INFO",
+                        help = "Set the verbose level [default: %(default)s].")
+
+    asked = parser.parse_args()
+    logging.basicConfig(level = asked.verbose, format = "%(message)s")
+
+    if asked.scale <= 0:
+        logging.error("The scale must be positive.")
+        sys.exit(2)
+
+    generate(asked.output, asked.scale, asked.seed, asked.tables)
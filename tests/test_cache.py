@@ -0,0 +1,132 @@
+""" Cached entries are reused until their sources or parameters change, and can be listed and pruned.
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+
+import pytest
+
+from oncodashkb import cache
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "directory", None)
+    cache.configure(tmp_path / "cache")
+    return tmp_path / "cache"
+
+
+def loader(calls):
+    def build():
+        calls.append(1)
+        return {"built": len(calls)}
+    return build
+
+
+def test_round_trip(tmp_path, cache_dir):
+    source = tmp_path / "source.csv"
+    source.write_text("a,b\n1,2\n")
+    calls = []
+    first = cache.load("table", [source], loader(calls), params = ("sep", ","))
+    assert cache.load("table", [source], loader(calls), params = ("sep", ",")) == first == {"built": 1}
+    assert len(calls) == 1
+
+    [(address, meta, size)] = list(cache.entries(cache_dir))
+    assert address == cache.key("table", [source], repr(("sep", ",")))
+    assert meta["kind"] == "table"
+    assert meta["sources"] == [os.path.realpath(source)]
+    assert size > 0
+    assert not cache.is_stale(meta)
+
+
+def test_invalidation(tmp_path, cache_dir):
+    source = tmp_path / "source.csv"
+    source.write_text("a,b\n1,2\n")
+    calls = []
+    cache.load("table", [source], loader(calls), params = 1)
+
+    # Another parameter, or another kind of entry.
+    assert cache.load("table", [source], loader(calls), params = 2) == {"built": 2}
+    assert cache.load("other", [source], loader(calls), params = 1) == {"built": 3}
+
+    # Changing the content of a source.
+    source.write_text("a,b\n1,2\n3,4\n")
+    assert cache.load("table", [source], loader(calls), params = 1) == {"built": 4}
+    assert cache.load("table", [source], loader(calls), params = 1) == {"built": 4}
+    stale = [meta for address, meta, size in cache.entries(cache_dir) if cache.is_stale(meta)]
+    assert len(stale) == 3
+
+    # The same content, in another file, is the same entry.
+    copy = tmp_path / "copy.csv"
+    copy.write_text(source.read_text())
+    assert cache.load("table", [copy], loader(calls), params = 1) == {"built": 4}
+
+
+def test_directory_source(tmp_path, cache_dir):
+    parts = tmp_path / "parts"
+    parts.mkdir()
+    (parts / "part-0.parquet").write_text("0")
+    calls = []
+    cache.load("parquet", [parts], loader(calls))
+    (parts / "part-1.parquet").write_text("1")
+    cache.load("parquet", [parts], loader(calls))
+    assert len(calls) == 2
+
+
+def test_disabled_and_broken(tmp_path, cache_dir):
+    source = tmp_path / "source.csv"
+    source.write_text("a\n")
+    calls = []
+    cache.load("table", [source], loader(calls))
+    [(address, meta, size)] = list(cache.entries(cache_dir))
+    (cache_dir / f"{address}.pickle").write_bytes(b"not a pickle")
+    assert cache.load("table", [source], loader(calls)) == {"built": 2}
+
+    cache.configure(None)
+    cache.load("table", [source], loader(calls))
+    cache.load("table", [source], loader(calls))
+    assert len(calls) == 4
+    # A missing source is left to the build.
+    cache.configure(cache_dir)
+    assert cache.load("table", [tmp_path / "missing.csv"], loader(calls)) == {"built": 5}
+
+
+def cli(cache_dir, *args):
+    done = subprocess.run([sys.executable, "-m", "oncodashkb.cache", "--directory", str(cache_dir), *args],
+        cwd = ROOT, capture_output = True, text = True, check = True)
+    return done.stdout
+
+
+def test_list_and_prune(tmp_path, cache_dir):
+    sources = {}
+    for name in ["fresh", "stale", "old"]:
+        sources[name] = tmp_path / f"{name}.csv"
+        sources[name].write_text(f"{name}\n")
+        cache.load(name, [sources[name]], lambda: name)
+    sources["stale"].write_text("changed\n")
+    addresses = {meta["kind"]: address for address, meta, size in cache.entries(cache_dir)}
+    meta_file = cache_dir / f"{addresses['old']}.json"
+    meta = json.loads(meta_file.read_text())
+    meta["created"] = time.time() - 30 * 86400
+    meta_file.write_text(json.dumps(meta))
+    (cache_dir / "interrupted.tmp").write_text("")
+
+    listed = {line.split()[1]: line for line in cli(cache_dir, "list").splitlines()}
+    assert set(listed) == {"fresh", "stale", "old"}
+    assert " stale " in listed["stale"] and " ok " in listed["fresh"]
+    assert "30.0 days" in listed["old"]
+
+    cli(cache_dir, "prune", "--stale")
+    assert {meta["kind"] for address, meta, size in cache.entries(cache_dir)} == {"fresh", "old"}
+    assert not (cache_dir / f"{addresses['stale']}.json").exists()
+
+    cli(cache_dir, "prune", "--older-than", "10")
+    assert {meta["kind"] for address, meta, size in cache.entries(cache_dir)} == {"fresh"}
+    assert (cache_dir / "interrupted.tmp").exists()
+
+    cli(cache_dir, "prune")
+    assert os.listdir(cache_dir) == []
@@ -0,0 +1,52 @@
+""" Checkpoints of several records are read back as they were written, for each stage.
+"""
+import os
+
+import pytest
+
+from oncodashkb import checkpoint
+
+# Records share objects, which the pickler's memo would otherwise refer to across records.
+PROPERTIES = {"source": "oncokb", "tags": ["a", "b"]}
+NODES = [(f"n{i}", "patient", PROPERTIES) for i in range(25)]
+EDGES = [(f"e{i}", f"n{i}", f"n{i+1}", "patient_has_sample", PROPERTIES) for i in range(24)]
+
+RECORDS = {
+    "weaving": [("node", NODES[:10]), ("edge", EDGES[:10]), ("node", NODES[10:]), ("edge", EDGES[10:])],
+    "congregation": [("node", [NODES[:2], NODES[2:3]]), ("node", [NODES[3:]]), ("edge", [EDGES[:5], EDGES[5:]])],
+    "fusion": [("node", NODES[:7]), ("node", NODES[7:14]), ("node", NODES[14:21]), ("node", NODES[21:]), ("edge", EDGES)],
+}
+
+
+@pytest.mark.parametrize("stage", checkpoint.STAGES)
+def test_resume(tmp_path, stage):
+    with checkpoint.writing(tmp_path, stage) as save:
+        for kind, tuples in RECORDS[stage]:
+            save(kind, tuples)
+        save("node", [])
+
+    assert list(checkpoint.reading(tmp_path, stage)) == RECORDS[stage]
+    assert list(checkpoint.reading(tmp_path, stage, "edge")) == [r for r in RECORDS[stage] if r[0] == "edge"]
+
+
+def test_save_chunks(tmp_path):
+    with checkpoint.writing(tmp_path, "fusion") as save:
+        checkpoint.save_chunks(save, "node", iter(NODES), size = 10)
+        checkpoint.save_chunks(save, "edge", iter(EDGES), size = 10)
+
+    records = list(checkpoint.reading(tmp_path, "fusion"))
+    assert [len(t) for k, t in records] == [10, 10, 5, 10, 10, 4]
+    assert [t for k, tuples in records if k == "node" for t in tuples] == NODES
+    assert [t for k, tuples in records if k == "edge" for t in tuples] == EDGES
+
+
+def test_failed_stage_keeps_last_checkpoint(tmp_path):
+    with checkpoint.writing(tmp_path, "weaving") as save:
+        save("node", NODES)
+    with pytest.raises(RuntimeError):
+        with checkpoint.writing(tmp_path, "weaving") as save:
+            save("node", NODES[:1])
+            raise RuntimeError("crash")
+
+    assert list(checkpoint.reading(tmp_path, "weaving")) == [("node", NODES)]
+    assert os.listdir(tmp_path) == ["weaving.pickle"]
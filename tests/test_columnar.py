@@ -0,0 +1,57 @@
+""" The columnar backend fuses the same tuples as ontoweaver's Reduce, with the fusers of weave.py.
+"""
+import ontoweaver
+
+from oncodashkb import merge
+from oncodashkb import columnar
+
+SEP = ","
+
+NODES = [
+    ("n1", "patient", {"likely": [], "tags": ["a", "b"], "name": "x"}),
+    ("n2", "sample", {"variant_summary": [], "nMinor": set()}),
+    ("n1", "patient", {"likely": [], "tags": ["b", "c"], "name": "x"}),
+    ("n3", "patient", {"tags": []}),
+    ("n3", "patient", {"tags": ["a"], "name": "y"}),
+    ("n3", "patient", {"tags": [], "name": "z"}),
+    ("n4", "patient", {}),
+    ("n1", "patient", {"tags": "d"}),
+]
+
+EDGES = [
+    ("e1", "n1", "n2", "patient_has_sample", {"likely": [], "score": "1"}),
+    ("e2", "n1", "n2", "patient_has_sample", {"likely": ["yes"], "score": "2"}),
+    ("e1", "n1", "n2", "patient_has_sample", {"score": "1"}),
+    (None, "n3", "n2", "patient_has_sample", {"nMinor": []}),
+    ("e3", "n3", "n2", "patient_has_sample", {}),
+    ("e4", "n1", "n3", "patient_has_sample", {"variant_summary": set()}),
+]
+
+
+def reduced(elem_cls, serializer, fuser_args, tuples):
+    congregater = ontoweaver.congregate.Congregate(elem_cls, serializer)
+    for e in congregater(tuples):
+        pass
+    fuser = ontoweaver.fuse.Members(elem_cls, **fuser_args)
+    return [e.as_tuple() for e in ontoweaver.fusion.Reduce(fuser)(congregater)]
+
+
+def test_nodes_as_reduce():
+    fused = reduced(ontoweaver.base.Node, ontoweaver.serialize.ID(), {
+            "merge_ID": ontoweaver.merge.string.UseKey(),
+            "merge_label": ontoweaver.merge.string.EnsureIdentical(),
+            "merge_prop": merge.Accumulate(SEP),
+        }, NODES)
+    assert sorted(columnar.fuse_nodes(NODES, SEP)) == sorted(fused)
+    assert dict((n[0], n[2]) for n in fused)["n2"] == {"variant_summary": "", "nMinor": ""}
+
+
+def test_edges_as_reduce():
+    fused = reduced(ontoweaver.base.GenericEdge, ontoweaver.serialize.edge.SourceTargetLabel(), {
+            "merge_ID": ontoweaver.merge.string.OrderedSet(SEP),
+            "merge_label": ontoweaver.merge.string.EnsureIdentical(),
+            "merge_prop": merge.Accumulate(SEP),
+            "merge_source": ontoweaver.merge.string.UseLast(),
+            "merge_target": ontoweaver.merge.string.UseLast(),
+        }, EDGES)
+    assert sorted(columnar.fuse_edges(EDGES, SEP)) == sorted(fused)
@@ -0,0 +1,47 @@
+""" Declared classes are saved with the values of their static methods, only if those have no parameter.
+"""
+import io
+import pickle
+
+import pytest
+
+import ontoweaver
+
+from oncodashkb import cache
+from oncodashkb import compiled
+
+
+def declared(name, **static):
+    cls = compiled.declared_class(name, (ontoweaver.base.Node,))
+    for attr, function in static.items():
+        setattr(cls, attr, staticmethod(function))
+    return cls
+
+
+def dumps(obj):
+    fd = io.BytesIO()
+    compiled.Pickler(fd, protocol = pickle.HIGHEST_PROTOCOL).dump(obj)
+    return fd.getvalue()
+
+
+def test_constant_static_methods():
+    cls = declared("compiled_test_node", fields = lambda: ["a", "b"])
+    loaded = pickle.loads(dumps(cls))
+    assert loaded.__name__ == cls.__name__
+    assert loaded.fields() == ["a", "b"]
+
+
+def test_static_method_with_parameters():
+    cls = declared("compiled_test_edge", fields = lambda: ["a"], source_type = lambda x: x)
+    with pytest.raises(pickle.PicklingError, match = "source_type"):
+        dumps(cls)
+
+
+def test_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "directory", None)
+    cache.configure(tmp_path)
+    cls = declared("compiled_test_other", fields = lambda x = 1: [x])
+    source = tmp_path / "mapping.yaml"
+    source.write_text("row: {}\n")
+    assert cache.load("mapping", [str(source)], lambda: cls, pickler = compiled.Pickler) is cls
+    assert not list(tmp_path.glob("*.pickle"))
@@ -0,0 +1,74 @@
+""" Part files compressed by blocks in parallel are gzip files of the lines, and need BioCypher's writer internals.
+"""
+import gzip
+import types
+
+import pytest
+
+from oncodashkb import compress
+
+LINES = [f"n{i};patient;{'x' * (i % 50)}\n" for i in range(5000)]
+
+
+@pytest.fixture
+def configured(monkeypatch):
+    monkeypatch.setattr(compress, "block_size", 4096)
+    monkeypatch.setattr(compress, "stats", {"files": 0, "raw_bytes": 0, "bytes": 0, "seconds": 0.0})
+    compress.configure(6, threads = 3)
+    yield
+    compress.configure(None)
+
+
+@pytest.mark.parametrize("lines", [LINES, LINES[:3], []])
+def test_gzip_chunks(configured, lines):
+    data = b"".join(compress.gzip_chunks(compress.encoded(lines)))
+    assert gzip.decompress(data).decode() == "".join(lines)
+
+
+def test_blocks_are_streamed(configured):
+    blocks = compress.encoded(iter(LINES))
+    chunks = compress.gzip_chunks(blocks)
+    next(chunks)
+    next(chunks)
+    # The first blocks were written before the last ones were encoded.
+    assert len(list(blocks)) > 10
+
+
+class Writer:
+    def __init__(self, outdir):
+        self.outdir = str(outdir)
+        self.parts = {}
+        self.import_call_nodes = {("Patient-header.csv", "Patient-part.*")}
+        self.import_call_edges = set()
+        self.translator = types.SimpleNamespace(name_sentence_to_pascal = lambda label: label.capitalize())
+
+    def _write_next_part(self, label, lines):
+        raise AssertionError("Not compressed.")
+
+    def _construct_import_call(self):
+        return sorted(self.import_call_nodes)
+
+
+def test_write_next_part(configured, tmp_path):
+    writer = Writer(tmp_path)
+    assert compress.use(writer)
+    writer._write_next_part("patient", LINES)
+    writer._write_next_part("patient", LINES[:10])
+    assert writer.parts == {"patient": ["Patient-part000.csv.gz", "Patient-part001.csv.gz"]}
+    assert gzip.decompress((tmp_path / "Patient-part000.csv.gz").read_bytes()).decode() == "".join(LINES)
+    assert writer._construct_import_call() == [("Patient-header.csv", "Patient-part.*.csv.gz")]
+    assert compress.stats["files"] == 2
+    assert compress.stats["raw_bytes"] == len("".join(LINES + LINES[:10]))
+
+
+def test_missing_writer_internals(configured, tmp_path, monkeypatch, caplog):
+    writer = Writer(tmp_path)
+    del writer.parts
+    assert not compress.use(writer)
+    assert "`parts`" in caplog.text
+    with pytest.raises(AssertionError):
+        writer._write_next_part("patient", LINES)
+
+    monkeypatch.setattr(compress, "parse_label", None)
+    assert not compress.use(Writer(tmp_path))
+    assert not compress.use(None)
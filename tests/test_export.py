@@ -0,0 +1,63 @@
+""" Without the expected BioCypher internals, the tuples are written by the calling process.
+"""
+import types
+import importlib.metadata
+
+import pytest
+
+from oncodashkb import export
+
+NODES = [("n1", "patient", {}), ("n2", "patient", {})]
+EDGES = [("e1", "n1", "n2", "patient_has_sample", {})]
+
+
+class FakeBioCypher:
+    """Has the public interface used by the single-process writing only."""
+
+    def __init__(self):
+        self.written = []
+
+    def write_nodes(self, nodes):
+        self.written.append(("node", list(nodes)))
+
+    def write_edges(self, edges):
+        self.written.append(("edge", list(edges)))
+
+
+@pytest.fixture
+def biocypher_version(monkeypatch):
+    version = importlib.metadata.version
+    def set_version(v):
+        monkeypatch.setattr(importlib.metadata, "version", lambda name: v if name == "biocypher" else version(name))
+    return set_version
+
+
+def test_missing_internals(biocypher_version):
+    biocypher_version("0.12.3")
+    bc = FakeBioCypher()
+    assert not export.supported(bc)
+    progress = []
+    export.write(bc, NODES, EDGES, jobs = 4, config = None, progress = lambda: progress.append(1))
+    assert bc.written == [("node", NODES), ("edge", EDGES)]
+    assert len(progress) == len(NODES) + len(EDGES)
+
+
+def test_missing_writer_internals(biocypher_version):
+    biocypher_version("0.16.0")
+    bc = FakeBioCypher()
+    for attr in export.INTERNALS["BioCypher"]:
+        setattr(bc, attr, None)
+    bc._writer = types.SimpleNamespace(**{attr: {} for attr in export.WRITER_STATE})
+    translator = types.SimpleNamespace(_get_ontology_mapping = None, ontology = types.SimpleNamespace())
+    bc._get_translator = lambda: translator
+    assert not export.supported(bc)
+    translator.ontology.mapping = types.SimpleNamespace(extended_schema = {})
+    assert export.supported(bc)
+
+
+@pytest.mark.parametrize("version", ["0.11.0", "0.17.1", "1.0.0", "dev"])
+def test_unsupported_version(biocypher_version, version):
+    biocypher_version(version)
+    bc = FakeBioCypher()
+    export.write(bc, [], EDGES, jobs = 4, config = None)
+    assert bc.written == [("edge", EDGES)]
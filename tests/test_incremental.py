@@ -0,0 +1,40 @@
+""" The woven tuples kept in the cache are rebuilt when a file referenced by the mapping changes.
+"""
+import argparse
+
+import weave
+from oncodashkb import cache
+from oncodashkb import parallel
+
+calls = []
+
+
+def weave_task():
+    calls.append(1)
+    yield [("n1", "patient", {})], []
+
+
+def run(data, mapping):
+    asked = argparse.Namespace(sub_sample = None, sub_sample_seed = None, debug = False)
+    task = weave.incremental(parallel.Task("adapter", weave_task, sources = [data, mapping]), asked)
+    return task()
+
+
+def test_referenced_file_change_misses(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "directory", None)
+    cache.configure(tmp_path / "cache")
+    data = tmp_path / "data.csv"
+    data.write_text("id\n1\n")
+    translations = tmp_path / "translations.csv"
+    translations.write_text("from,to\na,b\n")
+    mapping = tmp_path / "mapping.yaml"
+    mapping.write_text(f"row:\n  map:\n    column: id\n    to_subject: patient\n    translations_file: {translations}\n")
+
+    calls.clear()
+    first = run(str(data), str(mapping))
+    assert run(str(data), str(mapping)) == first
+    assert len(calls) == 1
+
+    translations.write_text("from,to\na,c\nd,e\n")
+    assert run(str(data), str(mapping)) == first
+    assert len(calls) == 2
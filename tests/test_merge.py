@@ -0,0 +1,78 @@
+""" Accumulate and Reduce fuse elements as ontoweaver's Append and Reduce do.
+"""
+import ontoweaver
+
+from oncodashkb import merge
+
+NODES = [
+    ("n1", "patient", {"likely": [], "tags": ["a", "b"], "name": "x"}),
+    ("n1", "patient", {"likely": [], "tags": ["b", "c"], "name": "x"}),
+    ("n2", "patient", {"variant_summary": [], "nMinor": set()}),
+    ("n3", "patient", {"tags": []}),
+    ("n3", "patient", {"tags": ["a"], "name": "y"}),
+    ("n3", "patient", {"tags": [], "name": "z"}),
+    ("n4", "patient", {}),
+]
+
+
+def fused(merger, nodes = NODES, reduce = ontoweaver.fusion.Reduce):
+    congregater = ontoweaver.congregate.Nodes(ontoweaver.serialize.ID())
+    for e in congregater(nodes):
+        pass
+    fuser = ontoweaver.fuse.Members(ontoweaver.base.Node,
+        merge_ID = ontoweaver.merge.string.UseKey(),
+        merge_label = ontoweaver.merge.string.EnsureIdentical(),
+        merge_prop = merger,
+    )
+    return {n.as_tuple()[0]: n.as_tuple()[2] for n in reduce(fuser)(congregater)}
+
+
+def as_sets(nodes):
+    # Append joins the values in the order of a set.
+    return {id: {k: set(v.split(",")) - {""} for k, v in props.items()} for id, props in nodes.items()}
+
+
+def test_as_append():
+    accumulated = fused(merge.Accumulate(","))
+    appended = fused(ontoweaver.merge.dictry.Append(","))
+    assert as_sets(accumulated) == as_sets(appended)
+    # Properties without value are kept, in the order in which values were first seen.
+    assert accumulated == {
+        "n1": {"likely": "", "tags": "a,b,c", "name": "x"},
+        "n2": {"variant_summary": "", "nMinor": ""},
+        "n3": {"tags": "a", "name": "y,z"},
+        "n4": {},
+    }
+
+
+def test_cap_counts_distinct_values():
+    nodes = [("n1", "patient", {"tags": ["a", "b", "c"]})] * 3 + [("n2", "patient", {"tags": ["c", "d", "a"]})] * 2
+    accumulate = merge.Accumulate(",", cap = 1)
+    assert fused(accumulate, nodes) == {"n1": {"tags": "a"}, "n2": {"tags": "c"}}
+    # b and c for n1, d and a for n2.
+    assert accumulate.nb_dropped == 4
+
+
+def test_reduce_as_ontoweaver():
+    assert fused(merge.Accumulate(","), reduce = merge.Reduce) == fused(merge.Accumulate(","))
+    assert fused(ontoweaver.merge.dictry.Append(","), reduce = merge.Reduce) == fused(ontoweaver.merge.dictry.Append(","))
+
+
+class CountGets(merge.Accumulate):
+    gets = 0
+
+    def get(self):
+        CountGets.gets += 1
+        return super().get()
+
+
+def test_reduce_joins_once():
+    hub = [("hub", "gene", {"sample": f"s{i}"}) for i in range(100)]
+    CountGets.gets = 0
+    nodes = fused(CountGets(","), hub, reduce = merge.Reduce)
+    assert nodes["hub"]["sample"].split(",") == [f"s{i}" for i in range(100)]
+    assert CountGets.gets == 1
+    # OntoWeaver's Reduce joins the values again after each merge.
+    CountGets.gets = 0
+    fused(CountGets(","), hub)
+    assert CountGets.gets > 100
@@ -0,0 +1,45 @@
+""" The resolved ontology is kept in the cache only for the BioCypher version that made it.
+"""
+import types
+import importlib.metadata
+
+import weave
+from oncodashkb import cache
+
+
+class FakeBioCypher:
+    def __init__(self, schema):
+        self._ontology = None
+        self._head_ontology = {"url": "https://example.org/head.owl", "root_node": "entity"}
+        self._tail_ontologies = None
+        self._dbms = "neo4j"
+        self._schema_config_path = schema
+        self.built = 0
+
+    def _get_ontology(self):
+        self.built += 1
+        return types.SimpleNamespace(classes = ["entity", "patient"])
+
+
+def test_cached_per_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "directory", None)
+    cache.configure(tmp_path / "cache")
+    schema = tmp_path / "schema.yaml"
+    schema.write_text("patient:\n  represented_as: node\n")
+    bc = FakeBioCypher(str(schema))
+
+    assert weave.ontology(bc).classes == ["entity", "patient"]
+    assert weave.ontology(bc).classes == ["entity", "patient"]
+    assert bc.built == 1
+
+    version = importlib.metadata.version
+    monkeypatch.setattr(importlib.metadata, "version", lambda name: "0.0" if name == "biocypher" else version(name))
+    weave.ontology(bc)
+    assert bc.built == 2
+
+
+def test_missing_internals(tmp_path):
+    bc = FakeBioCypher(str(tmp_path / "schema.yaml"))
+    del bc._head_ontology
+    assert weave.ontology(bc) is None
+    assert bc.built == 0
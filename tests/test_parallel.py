@@ -0,0 +1,84 @@
+""" Tasks and shards of rows are given back in order, whatever the order in which workers finish them.
+"""
+import gc
+import time
+import weakref
+
+import pandas as pd
+import pytest
+
+import weave
+from oncodashkb import parallel
+
+
+class Node:
+    """A node that can be watched with a weak reference."""
+
+    def __init__(self, name):
+        self.name = name
+
+
+def slow_task(name, delay):
+    time.sleep(delay)
+    yield [Node(name)], [name]
+
+
+def tasks():
+    # The first tasks are the slowest, workers finish them last.
+    return [parallel.Task(f"t{i}", slow_task, f"t{i}", 0.1 * (3 - i)) for i in range(4)]
+
+
+@pytest.mark.parametrize("jobs", [1, 2, 4])
+def test_run_in_order(jobs):
+    names = []
+    for task, timed in parallel.run(tasks(), jobs):
+        batches = list(timed)
+        assert [e for n, e in batches] == [[task.name]]
+        names.append(batches[0][0][0].name)
+    assert names == ["t0", "t1", "t2", "t3"]
+
+
+def test_run_releases_results():
+    previous = None
+    for task, timed in parallel.run(tasks(), jobs = 2):
+        gc.collect()
+        # The batches of the previous task were not kept by the pool.
+        assert previous is None or previous() is None
+        node = next(iter(timed))[0][0]
+        previous = weakref.ref(node)
+        del timed, node
+
+
+@pytest.mark.parametrize("nb_rows, nb_shards", [(0, 3), (1, 3), (10, 1), (10, 3), (10, 4), (10, 10), (10, 20), (7, 0)])
+def test_row_shards(nb_rows, nb_shards):
+    bounds = parallel.row_shards(nb_rows, nb_shards)
+    assert len(bounds) <= max(1, nb_shards)
+    # Contiguous chunks, covering all the rows, in order.
+    assert [i for begin, end in bounds for i in range(begin, end)] == list(range(nb_rows))
+    sizes = [end - begin for begin, end in bounds]
+    assert all(size > 0 for size in sizes)
+    assert all(size == sizes[0] for size in sizes[:-1])
+
+
+def test_sharded_as_serial(tmp_path):
+    (tmp_path / "mapping.yaml").write_text("""
+row:
+    map:
+        column: sample
+        to_subject: sample
+transformers:
+    - map:
+        column: patient
+        to_object: patient
+        via_relation: patient_has_sample
+""")
+    mapping = weave.compile_mapping(tmp_path / "mapping.yaml")
+    table = pd.DataFrame({
+        "sample": [f"s{i}" for i in range(23)],
+        "patient": [f"p{i % 5}" for i in range(23)],
+    })
+    serial = list(weave.weave_rows(table, mapping, raise_errors = True))
+    sharded = list(weave.weave_sharded(table, mapping, raise_errors = True, shards = 4))
+    assert len(sharded) == 4
+    assert [x for n, e in sharded for x in n] == [x for n, e in serial for x in n]
+    assert [x for n, e in sharded for x in e] == [x for n, e in serial for x in e]
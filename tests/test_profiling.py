@@ -0,0 +1,161 @@
+""" The profiling report measures what was run, and counting the transformers counts the rows woven.
+"""
+import io
+import json
+
+import pytest
+import pandas as pd
+import ontoweaver
+
+import weave
+from oncodashkb import scan
+from oncodashkb import parallel
+from oncodashkb import profiling
+from oncodashkb import stream
+
+
+def counting_task(rows):
+    profiling.counts["rows"] += rows
+    yield [("n1", "patient", {})] * rows, []
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_task_counts(jobs):
+    tasks = [parallel.Task(f"t{rows}", counting_task, rows) for rows in [3, 5]]
+    for task, timed in parallel.run(tasks, jobs):
+        nodes = [n for batch, e in timed for n in batch]
+        # Counted by the task, in the worker process or in this one.
+        assert timed.counts["rows"] == len(nodes) == int(task.name[1:])
+        assert timed.duration >= 0 and timed.cpu >= 0
+
+
+def test_measures_accumulate():
+    profiler = profiling.Profiler()
+    with profiler.measure("stage", "fuse") as m:
+        kept = [object() for i in range(1000)]
+        m.rows = 1000
+        m.elements = 10
+    first = m.wall
+    with m:
+        pass
+    assert m.wall >= first > 0
+    assert m.blocks >= 1000
+    assert m.peak_rss > 0
+
+    # Times of what was measured elsewhere.
+    adapter = profiler.measure("adapter", "clinical", clocks = False)
+    with adapter:
+        pass
+    assert adapter.wall == 0.0
+    adapter.add(2.0, 1.5)
+    adapter.rows = 100
+    assert adapter.as_dict()["wall_s"] == 2.0
+    assert adapter.as_dict()["rows_per_s"] == 50.0
+    assert adapter.as_dict()["elements_per_s"] is None
+
+
+def test_report_and_save(tmp_path):
+    profiler = profiling.Profiler()
+    with profiler.measure("stage", "write"):
+        pass
+    adapter = profiler.measure("adapter", "oncokb", clocks = False)
+    adapter.add(1.0, 1.0)
+    adapter.rows, adapter.elements = 10, 20
+
+    out = io.StringIO()
+    profiler.report(file = out)
+    lines = out.getvalue().splitlines()
+    # Adapters first, then stages, then the total.
+    assert lines[1].startswith("adapter oncokb") and lines[2].startswith("stage write") and lines[3].startswith("Total")
+
+    profiler.save(tmp_path / "profile.json", jobs = 2)
+    with open(tmp_path / "profile.json") as fd:
+        saved = json.load(fd)
+    assert saved["jobs"] == 2
+    assert [a["name"] for a in saved["adapters"]] == ["oncokb"]
+    assert [s["name"] for s in saved["stages"]] == ["write"]
+    assert saved["adapters"][0]["elements_per_s"] == 20.0
+
+
+def test_timed_feeder():
+    measure = profiling.Measure("stage", "congregate")
+    feeder = profiling.TimedFeeder(stream.Feeder(ontoweaver.congregate.Nodes(ontoweaver.serialize.ID())), measure)
+    feeder.push([("n1", "patient", {}), ("n1", "patient", {}), ("n2", "patient", {})])
+    assert feeder.count == 3
+    assert measure.wall > 0
+    assert len(feeder.close()) == 2
+    assert measure.peak_rss is not None
+
+
+MAPPING = """row:
+    map:
+        column: sample
+        to_subject: sample
+transformers:
+    - split:
+        column: drugs
+        separator: ";"
+        to_object: drug
+        via_relation: sample_has_drug
+    - map:
+        column: site
+        to_property: site
+        for_object: sample
+"""
+
+TABLE = pd.DataFrame({
+    "sample": [f"s{i}" for i in range(12)],
+    "drugs": ["a;b", "c", None, "a;b;c"] * 3,
+    "site": ["ovary", "ascites", "omentum"] * 4,
+})
+
+
+def woven(mapping_file, mapping, shards = 1):
+    batches = list(weave.weave(TABLE, str(mapping_file), shards = shards, mapping = mapping))
+    return [t for n, e in batches for t in n], [t for n, e in batches for t in e]
+
+
+@pytest.fixture
+def mapping_file(tmp_path):
+    (tmp_path / "mapping.yaml").write_text(MAPPING)
+    return tmp_path / "mapping.yaml"
+
+
+def test_counting_disabled(mapping_file, monkeypatch):
+    monkeypatch.setattr(profiling, "transformer_counters", False)
+    mapping = weave.compile_mapping(mapping_file)
+    classes = [type(t) for t in scan.mapping_transformers(mapping)]
+    woven(mapping_file, mapping)
+    assert [type(t) for t in scan.mapping_transformers(mapping)] == classes
+    assert not any(hasattr(t, "counter") or type(t) in profiling.counting_classes.values() for t in scan.mapping_transformers(mapping))
+
+
+@pytest.mark.parametrize("shards", [1, 3])
+def test_counts_rows(mapping_file, monkeypatch, shards):
+    expected = woven(mapping_file, weave.compile_mapping(mapping_file))
+
+    monkeypatch.setattr(profiling, "transformer_counters", True)
+    mapping = weave.compile_mapping(mapping_file)
+    original = [type(t) for t in scan.mapping_transformers(mapping)]
+    # Instrumented transformers weave the same.
+    assert woven(mapping_file, mapping, shards) == expected
+
+    counters = {c.position: c for c in (t.counter for t in scan.mapping_transformers(mapping))}
+    assert set(counters) == {"mapping.yaml:2", "mapping.yaml:6", "mapping.yaml:11"}
+    subject, split, site = counters["mapping.yaml:2"], counters["mapping.yaml:6"], counters["mapping.yaml:11"]
+    assert (subject.name, split.name, site.name) == ("map", "split", "map")
+    assert subject.calls == split.calls == len(TABLE)
+    assert subject.items == len(TABLE)
+    assert split.items == sum(len(d.split(";")) for d in TABLE.drugs.dropna())
+    assert split.columns == "drugs"
+    assert all(c.state()[3] == 0 for c in counters.values())
+
+    # Same names, subclasses of the original classes, instrumented once.
+    for t, cls in zip(scan.mapping_transformers(mapping), original):
+        assert type(t) is profiling.counting_class(cls) and issubclass(type(t), cls)
+        assert type(t).__name__ == cls.__name__
+    assert profiling.instrument(mapping, str(mapping_file)) == []
+
+    out = io.StringIO()
+    profiling.report_transformers(list(counters.values()), file = out)
+    assert "mapping.yaml:6 split" in out.getvalue()
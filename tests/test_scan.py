@@ -0,0 +1,252 @@
+""" Reading only the columns a mapping uses, sampling, filtering and concurrent parquet reading.
+"""
+import os
+import argparse
+
+import yaml
+import pandas as pd
+import pytest
+
+import weave
+from oncodashkb import scan
+
+ADAPTERS = os.path.join(os.path.dirname(__file__), "..", "oncodashkb", "adapters")
+
+# Rows of the OncoKB and CGI tables, with a column used by no mapping.
+ANNOTATIONS = pd.DataFrame({
+    "alteration": ["BRAF V600E", "KRAS G12C", "ERBB2 amp", "BRAF V600E"],
+    "alteration_type": ["SNV", "SNV", "CNA", "SNV"],
+    "gene": ["BRAF", "KRAS", "ERBB2", "BRAF"],
+    "treatment": ["VEMURAFENIB", "SOTORASIB;ADAGRASIB", "TRASTUZUMAB", "DABRAFENIB + TRAMETINIB"],
+    "level_of_evidence": ["LEVEL_1", "LEVEL_2", "LEVEL_1", "LEVEL_3A"],
+    "cgi_level": ["A(FDA)", "B(trials)", "A(FDA)", "C(cases)"],
+    "citations": ["PMID:1;PMID:2", "PMID:3", None, "PMID:4"],
+    "tumorType": ["Melanoma", "Lung", "Breast", "Melanoma"],
+    "approvedIndications": ["x", None, "y", None],
+    "description": ["d1", "d2", None, "d4"],
+    "unused": ["u1", "u2", "u3", "u4"],
+})
+
+DRUGS = pd.DataFrame({
+    "name": ["VEMURAFENIB", "SOTORASIB", "ADAGRASIB", "TRASTUZUMAB", "DABRAFENIB", "TRAMETINIB"],
+    "id": ["CHEMBL1", "CHEMBL2", "CHEMBL3", "CHEMBL4", "CHEMBL5", "CHEMBL6"],
+})
+
+
+def adapter_mapping(tmp_path, name):
+    """Parse a mapping of the project, its translations coming from a small drugs table."""
+    drugs = tmp_path / "drugs.parquet"
+    if not drugs.exists():
+        DRUGS.to_parquet(drugs, engine = "fastparquet")
+
+    def local(node):
+        if isinstance(node, dict):
+            return {k: str(drugs) if k == "translations_file" else local(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [local(v) for v in node]
+        return node
+
+    with open(os.path.join(ADAPTERS, name)) as fd:
+        ymapping = local(yaml.full_load(fd))
+    mapping_file = tmp_path / name
+    mapping_file.write_text(yaml.dump(ymapping))
+    return weave.compile_mapping(str(mapping_file))
+
+
+def woven(table, mapping):
+    nodes, edges = [], []
+    for n, e in weave.weave_rows(table, mapping, raise_errors = True):
+        nodes += n
+        edges += e
+    return nodes, edges
+
+
+@pytest.mark.parametrize("name", ["oncokb.yaml", "cgi.yaml"])
+def test_projection_keeps_type_column(tmp_path, name):
+    mapping = adapter_mapping(tmp_path, name)
+    columns = scan.mapping_columns(mapping)
+    # Read through `match_type_from_column`, and not through any transformer's columns.
+    assert "alteration_type" in columns
+    assert "unused" not in columns
+
+
+@pytest.mark.parametrize("name", ["oncokb.yaml", "cgi.yaml"])
+def test_projected_weave(tmp_path, name):
+    data_file = tmp_path / "annotations.tsv"
+    ANNOTATIONS.to_csv(data_file, sep = "\t", index = False)
+    mapping = adapter_mapping(tmp_path, name)
+
+    usecols = scan.projection(mapping, also = ["treatment"])
+    projected = scan.read_table(data_file, usecols = usecols)
+    assert "unused" in usecols.skipped
+    full = scan.read_table(data_file)
+
+    nodes, edges = woven(projected, mapping)
+    assert (nodes, edges) == woven(full, mapping)
+    assert {n[1] for n in nodes} >= {"short_mutation", "copy_number_amplification"}
+
+
+def write_parts(directory, parts):
+    directory.mkdir()
+    for name, part in parts.items():
+        part.to_parquet(directory / name, engine = "fastparquet", index = False)
+
+
+def test_read_parquet_dir(tmp_path):
+    parts = {
+        "part-00010.parquet": pd.DataFrame({"id": ["k", "l"], "score": [10.0, 11.0], "extra": ["x", "y"]}),
+        "part-00000.parquet": pd.DataFrame({"id": ["a", None, "c"], "score": [0.0, 1.0, 2.0], "extra": ["x", "y", "z"]}),
+        # A part without the `extra` column.
+        "part-00002.parquet": pd.DataFrame({"id": ["e", "f"], "score": [4.0, None]}),
+    }
+    write_parts(tmp_path / "target", parts)
+    (tmp_path / "target" / "_SUCCESS").write_text("")
+
+    df = scan.read_parquet_dir(tmp_path / "target", columns = ["id", "score"], not_null = ["id"], jobs = 3)
+    # In the order of the file names, without the rows lacking an ID, and indexed from 0.
+    assert df.id.tolist() == ["a", "c", "e", "f", "k", "l"]
+    assert df.score.tolist()[:5] == [0.0, 2.0, 4.0, pytest.approx(float("nan"), nan_ok = True), 10.0]
+    assert df.columns.tolist() == ["id", "score"]
+    assert df.index.equals(pd.RangeIndex(6))
+
+    all_columns = scan.read_parquet_dir(tmp_path / "target", jobs = 1)
+    assert len(all_columns) == 7
+    assert all_columns.extra.isna().tolist() == [False] * 3 + [True] * 2 + [False] * 2
+
+
+def test_read_parquet_dir_sampled(tmp_path):
+    ids = [f"t{i}" for i in range(300)]
+    write_parts(tmp_path / "target", {f"part-{p}.parquet": pd.DataFrame({"id": ids[p::3]}) for p in range(3)})
+    sampler = scan.Sampler(30, seed = 1, key = ["id"])
+    df = scan.read_parquet_dir(tmp_path / "target", columns = ["id"], sampler = sampler)
+    # The same keys as when sampling the whole table.
+    assert sorted(df.id) == sorted(sampler(pd.DataFrame({"id": ids})).id)
+    assert df.index.equals(pd.RangeIndex(len(df)))
+
+
+def test_read_parquet_dir_empty(tmp_path):
+    (tmp_path / "empty").mkdir()
+    df = scan.read_parquet_dir(tmp_path / "empty", columns = ["id"])
+    assert df.empty and df.columns.tolist() == ["id"]
+
+
+def old_omnipath_filter(table, symbols):
+    """The filter of OmniPath's interactions, as made on the whole table before `read_filtered`."""
+    table['source_genesymbol'] = table['source_genesymbol'].str.upper()
+    table['target_genesymbol'] = table['target_genesymbol'].str.upper()
+    filtered_table = table[
+        ((table['source_genesymbol'].isin(symbols)) | (table.entity_type_source!="protein")) &
+        ((table['target_genesymbol'].isin(symbols)) | (table.entity_type_target!="protein"))
+    ]
+    return filtered_table[(filtered_table["ncbi_tax_id_source"]==9606) & (filtered_table["ncbi_tax_id_target"]==9606)]
+
+
+@pytest.mark.parametrize("chunksize", [1, 7, 100000])
+def test_read_filtered(tmp_path, chunksize):
+    symbols = pd.Series(["TP53", "EGFR", "MDM2", None])
+    genes = ["tp53", "EGFR", "Mdm2", "NOTAGENE", None]
+    nb = 60
+    interactions = pd.DataFrame({
+        "source_genesymbol": [genes[i % 5] for i in range(nb)],
+        "target_genesymbol": [genes[(i * 3) % 5] for i in range(nb)],
+        "entity_type_source": ["protein" if i % 4 else "complex" for i in range(nb)],
+        "entity_type_target": ["protein" if i % 6 else "mirna" for i in range(nb)],
+        "ncbi_tax_id_source": [9606 if i % 7 else 10090 for i in range(nb)],
+        "ncbi_tax_id_target": [9606 if i % 11 else 10116 for i in range(nb)],
+        "consensus_direction": [i % 2 for i in range(nb)],
+    })
+    data_file = tmp_path / "interactions.tsv.gz"
+    interactions.to_csv(data_file, sep = "\t", index = False)
+
+    expected = old_omnipath_filter(pd.read_table(data_file), symbols).reset_index(drop = True)
+    assert 0 < len(expected) < nb
+
+    filtered, dropped = scan.read_filtered(data_file, weave.omnipath_filters(symbols), chunksize = chunksize,
+        dtype = {"source_genesymbol": str, "target_genesymbol": str})
+    pd.testing.assert_frame_equal(filtered, expected)
+
+    human = (interactions.ncbi_tax_id_source == 9606) & (interactions.ncbi_tax_id_target == 9606)
+    assert dropped == {"Homo sapiens": nb - human.sum(), "HGNC symbols": human.sum() - len(expected)}
+
+
+def test_sampler_same_patients(tmp_path):
+    cohort = "Patient card::Patient cohort code_Patient Card"
+    patients = [f"P{i:03d}" for i in range(200)]
+    clinical = pd.DataFrame({
+        "index": range(len(patients)),
+        cohort: patients,
+        "Patient card::Publication code": [f"pub{i}" for i in range(len(patients))],
+    })
+    clinical.to_excel(tmp_path / "clinical_export.xlsx", index = False)
+
+    with open(os.path.join(ADAPTERS, "template__short_mutations_local.yaml")) as fd:
+        template = fd.read().replace("{{{DECIDER_DIR}}}", str(tmp_path))
+    (tmp_path / "short_mutations.yaml").write_text(template)
+    mutations_mapping = weave.compile_mapping(tmp_path / "short_mutations.yaml")
+    assert scan.subject_columns(mutations_mapping) == ["patient_id"]
+
+    asked = argparse.Namespace(sub_sample = 20.0, sub_sample_seed = 3)
+    clinical_sampler = weave.sub_sampler(asked, None, key = [cohort])
+    mutations_sampler = weave.sub_sampler(asked, mutations_mapping)
+
+    # Several mutations by patient, in another order than the clinical table.
+    mutations = pd.DataFrame({
+        "patient_id": [patients[(i * 7) % len(patients)] for i in range(3 * len(patients))],
+        "mutation": range(3 * len(patients)),
+    })
+    kept = set(clinical_sampler(clinical)[cohort])
+    assert 0 < len(kept) < len(patients)
+    assert set(mutations_sampler(mutations).patient_id) == kept
+    assert set(mutations_sampler(mutations.iloc[::-1]).patient_id) == kept
+
+    # Another seed keeps other patients.
+    asked.sub_sample_seed = 4
+    assert set(weave.sub_sampler(asked, None, key = [cohort])(clinical)[cohort]) != kept
+
+
+def test_engines_same_woven_values(tmp_path):
+    pytest.importorskip("pyarrow")
+    (tmp_path / "mapping.yaml").write_text("""
+row:
+    map:
+        column: sample
+        to_subject: sample
+transformers:
+    - map:
+        column: date
+        to_property: date
+        for_object: sample
+    - map:
+        column: stamp
+        to_property: stamp
+        for_object: sample
+    - map:
+        column: time
+        to_property: time
+        for_object: sample
+    - map:
+        column: mixed
+        to_property: mixed
+        for_object: sample
+    - map:
+        column: count
+        to_property: count
+        for_object: sample
+""")
+    mapping = weave.compile_mapping(tmp_path / "mapping.yaml")
+    data_file = tmp_path / "samples.tsv.gz"
+    pd.DataFrame({
+        "sample": ["s1", "s2", "s3", "s4"],
+        "date": ["2020-01-05", "2021-12-31", None, "2022-02-28"],
+        "stamp": ["2020-01-05 10:00:00", "2021-12-31T00:00:00", None, "2022-02-28 23:59:59"],
+        "time": ["12:30:00", None, "01:00:00", "23:59:59"],
+        "mixed": ["1", "x", "2.5", None],
+        "count": [3, None, 7, 1],
+    }).to_csv(data_file, sep = "\t", index = False)
+
+    usecols = scan.projection(mapping)
+    c = scan.read_table(data_file, usecols = usecols, engine = "c")
+    arrow = scan.read_table(data_file, usecols = usecols, engine = "pyarrow")
+    pd.testing.assert_frame_equal(arrow, c)
+    assert woven(arrow, mapping) == woven(c, mapping)
+    assert "2021-12-31T00:00:00" in str(woven(arrow, mapping))
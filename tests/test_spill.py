@@ -0,0 +1,44 @@
+""" Out-of-core congregation gives the same duplicates as in memory, within its memory budget.
+"""
+import os
+
+import ontoweaver
+
+from oncodashkb import spill
+
+NODES = [(f"n{i % 300}", "patient", {"rank": str(i)}) for i in range(1000)]
+
+
+def groups(congregaters):
+    return sorted(sorted(str(e.as_tuple()) for e in group) for c in congregaters for group in c.duplicates.values())
+
+
+def buckets(directory, budget):
+    nodes = spill.Buckets(ontoweaver.base.Node, ontoweaver.serialize.ID(), str(directory), budget, nb_buckets = 4)
+    nodes.push(NODES)
+    return nodes.close()
+
+
+def test_split_buckets(tmp_path):
+    in_memory = ontoweaver.congregate.Nodes(ontoweaver.serialize.ID())
+    for e in in_memory(NODES):
+        pass
+
+    nodes = buckets(tmp_path, 2**15)
+    assert groups(nodes) == groups([in_memory])
+    assert nodes.splits
+    # Split buckets' files are removed, their tuples are in the new ones.
+    for parent, files in nodes.splits.items():
+        assert not os.path.exists(parent)
+    assert all(os.path.exists(f) for files in nodes.splits.values() for f in files if f not in nodes.splits)
+    # Once split, buckets can be iterated over again.
+    assert groups(nodes) == groups([in_memory])
+
+
+def test_pending_within_budget(tmp_path):
+    budget = 2**15
+    nodes = buckets(tmp_path, budget)
+    assert nodes.flush_size < nodes.chunk_size
+    tuple_bytes = nodes.dumped_bytes / nodes.dumped_tuples
+    assert nodes.nb_buckets * nodes.flush_size * tuple_bytes * spill.EXPANSION <= spill.PENDING_SHARE * budget
+    assert buckets(tmp_path / "large", 2**30).flush_size == nodes.chunk_size
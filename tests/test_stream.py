@@ -0,0 +1,61 @@
+""" Feeding congregaters batch by batch gives the same duplicates and fused graph as congregating whole lists.
+"""
+import ontoweaver
+import pytest
+
+from oncodashkb import merge
+from oncodashkb import stream
+
+NODES = [(f"n{i % 37}", "patient" if i % 37 else "sample", {"rank": str(i % 11), "site": f"s{i % 3}"}) for i in range(500)]
+EDGES = [(None, f"n{i % 37}", f"n{(i * 7) % 37}", "patient_has_sample", {"rank": str(i % 5)}) for i in range(500)]
+
+
+def congregaters():
+    return (ontoweaver.congregate.Nodes(ontoweaver.serialize.ID()),
+            ontoweaver.congregate.Edges(ontoweaver.serialize.edge.SourceTargetLabel()))
+
+
+def groups(congregater):
+    return {str(k): [e.as_tuple() for e in group] for k, group in congregater.duplicates.items()}
+
+
+def fused(congregater, cls):
+    fuser = ontoweaver.fuse.Members(cls,
+        merge_ID = ontoweaver.merge.string.UseKey() if cls is ontoweaver.base.Node else ontoweaver.merge.string.OrderedSet("|"),
+        merge_label = ontoweaver.merge.string.EnsureIdentical(),
+        merge_prop = merge.Accumulate("|"),
+        merge_source = ontoweaver.merge.string.UseLast(),
+        merge_target = ontoweaver.merge.string.UseLast(),
+    )
+    return [e.as_tuple() for e in merge.Reduce(fuser)(congregater)]
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 500])
+def test_feeder_as_batch(batch_size):
+    nodes, edges = congregaters()
+    for e in nodes(NODES):
+        pass
+    for e in edges(EDGES):
+        pass
+
+    nodes_feeder, edges_feeder = (stream.Feeder(c) for c in congregaters())
+    # Nodes and edges pushed alternately, with empty batches.
+    nodes_feeder.push([])
+    for begin in range(0, len(NODES), batch_size):
+        nodes_feeder.push(NODES[begin:begin + batch_size])
+        edges_feeder.push([])
+        edges_feeder.push(EDGES[begin:begin + batch_size])
+    fed_nodes = nodes_feeder.close()
+    fed_edges = edges_feeder.close()
+
+    assert nodes_feeder.count == len(NODES) and edges_feeder.count == len(EDGES)
+    assert groups(fed_nodes) == groups(nodes)
+    assert groups(fed_edges) == groups(edges)
+    assert fed_nodes.types_duplicates == nodes.types_duplicates
+    assert fused(fed_nodes, ontoweaver.base.Node) == fused(nodes, ontoweaver.base.Node)
+    assert fused(fed_edges, ontoweaver.base.GenericEdge) == fused(edges, ontoweaver.base.GenericEdge)
+
+
+def test_feeder_without_push():
+    nodes, edges = congregaters()
+    assert len(stream.Feeder(nodes).close()) == 0
@@ -0,0 +1,51 @@
+""" The vectorized translation of sample IDs gives the same as translating them row by row.
+"""
+import math
+
+import pandas as pd
+
+from oncodashkb.transformers.specific_translate_transformers import translate_sample_ids
+
+TRANSLATE = {"AB12": "PUB1", "CD7": "PUB2"}
+
+# Valid IDs (known and unknown patients), invalid IDs, and missing values.
+CELLS = ["AB12_s1", "AB12_s2", "CD7", "CD7-x_y", "ZZ99_s1", "ab12_s1", "_AB12", "", "12AB", math.nan, None, "AB12_s1", math.nan]
+
+
+def value_maker():
+    return translate_sample_ids.ValueMaker(TRANSLATE, "from", "to", raise_errors = False)
+
+
+def woven(maker):
+    return [list(maker(["sample"], {"sample": cell}, i)) for i, cell in enumerate(CELLS)]
+
+
+def test_translate_cells_as_translate_cell():
+    vectorized = value_maker()
+    vectorized.translate_cells(pd.Series(CELLS, dtype = object))
+    per_row = value_maker()
+    strings = [c for c in CELLS if isinstance(c, str)]
+    assert set(vectorized.translated) == set(strings)
+    for cell in strings:
+        expected = per_row.translate_cell(cell)
+        got = vectorized.translated[cell]
+        if expected is translate_sample_ids.ValueMaker.NOT_AN_ID:
+            assert got is translate_sample_ids.ValueMaker.NOT_AN_ID, cell
+        else:
+            assert got == expected, cell
+
+
+def test_prepared_rows_as_unprepared_rows():
+    prepared = value_maker()
+    prepared.translate_cells(pd.Series(CELLS, dtype = object))
+    assert woven(prepared) == woven(value_maker())
+
+
+def test_translations():
+    rows = woven(value_maker())
+    assert rows[:5] == [["PUB1_s1"], ["PUB1_s2"], ["PUB2"], ["PUB2-x_y"], []]
+    # Invalid IDs and missing values give nothing, and are not kept.
+    assert all(r == [] for r in rows[5:11])
+    maker = value_maker()
+    woven(maker)
+    assert all(isinstance(c, str) for c in maker.translated)
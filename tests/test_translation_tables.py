@@ -0,0 +1,156 @@
+""" The translation transformers share the tables loaded from the same translations file.
+"""
+import os
+
+import yaml
+import pandas as pd
+import pytest
+
+import ontoweaver
+
+import weave
+from oncodashkb.transformers import specific_translate_transformers as stt
+
+DRUGS = pd.DataFrame({
+    "name": ["VEMURAFENIB", "SOTORASIB", "ADAGRASIB", "TRASTUZUMAB"],
+    "id": ["CHEMBL1", "CHEMBL2", "CHEMBL3", "CHEMBL4"],
+})
+
+TABLE = pd.DataFrame({
+    "alteration": ["BRAF V600E", "KRAS G12C", "ERBB2 amp"],
+    "treatment": ["VEMURAFENIB", "SOTORASIB;ADAGRASIB;UNKNOWN", "TRASTUZUMAB"],
+    "drug": ["VEMURAFENIB", "UNKNOWN", "TRASTUZUMAB"],
+})
+
+
+def mapping_file(tmp_path):
+    drugs = tmp_path / "drugs.parquet"
+    DRUGS.to_parquet(drugs, engine = "fastparquet")
+    mapping = tmp_path / "mapping.yaml"
+    mapping.write_text(f"""
+row:
+    map:
+        column: alteration
+        to_subject: short_mutation
+transformers:
+    - translate:
+        column: drug
+        to_object: drug
+        via_relation: variant_biomarker_for_treatment
+        translations_file: {drugs}
+        translate_from: name
+        translate_to: id
+        on_unknown_value: skip
+    - split_translate:
+        column: treatment
+        to_object: drug
+        via_relation: variant_biomarker_for_treatment
+        separator: ";"
+        translations_file: {drugs}
+        translate_from: name
+        translate_to: id
+    - split_translate:
+        column: treatment
+        to_object: treatment
+        via_relation: treatment_has_part_drug
+        separator: ";"
+        translations_file: {drugs}
+        translate_from: name
+        translate_to: id
+""")
+    return mapping
+
+
+def woven(mapping):
+    nodes, edges = [], []
+    for n, e in weave.weave_rows(TABLE, mapping, raise_errors = True):
+        nodes += n
+        edges += e
+    return sorted(nodes), sorted(edges)
+
+
+@pytest.fixture
+def builtins(monkeypatch):
+    """Restore OntoWeaver's transformers after the test."""
+    for name in ["translate", "split_translate"]:
+        monkeypatch.setattr(ontoweaver.transformer, name, getattr(stt, name).__bases__[0])
+    monkeypatch.setattr(stt, "translation_tables", stt.TranslationTables())
+
+
+def test_one_load_for_all_transformers(tmp_path, builtins):
+    mapping = weave.compile_mapping(mapping_file(tmp_path))
+    assert isinstance(mapping[1][0], stt.translate)
+    assert all(isinstance(t, stt.split_translate) for t in mapping[1][1:])
+    assert stt.translation_tables.misses == 1
+    assert stt.translation_tables.hits == 2
+
+
+def test_same_woven_as_ontoweaver(tmp_path, builtins):
+    with open(mapping_file(tmp_path)) as fd:
+        ymapping = yaml.full_load(fd)
+    expected = woven(ontoweaver.mapping.YamlParser(ymapping)())
+
+    got = woven(weave.compile_mapping(tmp_path / "mapping.yaml"))
+    assert got == expected
+    assert "CHEMBL3" in str(got)
+
+
+def test_one_load_for_patients_and_samples(tmp_path, builtins):
+    pd.DataFrame({
+        "index": [0, 1],
+        "Patient card::Patient cohort code_Patient Card": ["AB12", "CD7"],
+        "Patient card::Publication code": ["PUB1", "PUB2"],
+    }).to_excel(tmp_path / "clinical_export.xlsx", index = False)
+    with open(os.path.join(os.path.dirname(__file__), "..", "oncodashkb", "adapters", "template__short_mutations_local.yaml")) as fd:
+        template = fd.read().replace("{{{DECIDER_DIR}}}", str(tmp_path))
+    (tmp_path / "short_mutations.yaml").write_text(template)
+
+    mapping = weave.compile_mapping(tmp_path / "short_mutations.yaml")
+    assert isinstance(mapping[0], stt.translate)
+    assert stt.translation_tables.misses == 1
+    assert stt.translation_tables.hits == 1
+
+
+def iterrows_translations(df, translate_from, translate_to):
+    """The translation dictionary, as it was built row by row."""
+    translate = {}
+    for i, row in df.iterrows():
+        frm = row[translate_from]
+        to = row[translate_to]
+        if frm and to:
+            translate[frm] = to
+    return translate
+
+
+def same(a, b):
+    return a == b or (a != a and b != b)
+
+
+@pytest.mark.parametrize("df", [
+    # Duplicated keys, the last one wins, even after an invalid pair.
+    pd.DataFrame({"frm": ["a", "b", "a", "c", "a", "b"], "to": ["1", "2", "3", "4", "", None]}),
+    # Missing keys and values: NaN is true, None and empty strings are not.
+    pd.DataFrame({"frm": ["a", float("nan"), None, "", "b", float("nan")], "to": [float("nan"), "x", "y", "z", None, "w"]}),
+    # Non-string values, 0 is false.
+    pd.DataFrame({"frm": [1, 2, 0, 3, 2], "to": [10.5, 0.0, 7.0, 1e3, 2.5]}),
+    pd.DataFrame({"frm": ["a", 1, "c", 2.5, "b", "b"], "to": [0, "one", "true", False, ["x"], ["y"]]}),
+])
+def test_build_translations_as_iterrows(df):
+    expected = iterrows_translations(df, "frm", "to")
+    translate, warnings = stt.build_translations(df, "frm", "to")
+
+    # NaN keys never match a cell (each NaN is a distinct key), compare the others.
+    # Integer keys were made floats by iterrows, which match the same cells.
+    keys = [k for k in expected if k == k]
+    assert set(keys) == set(k for k in translate if k == k)
+    for k in keys:
+        assert same(translate[k], expected[k]), k
+
+
+def test_build_translations_warnings():
+    df = pd.DataFrame({"frm": ["a", "b", "a", "c", None], "to": ["1", "2", "3", "", "5"]})
+    translate, warnings = stt.build_translations(df, "frm", "to", "file.csv")
+    assert translate == {"a": "3", "b": "2"}
+    assert len(warnings) == 2
+    assert "2 invalid translations values in file `file.csv`" in warnings[0]
+    assert "1 keys have several translations" in warnings[1] and "`a` => `1`|`3`" in warnings[1]
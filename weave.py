@@ -2,19 +2,38 @@
 import io
 import os
 import sys
+import glob
 import yaml
-import math
+import time
 import logging
 import argparse
+import tempfile
 import traceback
 import subprocess
-
-import pandas as pd
-
-import biocypher
-
-import ontoweaver
-from alive_progress import alive_bar
+import importlib
+import importlib.metadata
+import importlib.util
+
+from oncodashkb import lazy
+from oncodashkb import parallel
+from oncodashkb import stream
+from oncodashkb import cache
+from oncodashkb import checkpoint
+from oncodashkb import profiling
+
+# Heavy modules are imported when first used, so that `--help` is fast,
+# and that only the ones needed by the requested adapters are imported.
+pd = lazy.module("pandas")
+biocypher = lazy.module("biocypher")
+ontoweaver = lazy.module("ontoweaver")
+alive_progress = lazy.module("alive_progress")
+spill = lazy.module("oncodashkb.spill")
+columnar = lazy.module("oncodashkb.columnar")
+merge = lazy.module("oncodashkb.merge")
+scan = lazy.module("oncodashkb.scan")
+compiled = lazy.module("oncodashkb.compiled")
+export = lazy.module("oncodashkb.export")
+compress = lazy.module("oncodashkb.compress")
 
 error_codes = {
     "ParsingError"    :  65, # "data format"
@@ -29,62 +48,124 @@ error_codes = {
     "Exception"       : 255,
 }
 
-# Importing OmniPath custom transformer and registering it.
-from oncodashkb.transformers.networks import OmniPath_directed
-ontoweaver.transformer.register(OmniPath_directed)
-
-# Importing custom transformer for translating sample ids with publication code and registering it.
-from oncodashkb.transformers.specific_translate_transformers import translate_sample_ids, translate_cat_format
-ontoweaver.transformer.register(translate_sample_ids)
-ontoweaver.transformer.register(translate_cat_format)
-
-# Importing OpenTargets custom transformer and registering it.
-from oncodashkb.transformers.ot_transformers import access_proteins, urls_to_prop
-ontoweaver.transformer.register(access_proteins)
-ontoweaver.transformer.register(urls_to_prop)
-
-def progress_read(filename, hint=None, steps=100, estimate_lines=10, sub_sample=100.0, **kwargs):
-    # df = pd.read_csv(filename, nrows=estimate_lines, **kwargs)
-    # estimated_size = len(df.to_csv(index=False))
-    # fsize = os.path.getsize(filename)
-
-    chunks = []
-    if hint:
-        nb_lines = hint
-
-        # How many lines to read at each iteration.
-        if "chunksize" not in kwargs:
-            chunksize = int(math.ceil(nb_lines / steps))
-
-        with alive_bar(steps, file=sys.stderr) as progress:
-            for chunk in pd.read_table(filename, chunksize=chunksize, low_memory=False, **kwargs):
-                chunks.append(chunk)
-                progress()
-    else:
-        if "chunksize" not in kwargs:
-            chunksize = 100
-
-        with alive_bar(file=sys.stderr) as progress:
-            for chunk in pd.read_table(filename, chunksize=chunksize, low_memory=False, **kwargs):
-                chunks.append(chunk)
-                progress()
-
-    df = pd.concat(chunks, axis=0)
+# The modules of the project's custom transformers, which are imported
+# and registered only when a mapping uses them (see `register_transformers`).
+custom_transformers = {
+    # OmniPath.
+    "OmniPath_directed": "oncodashkb.transformers.networks",
+    # Replacing OntoWeaver's ones, to share the translation tables.
+    "translate": "oncodashkb.transformers.specific_translate_transformers",
+    "split_translate": "oncodashkb.transformers.specific_translate_transformers",
+    # Translating sample ids with publication code.
+    "translate_sample_ids": "oncodashkb.transformers.specific_translate_transformers",
+    "translate_cat_format": "oncodashkb.transformers.specific_translate_transformers",
+    # OpenTargets.
+    "access_proteins": "oncodashkb.transformers.ot_transformers",
+    "urls_to_prop": "oncodashkb.transformers.ot_transformers",
+}
 
-    assert 0.0 < sub_sample <=100.0, "sub-sample must be a percentage"
-    if sub_sample < 100.0:
-        df = df.sample(frac=sub_sample/100.0)
+def register_transformers(ymapping):
+    """Import and register the custom transformers used in a loaded YAML mapping."""
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                yield key
+                yield from walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                yield from walk(value)
+
+    for name in set(walk(ymapping)) & set(custom_transformers):
+        transformer = getattr(importlib.import_module(custom_transformers[name]), name)
+        # Some replace OntoWeaver's transformers of the same name.
+        if getattr(ontoweaver.transformer, name, None) is not transformer:
+            ontoweaver.transformer.register(transformer)
+
+# Disabled in worker processes, see `init_worker`.
+show_progress = True
+
+def progress_read(filename, sampler=None, engine="c", **kwargs):
+    """Read a tabular file, showing the progress in bytes read from the disk.
+
+    If a scan.Sampler is given, the file is sampled while being read
+    (by chunks, with the C engine, whatever the asked `engine`).
+    See `scan.read_table` for the other arguments.
+    """
+    with progress_bar(os.path.getsize(filename), unit="B", scale="IEC") as progress:
+        if sampler:
+            df, dropped = scan.read_filtered(filename, [("sub-sample", sampler)], progress, **kwargs)
+            logging.info(f" |  | Sub-sampled {len(df)} rows, out of {len(df) + dropped['sub-sample']}.")
+        else:
+            df = scan.read_table(filename, progress, engine=engine, **kwargs)
 
     return df
 
-def process_table(table, name):
-    logging.info(f" | Weave DECIDER {name}...")
-
-    mapping_file = f"oncodashkb/adapters/{name}.yaml"
-
-    # logging.info(f"Weave structural variants...")
-    logging.info(f" | Weave `{data_file}:{mapping_file}`...")
-
+def sub_sampler(asked, mapping, key = None):
+    """The scan.Sampler asked with `--sub-sample`, or None.
+
+    Rows are sampled on the given key columns,
+    or on the columns of the mapping's subject by default.
+    """
+    if asked.sub_sample >= 100.0:
+        return None
+    return scan.Sampler(asked.sub_sample, asked.sub_sample_seed, key or scan.subject_columns(mapping))
+
+def progress_bar(total = None, **kwargs):
+    """An alive_bar on stderr, silenced in worker processes."""
+    return alive_progress.alive_bar(total, file=sys.stderr, disable=not show_progress, **kwargs)
+
+def init_worker(verbose, cache_dir = None, transformer_counters = False):
+    """Configure a worker process running adapters for `--jobs`."""
+    global show_progress
+    # Several workers drawing progress bars on the same terminal would garble it.
+    show_progress = False
+    logging.basicConfig()
+    logging.getLogger().setLevel(verbose)
+    ontoweaver.logger.setLevel(verbose)
+    cache.configure(cache_dir)
+    profiling.transformer_counters = transformer_counters
+
+def log_peak_memory(stage):
+    own, children = stream.peak_rss()
+    logging.info(f"Peak RSS after {stage}: {own:.0f} MiB (worker processes: {children:.0f} MiB).")
+
+# The internals of BioCypher that `ontology` relies on.
+ONTOLOGY_ATTRIBUTES = ["_ontology", "_get_ontology", "_head_ontology", "_tail_ontologies", "_dbms", "_schema_config_path"]
+
+def ontology(bc):
+    """Return the ontology of a BioCypher instance, from the cache if neither
+    the schema, the ontologies, nor BioCypher changed.
+
+    Resolving the head ontology and extending it with the schema takes
+    longer than a small build.
+
+    Returns None if this version of BioCypher lacks the internals it uses,
+    in which case BioCypher resolves the ontology itself.
+    """
+    version = importlib.metadata.version("biocypher")
+    missing = [attr for attr in ONTOLOGY_ATTRIBUTES if not hasattr(bc, attr)]
+    if missing:
+        logging.warning(f"Cannot keep the ontology in the cache with BioCypher {version}, which lacks `{'`, `'.join(missing)}`.")
+        return None
+
+    def build():
+        onto = bc._get_ontology()
+        if bc._dbms != "owl":
+            # RDF graphs are only needed for exporting the ontology itself, and are large.
+            adapters = [getattr(onto, "_head_ontology", None)] + list((getattr(onto, "_tail_ontologies", None) or {}).values())
+            for adapter in adapters:
+                if adapter is not None:
+                    adapter._rdf_graph = None
+        return onto
+
+    ontologies = [bc._head_ontology or {}] + list((bc._tail_ontologies or {}).values())
+    # Remote ontologies are addressed by their URL.
+    sources = [bc._schema_config_path] + [o["url"] for o in ontologies if os.path.isfile(o.get("url", ""))]
+    # Another version of BioCypher may not load the saved ontology.
+    params = (bc._head_ontology, bc._tail_ontologies, bc._dbms, version)
+    return cache.load("ontology", sources, build, params = params)
+
+def compile_mapping(mapping_file):
     try:
         with open(mapping_file) as fd:
             ymapping = yaml.full_load(fd)
@@ -92,32 +173,131 @@ def process_table(table, name):
         logging.error(e)
         sys.exit(error_codes["CannotAccessFile"])
 
+    register_transformers(ymapping)
+    yparser = ontoweaver.mapping.YamlParser(ymapping)
+    return yparser()
+
+def transformer_files():
+    """List the Python files of the project's transformers."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    return sorted(glob.glob(os.path.join(here, "oncodashkb", "transformers", "*.py")))
+
+def parse_mapping(mapping_file):
+    """Return the parsed mapping, from the cache if neither the mapping,
+    the translations files it references, nor the transformers changed."""
+    start = time.perf_counter()
+    sources = []
+    if cache.directory:
+        # Several transformers may use the same translations file.
+        sources = list(dict.fromkeys([mapping_file] + referenced_files(mapping_file) + transformer_files()))
+    params = (compiled.VERSION, importlib.metadata.version("ontoweaver"))
+    mapping = cache.load("mapping", sources, lambda: compile_mapping(mapping_file), params = params, pickler = compiled.Pickler)
+    duration = time.perf_counter() - start
+    profiling.counts["mapping_s"] += duration
+    logging.info(f" |  | Mapping `{mapping_file}` compiled in {duration:.2f}s.")
+    return mapping
+
+def weave(table, mapping_file, raise_errors = True, shards = 1, mapping = None):
+    """Yield (nodes, edges) batches of BioCypher tuples woven from the table.
+
+    If the mapping has already been parsed from mapping_file, it can be passed as `mapping`.
+    """
     logging.info(f" |  | Process {mapping_file}...")
 
-    yparser = ontoweaver.mapping.YamlParser(ymapping)
-    mapping = yparser()
+    if mapping is None:
+        mapping = parse_mapping(mapping_file)
+
+    profiling.counts["rows"] += len(table)
+
+    counters = None
+    if profiling.transformer_counters:
+        counters = profiling.instrument(mapping, mapping_file)
+
+    if shards > 1 and len(table) > 1:
+        yield from weave_sharded(table, mapping, raise_errors, shards, counters)
+    else:
+        with progress_bar(len(table)) as progress:
+            for n,e in weave_rows(table, mapping, raise_errors):
+                yield n,e
+                progress()
+
+    if counters:
+        logging.info(f" |  | Transformers of {mapping_file}:")
+        profiling.report_transformers(counters)
+
+def weave_rows(table, mapping, raise_errors):
+    """Yield the (nodes, edges) BioCypher tuples woven from each row."""
+    subject_transformer, transformers = mapping[0], mapping[1]
+    for transformer in [subject_transformer, *transformers]:
+        # Some transformers can process whole columns at once, faster than row by row.
+        if hasattr(transformer, "prepare"):
+            transformer.prepare(table)
 
     adapter = ontoweaver.tabular.PandasAdapter(
         table,
         *mapping,
         type_affix="suffix",
         type_affix_sep=":",
-        raise_errors = True
+        raise_errors = raise_errors
     )
 
+    for n,e in adapter():
+        # NOTE: here, n & e are ontoweaver.base.Element, not BioCypher tuples.
+        # Elements' classes are declared on the fly by the mapping parser,
+        # convert to BioCypher tuples so that they can be sent back from a worker process.
+        yield [i.as_tuple() for i in n], [i.as_tuple() for i in e]
+
+    # The adapter keeps its own list of all the tuples it made.
+    del adapter
+
+# What the forked shard workers inherit from the process that parsed the mapping.
+shared = {}
+
+def weave_shard(bounds):
+    begin, end = bounds
     local_nodes = []
     local_edges = []
-    with alive_bar(len(table), file=sys.stderr) as progress:
-        for n,e in adapter():
-            # NOTE: here, n & e are ontoweaver.base.Element, not BioCypher tuples.
-            local_nodes += n
-            local_edges += e
-            progress()
+    for n,e in weave_rows(shared["table"].iloc[begin:end], shared["mapping"], shared["raise_errors"]):
+        local_nodes += n
+        local_edges += e
+    # The transformers' counters of a worker are its own, send them back.
+    return local_nodes, local_edges, [c.state() for c in shared["counters"] or []]
+
+def weave_sharded(table, mapping, raise_errors, shards, counters = None):
+    """Weave contiguous chunks of rows in forked processes.
+
+    Workers inherit the table and the parsed mapping (including the classes it
+    declared) instead of receiving a pickled copy. Shards are yielded in
+    the order of the rows, so that the woven elements come in the same order
+    as in a serial run.
+    """
+    bounds = parallel.row_shards(len(table), shards)
+    logging.info(f" |  | Weave {len(table)} rows in {len(bounds)} shards...")
+
+    shared.update(table = table, mapping = mapping, raise_errors = raise_errors, counters = counters)
+    with parallel.fork_pool(len(bounds), init_worker, (logging.getLogger().level, cache.directory, profiling.transformer_counters)) as executor:
+        # Submit (hence fork) before starting the progress bar's thread.
+        results = executor.map(weave_shard, bounds)
+        shared.clear()
+        with progress_bar(len(bounds)) as progress:
+            for n,e,states in results:
+                for counter, state in zip(counters or [], states):
+                    counter.merge(state)
+                yield n,e
+                progress()
+
+def process_table(table, name, data_file, raise_errors = True, shards = 1, mapping = None):
+    logging.info(f" | Weave DECIDER {name}...")
+
+    mapping_file = f"oncodashkb/adapters/{name}.yaml"
 
-    return local_nodes, local_edges
+    # logging.info(f"Weave structural variants...")
+    logging.info(f" | Weave `{data_file}:{mapping_file}`...")
 
+    return weave(table, mapping_file, raise_errors, shards, mapping = mapping)
 
-def process_OT(directory, name):
+
+def process_OT(directory, name, raise_errors = True, shards = 1, sub_sample = 100.0, seed = 0):
     logging.info(f" | Weave Open Targets {name}...")
 
     mapping_file = f"oncodashkb/adapters/{name}.yaml"
@@ -126,51 +306,270 @@ def process_OT(directory, name):
 
     #TODO check if reading directory is necessary, and the .* option.
     if os.path.isdir(directory):
-        parquet_files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.parquet')]
-        logging.info(f" |  | Concatenating {len(parquet_files)} parquet files...")
-        df = pd.concat([pd.read_parquet(file) for file in parquet_files])
+        # Parse the mapping first, to read only the columns it uses.
+        mapping = parse_mapping(mapping_file)
+        columns = scan.mapping_columns(mapping)
+        logging.info(f" |  | Read {len(columns)} columns from the parquet files...")
+        # Rows without a subject ID would not be woven anyway.
+        subject = scan.subject_columns(mapping)
+        sampler = scan.Sampler(sub_sample, seed, subject) if sub_sample < 100.0 else None
+        df = scan.read_parquet_dir(directory, columns, not_null = subject, sampler = sampler)
 
         logging.debug(f"COLUMNS: {df.columns}")
 
-        logging.info(f" |  | Read {name} mapping...")
-        try:
-            with open(mapping_file) as fd:
-                ymapping = yaml.full_load(fd)
-        except Exception as e:
-            logging.error(e)
-            sys.exit(error_codes["CannotAccessFile"])
-
         # with alive_bar(len(df), file=sys.stderr) as progress:
         #     for n,e in manager():
         #         progress()
 
-        logging.info(f" |  | Process {mapping_file}...")
+        return weave(df, mapping_file, raise_errors, shards, mapping = mapping)
 
-        yparser = ontoweaver.mapping.YamlParser(ymapping)
-        mapping = yparser()
+    else:
+        logging.error(f"`{directory}` is not a directory. I need a directory to be able to load the parquet files within it.")
+        sys.exit(error_codes["FileError"])
+
+###################################################
+# Adapters.
+###################################################
+# Each adapter loads its data, preprocesses it and weaves it.
+# They do not depend on each other, and are module-level functions
+# so that they can run in worker processes (see `--jobs`).
+
+## DECIDER Patient Clinical Data
+
+def weave_clinical(data_file, asked):
+    mapping = parse_mapping("oncodashkb/adapters/clinical.yaml")
+    # The other DECIDER tables are about patients' cohort codes,
+    # sample the same patients.
+    patient = "Patient card::Patient cohort code_Patient Card"
+    sampler = sub_sampler(asked, mapping, key=[patient])
+    usecols = scan.projection(mapping, also=[patient])
+
+    logging.info(f" |  | Load data `{data_file}`...")
+    table = cache.load("excel", [data_file], lambda: pd.read_excel(data_file, usecols=usecols), params=usecols)
+    if usecols:
+        usecols.log(data_file)
+    if sampler:
+        table = sampler(table)
+
+    return process_table(
+        table,
+        name="clinical",
+        data_file=data_file,
+        shards=asked.shards,
+        mapping=mapping,
+    )
 
-        adapter = ontoweaver.tabular.PandasAdapter(
-            df,
-            *mapping,
-            type_affix="suffix",
-            type_affix_sep=":",
-            raise_errors = asked.debug
+def weave_structural_variants(data_file, asked):
+    mapping = parse_mapping("oncodashkb/adapters/structural_variants.yaml")
+    usecols = scan.projection(mapping, also=["mutation"], renamed={"Gene.type":"Gene_type"})
+    sampler = sub_sampler(asked, mapping)
+
+    logging.info(f" |  | Load data `{data_file}`...")
+    table = cache.load("excel", [data_file], lambda: pd.read_excel(data_file, usecols=usecols), params=usecols)
+    if usecols:
+        usecols.log(data_file)
+    if sampler:
+        table = sampler(table)
+
+    # Replace "." by "_" in column names
+    table = table.rename(columns={"Gene.type":"Gene_type"})
+    table["mutation"] = table.mutation.str.replace(r';', ',', regex=True)
+
+    return process_table(
+        table,
+        name="structural_variants",
+        data_file=data_file,
+        shards=asked.shards,
+        mapping=mapping,
+    )
+
+def weave_oncokb_gene_status(data_file, asked):
+    mapping = parse_mapping("oncodashkb/adapters/oncokb_gene_status.yaml")
+    usecols = scan.projection(mapping, also=["Drugs"], renamed={"Gene.type":"Gene_type"})
+
+    logging.info(f" |  | Load data `{data_file}`...")
+    table = progress_read(data_file, sampler = sub_sampler(asked, mapping), engine = asked.csv_engine, usecols = usecols)
+    if usecols:
+        usecols.log(data_file)
+
+    # Replace "." by "_" in column names
+    table_okb = table.rename(columns={"Gene.type":"Gene_type"})
+    # Upper case and remove parentheses and what is inside.
+    table_okb["Drugs"] = table_okb.Drugs.str.upper().str.replace(r'\([^()]*\)', '', regex=True)
+
+    return process_table(
+        table_okb,
+        name = "oncokb_gene_status",
+        data_file=data_file,
+        shards=asked.shards,
+        mapping=mapping,
+    )
+
+def weave_oncokb(data_file, asked):
+    mapping = parse_mapping("oncodashkb/adapters/oncokb.yaml")
+    usecols = scan.projection(mapping, also=["treatment"])
+
+    logging.info(f" |  | Load data `{data_file}`...")
+    table = progress_read(data_file, sampler = sub_sampler(asked, mapping), engine = asked.csv_engine, usecols = usecols)
+    if usecols:
+        usecols.log(data_file)
+
+    # Stripping semicolon at the end of "treatment" 
+    table["treatment"] = table.treatment.str.upper().str.strip(";$")
+
+    return process_table(
+        table,
+        name="oncokb",
+        data_file=data_file,
+        shards=asked.shards,
+        mapping=mapping,
+    )
+
+def weave_cgi(data_file, asked):
+    mapping_file = "./oncodashkb/adapters/cgi.yaml"
+
+    # logging.info(f"Weave structural variants...")
+    logging.info(f" | Weave `{data_file}:{mapping_file}`...")
+    mapping = parse_mapping(mapping_file)
+    usecols = scan.projection(mapping, also=["treatment"])
+
+    logging.info(f" |  | Load data `{data_file}`...")
+    table = progress_read(data_file, sampler = sub_sampler(asked, mapping), engine = asked.csv_engine, usecols = usecols)
+    if usecols:
+        usecols.log(data_file)
+
+    table["treatment"] = table.treatment.str.upper().str.replace(r'\([^()]*\)', '', regex=True)
+
+    return weave(table, mapping_file, raise_errors = True, shards = asked.shards, mapping = mapping)
+
+def omnipath_filters(symbols):
+    """Return the `read_filtered` filters keeping the human interactions between HGNC genes (or non-proteins).
+
+    Args:
+        symbols: the HGNC symbols.
+    """
+    # Unique symbols, the index builds its hash table once for all the chunks.
+    symbols = pd.Index(symbols.dropna().unique())
+
+    # keeping Homo sapiens interactions
+    def homo_sapiens(chunk):
+        return chunk[(chunk["ncbi_tax_id_source"]==9606) & (chunk["ncbi_tax_id_target"]==9606)]
+
+    def in_hgnc(chunk):
+        chunk = chunk.assign(
+            source_genesymbol = chunk['source_genesymbol'].str.upper(),
+            target_genesymbol = chunk['target_genesymbol'].str.upper(),
         )
+        return chunk[
+            ((symbols.get_indexer(chunk['source_genesymbol']) >= 0) | (chunk.entity_type_source!="protein")) &
+            ((symbols.get_indexer(chunk['target_genesymbol']) >= 0) | (chunk.entity_type_target!="protein"))
+        ]
 
-        local_nodes = []
-        local_edges = []
-        with alive_bar(len(df), file=sys.stderr) as progress:
-            for n,e in adapter():
-                # NOTE: here, n & e are ontoweaver.base.Element, not BioCypher tuples.
-                local_nodes += n
-                local_edges += e
-                progress()
+    # Filtering on species first, to upper case only the remaining symbols.
+    return [("Homo sapiens", homo_sapiens), ("HGNC symbols", in_hgnc)]
 
-    else:
-        logging.error(f"`{directory}` is not a directory. I need a directory to be able to load the parquet files within it.")
-        sys.exit(error_codes["FileError"])
+def weave_omnipath_networks(data_file, asked):
+    mapping_file = "./oncodashkb/adapters/omnipath_networks.yaml"
 
-    return local_nodes, local_edges
+    # logging.info(f"Weave OmniPath networks data...")
+    logging.info(f" | Weave `{data_file}:{mapping_file}`...")
+    mapping = parse_mapping(mapping_file)
+    usecols = scan.projection(mapping, also=[
+        "source_genesymbol", "target_genesymbol",
+        "entity_type_source", "entity_type_target",
+        "ncbi_tax_id_source", "ncbi_tax_id_target",
+    ])
+
+    translations_file = "./data/HGNC/hgnc_complete_set.txt"
+    symbols = pd.read_table(translations_file, sep="\t", usecols=["symbol"]).symbol
+
+    sampler = sub_sampler(asked, mapping)
+    sub_sample = [("sub-sample", sampler)] if sampler else []
+
+    logging.info(f" |  | Load and filter data `{data_file}`...")
+    with progress_bar(os.path.getsize(data_file), unit="B", scale="IEC") as progress:
+        filtered_table, dropped = scan.read_filtered(data_file,
+            omnipath_filters(symbols) + sub_sample,
+            progress, usecols = usecols,
+            # A chunk may have only missing symbols, which would otherwise be read as floats.
+            dtype = {"source_genesymbol": str, "target_genesymbol": str})
+    if usecols:
+        usecols.log(data_file)
+    for name, nb in dropped.items():
+        logging.info(f" |  | Filter `{name}` dropped {nb} rows.")
+    logging.info(f" |  | Kept {len(filtered_table)} rows.")
+
+    return weave(filtered_table, mapping_file, raise_errors = asked.debug, shards = asked.shards, mapping = mapping)
+
+## OpenTarget
+
+def weave_open_targets(directory, name, asked):
+    return process_OT(
+        directory,
+        name,
+        raise_errors = asked.debug,
+        shards = asked.shards,
+        sub_sample = asked.sub_sample,
+        seed = asked.sub_sample_seed,
+    )
+
+## Data not requiring special loadings.
+
+def weave_direct(data_file, mapping_file, asked):
+    logging.info(f" | Weave `{data_file}:{mapping_file}`...")
+    mapping = parse_mapping(mapping_file)
+    usecols = scan.projection(mapping)
+
+    logging.info(f" |  | Load data `{data_file}`...")
+    table = progress_read(data_file, sep="\t", sampler = sub_sampler(asked, mapping), engine = asked.csv_engine, usecols = usecols)
+    if usecols:
+        usecols.log(data_file)
+
+    logging.info(f" |  | Transform data...")
+    return weave(table, mapping_file, raise_errors = asked.debug, shards = asked.shards, mapping = mapping)
+
+###################################################
+# Incremental rebuilds.
+###################################################
+# An adapter's woven tuples are kept in the cache, addressed by the content
+# of everything that may change them: its input files, its mapping,
+# the translations files referenced by the mapping, and the code.
+
+def referenced_files(mapping_file):
+    """List the translations files referenced in a mapping file."""
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "translations_file" and isinstance(value, str):
+                    yield value
+                else:
+                    yield from walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                yield from walk(value)
+
+    try:
+        with open(mapping_file) as fd:
+            return list(walk(yaml.full_load(fd)))
+    except OSError:
+        # The adapter will complain.
+        return []
+
+def code_files():
+    """List the Python files that may change what is woven."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    return [os.path.abspath(__file__)] + sorted(glob.glob(os.path.join(here, "oncodashkb", "**", "*.py"), recursive = True))
+
+def weave_incremental(task, params, sources):
+    """Weave a task, or reuse what it wove last time, if none of the given sources changed."""
+    return cache.load("woven", sources, lambda: parallel.collect(task)[0], params = (task.name, params))
+
+def incremental(task, asked):
+    """Wrap a weaving task so that its result is kept in the cache."""
+    mappings = [f for f in task.sources if f.endswith(".yaml")]
+    sources = task.sources + [t for m in mappings for t in referenced_files(m)] + code_files()
+    params = (asked.sub_sample, asked.sub_sample_seed, asked.debug, importlib.metadata.version("ontoweaver"))
+    return parallel.Task(task.name, weave_incremental, task, params, sources, sources = sources)
 
 if __name__ == "__main__":
     # TODO add adapter for parquet, one for csv and one that automatically checks filetype.
@@ -239,8 +638,53 @@ if __name__ == "__main__":
     parser.add_argument("--debug", action="store_true",
                         help=f"If passed, stops on any error.")
 
+    parser.add_argument("-j", "--jobs", metavar="N", type=int, default=1,
+                        help="Run up to N adapters at the same time, each in its own process [default: 1].")
+
+    parser.add_argument("-S", "--shards", metavar="N", type=int, default=1,
+                        help="Split each table in N chunks of rows, woven in parallel processes [default: 1].")
+
+    parser.add_argument("-W", "--writers", metavar="N", type=int, default=1,
+                        help="Write the import files of the labels in N processes at the same time, each label being written by a single process [default: 1, in this process].")
+
+    parser.add_argument("-z", "--gzip", metavar="LEVEL", type=int, choices=range(1, 10),
+                        help="Write the nodes and edges files compressed with gzip at this LEVEL (from 1: fastest, to 9: smallest), blocks of each file being compressed by all the CPUs, and call the import on them [default: not compressed].")
+
+    parser.add_argument("-K", "--cache-dir", metavar="DIR",
+                        help="Keep parsed Excel sheets, translation tables, mappings and the ontology in DIR, and reuse them while their source files do not change [default: no cache]. See `python -m oncodashkb.cache --help` to inspect or prune it.")
+
+    parser.add_argument("-I", "--incremental", action="store_true",
+                        help="Keep what each adapter wove in the cache (see `--cache-dir`), and reuse it as long as the adapter's input files, mapping, translations files and code did not change.")
+
+    parser.add_argument("-k", "--checkpoint-dir", metavar="DIR",
+                        help="Save the state of the build in DIR after the weaving, the congregation and the fusion [default: no checkpoint].")
+
+    parser.add_argument("-R", "--resume-from", metavar="STAGE", choices=checkpoint.STAGES,
+                        help=f"Do not run the stages up to STAGE, but load their result from the checkpoints in `--checkpoint-dir` (STAGE is one of: {', '.join(checkpoint.STAGES)}).")
+
+    parser.add_argument("-M", "--fusion-memory", metavar="MiB", type=int,
+                        help="Congregate and fuse the nodes and edges in chunks using at most (roughly) this memory, the rest being spilled on disk, in TMPDIR [default: all in memory].")
+
+    parser.add_argument("-F", "--fusion-backend", choices=["reduce", "columnar"], default="reduce",
+                        help="Fuse duplicated elements one by one with OntoWeaver (reduce), or all at once with grouped operations on tables (columnar, faster, but properties values are joined in the order they are seen instead of in an arbitrary order) [default: %(default)s].")
+
+    parser.add_argument("-P", "--fusion-cap", metavar="NB", type=int,
+                        help="Keep at most NB distinct values of each property of a fused element, dropping the next ones [default: keep all values].")
+
     parser.add_argument("-a", "--sub-sample", metavar="PERCENT", type=float, default=100.0,
-                        help="Randomly sub sample all processed dataframes before weaving.")
+                        help="Sub sample all processed dataframes while reading them, keeping the rows of PERCENT%% of their subjects (for DECIDER tables: of the patients) [default: %(default)s].")
+
+    parser.add_argument("-e", "--sub-sample-seed", metavar="SEED", type=int, default=0,
+                        help="Change which subjects are kept by `--sub-sample` [default: %(default)s].")
+
+    parser.add_argument("-E", "--csv-engine", choices=["c", "pyarrow"], default="c",
+                        help="Parse the tabular files with pandas' C engine, or with the multi-threaded pyarrow engine (faster on large files, needs the `pyarrow` extra), both giving the same values [default: %(default)s].")
+
+    parser.add_argument("-p", "--profile-report", metavar="FILE",
+                        help="Measure the wall and CPU time, rows, elements, memory and Python allocations of each adapter and of the congregation, fusion and write stages, print them in a table, and save them in FILE, in JSON [default: no report]. Run Python with `-X tracemalloc` to also get the allocated bytes (which is slower).")
+
+    parser.add_argument("-T", "--transformer-counters", action="store_true",
+                        help="Count the calls, emitted items, delayed warnings and time of each transformer of the mappings, and print them at the end of each adapter, the slowest first.")
 
     levels = {
         "DEBUG": logging.DEBUG,
@@ -264,38 +708,30 @@ if __name__ == "__main__":
     biocypher._logger.logger.setLevel(asked.verbose)
     ontoweaver.logger.setLevel(asked.verbose)
 
-    # bc.show_ontology_structure()
+    cache.configure(asked.cache_dir)
+    profiling.transformer_counters = asked.transformer_counters
+    if asked.gzip:
+        # The writers share the CPUs.
+        compress.configure(asked.gzip, max(1, os.cpu_count() // max(1, asked.writers)))
 
-    # Actually extract data.
-    nodes = []
-    edges = []
+    if not 0.0 < asked.sub_sample <= 100.0:
+        logging.error("The `--sub-sample` option must be a percentage.")
+        sys.exit(error_codes["ConfigError"])
 
-    data_mappings = {}
+    if asked.csv_engine == "pyarrow" and not importlib.util.find_spec("pyarrow"):
+        logging.error("The `--csv-engine pyarrow` option needs the pyarrow package, install it with `uv sync --extra pyarrow`.")
+        sys.exit(error_codes["ConfigError"])
 
+    if asked.resume_from and not asked.checkpoint_dir:
+        logging.error("The `--resume-from` option needs a `--checkpoint-dir`.")
+        sys.exit(error_codes["ConfigError"])
+    # Index of the first stage to actually run.
+    resume = checkpoint.STAGES.index(asked.resume_from) + 1 if asked.resume_from else 0
 
-    all_options = [
-        "clinical",
-        "short_mutations_samples",
-        "short_mutations_local",
-        "short_mutations_external",
-        "copy_number_amplifications_samples",
-        "copy_number_amplifications_local",
-        "copy_number_amplifications_external",
-        "structural_variants",
-        "structural_variants_2",
-        "oncokb",
-        "oncokb_gene_status",
-        "omnipath_networks",
-        "open_targets_target",
-        "open_targets_drug_mechanism_of_action",
-        "open_targets_drug_molecule",
-        "cgi",
-    ]
-    opt_total = 0
-    for opt in all_options:
-        if getattr(asked, opt):
-            opt_total += 1
-    opt_loaded = 0
+    # bc.show_ontology_structure()
+
+    # Actually extract data.
+    tasks = []
 
     ###################################################
     # Map the data requiring special loadings         #
@@ -304,256 +740,42 @@ if __name__ == "__main__":
     ## DECIDER Patient Clinical Data
 
     if asked.clinical:
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-
-        data_file = asked.clinical[0]
-
-        logging.info(f" |  | Load data `{data_file}`...")
-        table = pd.read_excel(data_file)
-
-        local_nodes, local_edges = process_table(
-            table,
-            name="clinical",
-        )
-
-        logging.info(f" |  | OK, wove: {len(local_nodes)} nodes, {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
+        tasks.append(parallel.Task("clinical", weave_clinical, asked.clinical[0], asked,
+            sources = [asked.clinical[0], "oncodashkb/adapters/clinical.yaml"]))
 
     if asked.structural_variants:
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-
-        data_file = asked.structural_variants[0]
-
-        logging.info(f" |  | Load data `{data_file}`...")
-        table = pd.read_excel(data_file)
-
-        # Replace "." by "_" in column names
-        table = table.rename(columns={"Gene.type":"Gene_type"})
-        table["mutation"] = table.mutation.str.replace(r';', ',', regex=True)
-
-        local_nodes, local_edges = process_table(
-            table,
-            name="structural_variants",
-        )
-
-        logging.info(f" |  | OK, wove: {len(local_nodes)} nodes, {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
+        tasks.append(parallel.Task("structural_variants", weave_structural_variants, asked.structural_variants[0], asked,
+            sources = [asked.structural_variants[0], "oncodashkb/adapters/structural_variants.yaml"]))
 
     if asked.oncokb_gene_status:
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-
-        data_file = asked.oncokb_gene_status[0]
-
-        logging.info(f" |  | Load data `{data_file}`...")
-        table = progress_read(data_file, hint=72648, sub_sample = asked.sub_sample)
-
-        # Replace "." by "_" in column names
-        table_okb = table.rename(columns={"Gene.type":"Gene_type"})
-        # Upper case and remove parentheses and what is inside.
-        table_okb["Drugs"] = table_okb.Drugs.str.upper().str.replace(r'\([^()]*\)', '', regex=True)
-
-        local_nodes, local_edges = process_table(
-            table_okb,
-            name = "oncokb_gene_status",
-        )
-
-        logging.info(f" |  | OK, wove: {len(local_nodes)} nodes, {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
+        tasks.append(parallel.Task("oncokb_gene_status", weave_oncokb_gene_status, asked.oncokb_gene_status[0], asked,
+            sources = [asked.oncokb_gene_status[0], "oncodashkb/adapters/oncokb_gene_status.yaml"]))
 
     if asked.oncokb:
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-
-        data_file = asked.oncokb[0]
-
-        logging.info(f" |  | Load data `{data_file}`...")
-        table = progress_read(data_file, hint=72648, sub_sample = asked.sub_sample)
-
-        # Stripping semicolon at the end of "treatment" 
-        table["treatment"] = table.treatment.str.upper().str.strip(";$")
-
-        local_nodes, local_edges = process_table(
-            table,
-            name="oncokb",
-        )
-
-        logging.info(f" |  | OK, wove: {len(local_nodes)} nodes, {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
+        tasks.append(parallel.Task("oncokb", weave_oncokb, asked.oncokb[0], asked,
+            sources = [asked.oncokb[0], "oncodashkb/adapters/oncokb.yaml"]))
 
     if asked.cgi:
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-        data_file = asked.cgi[0]
-        mapping_file = "./oncodashkb/adapters/cgi.yaml"
-
-        # logging.info(f"Weave structural variants...")
-        logging.info(f" | Weave `{data_file}:{mapping_file}`...")
-        logging.info(f" |  | Load data `{data_file}`...")
-        table = progress_read(data_file, hint=72648, sub_sample = asked.sub_sample)
-
-        table["treatment"] = table.treatment.str.upper().str.replace(r'\([^()]*\)', '', regex=True)
-
-        try:
-            with open(mapping_file) as fd:
-                ymapping = yaml.full_load(fd)
-        except Exception as e:
-            logging.error(e)
-            sys.exit(error_codes["CannotAccessFile"])
-
-        logging.info(f" |  | Process {mapping_file}...")
-
-        yparser = ontoweaver.mapping.YamlParser(ymapping)
-        mapping = yparser()
-
-        adapter = ontoweaver.tabular.PandasAdapter(
-            table,
-            *mapping,
-            type_affix="suffix",
-            type_affix_sep=":",
-            raise_errors = True
-        )
-
-        local_nodes = []
-        local_edges = []
-        with alive_bar(len(table), file=sys.stderr) as progress:
-            for n,e in adapter():
-                # NOTE: here, n & e are ontoweaver.base.Element, not BioCypher tuples.
-                local_nodes += n
-                local_edges += e
-                progress()
-
-        logging.info(f" |  | OK, wove: {len(local_nodes)} nodes, {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
+        tasks.append(parallel.Task("cgi", weave_cgi, asked.cgi[0], asked,
+            sources = [asked.cgi[0], "./oncodashkb/adapters/cgi.yaml"]))
 
     if asked.omnipath_networks:
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-        data_file = asked.omnipath_networks[0]
-        mapping_file = "./oncodashkb/adapters/omnipath_networks.yaml"
-
-        # logging.info(f"Weave OmniPath networks data...")
-        logging.info(f" | Weave `{data_file}:{mapping_file}`...")
-        logging.info(f" |  | Load data `{data_file}`...")
-        table = progress_read(data_file, hint=890699, sub_sample = asked.sub_sample)
-
-        translations_file = "./data/HGNC/hgnc_complete_set.txt"
-        translations_table = pd.read_table(translations_file, sep="\t")
-
-        table['source_genesymbol'] = table['source_genesymbol'].str.upper()
-        table['target_genesymbol'] = table['target_genesymbol'].str.upper()
-
-        filtered_table = table[
-            ((table['source_genesymbol'].isin(translations_table.symbol)) | (table.entity_type_source!="protein")) & 
-            ((table['target_genesymbol'].isin(translations_table.symbol)) | (table.entity_type_target!="protein"))
-        ]
-
-        # keeping Homo sapiens interactions
-        filtered_table = filtered_table[(filtered_table["ncbi_tax_id_source"]==9606) & (filtered_table["ncbi_tax_id_target"]==9606)]
-
-        try:
-            with open(mapping_file) as fd:
-                ymapping = yaml.full_load(fd)
-        except Exception as e:
-            logging.error(e)
-            sys.exit(error_codes["CannotAccessFile"])
-
-        logging.info(f" |  | Process {mapping_file}...")
-
-        yparser = ontoweaver.mapping.YamlParser(ymapping)
-        mapping = yparser()
-
-        adapter = ontoweaver.tabular.PandasAdapter(
-            filtered_table,
-            *mapping,
-            type_affix="suffix",
-            type_affix_sep=":",
-            raise_errors = asked.debug
-        )
-
-        local_nodes = []
-        local_edges = []
-        with alive_bar(len(filtered_table), file=sys.stderr) as progress:
-            for n,e in adapter():
-                # NOTE: here, n & e are ontoweaver.base.Element, not BioCypher tuples.
-                local_nodes += n
-                local_edges += e
-                progress()
-
-        logging.info(f" |  | OK, wove: {len(local_nodes)} nodes, {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
-
-    ## DECIDER Patient Clinical Data
+        tasks.append(parallel.Task("omnipath_networks", weave_omnipath_networks, asked.omnipath_networks[0], asked,
+            sources = [asked.omnipath_networks[0], "./oncodashkb/adapters/omnipath_networks.yaml", "./data/HGNC/hgnc_complete_set.txt"]))
 
     ## OpenTarget
 
-    ### OpenTargets Drug Molecule
-    if asked.open_targets_drug_molecule:
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-        directory = asked.open_targets_drug_molecule[0]
-        # columns = ["id", "approvedSymbol", "approvedName", 'transcriptIds']
-        name = "open_targets_drug_molecule"
-
-        local_nodes, local_edges = process_OT(
-            directory,
-            name,
-        )
-
-        logging.info(f"OK, wove {name}: {len(local_nodes)} nodes and {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
-
-    ### OpenTargets Drug Mechanims of Action
-    if asked.open_targets_drug_mechanism_of_action:
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-        directory = asked.open_targets_drug_mechanism_of_action[0]
-        # columns = ["id", "approvedSymbol", "approvedName", 'transcriptIds']
-        name = "open_targets_drug_mechanism_of_action"
-
-        local_nodes, local_edges = process_OT(
-            directory,
-            name,
-        )
-
-        logging.info(f"OK, wove {name}: {len(local_nodes)} nodes and {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
-
-    ### OpenTargets targets
-    if asked.open_targets_target:
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-        directory = asked.open_targets_target[0]
-        # columns = ["id", "approvedSymbol", "approvedName", 'transcriptIds']
-        name = "open_targets_target"
-
-        local_nodes, local_edges = process_OT(
-            directory,
-            name,
-        )
-
-        logging.info(f"OK, wove {name}: {len(local_nodes)} nodes and {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
+    open_targets = [
+        "open_targets_drug_molecule",
+        "open_targets_drug_mechanism_of_action",
+        "open_targets_target",
+    ]
+    for name in open_targets:
+        option = getattr(asked, name)
+        if option:
+            # columns = ["id", "approvedSymbol", "approvedName", 'transcriptIds']
+            tasks.append(parallel.Task(name, weave_open_targets, option[0], name, asked,
+                sources = [option[0], f"oncodashkb/adapters/{name}.yaml"]))
 
     ###################################################
     # Map the data not requiring special loadings.    #
@@ -581,50 +803,103 @@ if __name__ == "__main__":
         option = getattr(asked, name)
         if option:
             for file_path in option:
-                data_mappings[file_path] = f"./oncodashkb/adapters/{name}.yaml"
-
-    for data_file, mapping_file in data_mappings.items():
-        opt_loaded += 1
-        logging.info(f"########## Adapter #{opt_loaded}/{opt_total} ##########")
-        logging.info(f" | Weave `{data_file}:{mapping_file}`...")
-        logging.info(f" |  | Load data `{data_file}`...")
-        table = progress_read(data_file, sep="\t", sub_sample = asked.sub_sample)
-
-        try:
-            with open(mapping_file) as fd:
-                ymapping = yaml.full_load(fd)
-        except Exception as e:
-            logging.error(e)
-            sys.exit(error_codes["CannotAccessFile"])
+                mapping_file = f"./oncodashkb/adapters/{name}.yaml"
+                tasks.append(parallel.Task(name, weave_direct, file_path, mapping_file, asked,
+                    sources = [file_path, mapping_file]))
 
-        logging.info(f" |  | Read mapping `{mapping_file}`...")
+    if asked.incremental:
+        if not cache.directory:
+            logging.error("The `--incremental` option needs a `--cache-dir`.")
+            sys.exit(error_codes["ConfigError"])
+        tasks = [incremental(task, asked) for task in tasks]
 
-        yparser = ontoweaver.mapping.YamlParser(ymapping)
-        mapping = yparser()
-
-        adapter = ontoweaver.tabular.PandasAdapter(
-            table,
-            *mapping,
-            type_affix="suffix",
-            type_affix_sep=":",
-            raise_errors = asked.debug
-        )
-
-        logging.info(f" |  | Transform data...")
-        local_nodes = []
-        local_edges = []
-        with alive_bar(len(table), file=sys.stderr) as progress:
-            for n,e in adapter():
-                # NOTE: here, n & e are ontoweaver.base.Element, not BioCypher tuples.
-                local_nodes += n
-                local_edges += e
-                progress()
-        del adapter
-
-        logging.info(f" | OK, wove: {len(local_nodes)} nodes, {len(local_edges)} edges.")
-        nodes += local_nodes
-        edges += local_edges
-        logging.info(f"Done adapter {opt_loaded}/{opt_total}")
+    on_ID = ontoweaver.serialize.ID()
+    on_STL = ontoweaver.serialize.edge.SourceTargetLabel()
+    if asked.fusion_backend == "columnar":
+        if asked.fusion_memory:
+            logging.error("The `columnar` fusion backend does not support `--fusion-memory`.")
+            sys.exit(error_codes["ConfigError"])
+        # Gather the tuples as they come, they are congregated and fused all at once.
+        nodes_feeder = columnar.Table()
+        edges_feeder = columnar.Table()
+    elif asked.fusion_memory:
+        # Partition the tuples in buckets on disk while weaving,
+        # each bucket is then congregated and fused on its own.
+        # Removed at exit, even if the build fails.
+        spill_tmp = tempfile.TemporaryDirectory(prefix = "oncodashkb_fusion_")
+        spill_dir = spill_tmp.name
+        logging.info(f"Fusion in memory chunks of {asked.fusion_memory} MiB, spilled in `{spill_dir}`.")
+        nodes_feeder = spill.Buckets(ontoweaver.base.Node, on_ID, spill_dir, asked.fusion_memory * 2**20)
+        edges_feeder = spill.Buckets(ontoweaver.base.GenericEdge, on_STL, spill_dir, asked.fusion_memory * 2**20)
+        # Iterating over Buckets yields a congregater per bucket.
+        nodes_congregaters = nodes_feeder
+        edges_congregaters = edges_feeder
+    else:
+        # Find duplicates while weaving: each adapter's tuples are congregated
+        # as soon as they are made, instead of being gathered in lists first.
+        nodes_congregaters = [ontoweaver.congregate.Nodes(on_ID)]
+        edges_congregaters = [ontoweaver.congregate.Edges(on_STL)]
+        nodes_feeder = stream.Feeder(nodes_congregaters[0])
+        edges_feeder = stream.Feeder(edges_congregaters[0])
+    # Measure the time spent in congregating, while weaving.
+    profiler = profiling.Profiler()
+    congregation = profiler.measure("stage", "congregate")
+    nodes_feeder = profiling.TimedFeeder(nodes_feeder, congregation)
+    edges_feeder = profiling.TimedFeeder(edges_feeder, congregation)
+    feeders = {"node": nodes_feeder, "edge": edges_feeder}
+
+    if resume == 0:
+        timings = []
+        start = time.perf_counter()
+        with checkpoint.writing(asked.checkpoint_dir, "weaving") as save:
+            for i,(task, batches) in enumerate(parallel.run(tasks, asked.jobs, init_worker, (asked.verbose, cache.directory, profiling.transformer_counters))):
+                logging.info(f"########## Adapter #{i+1}/{len(tasks)}: {task.name} ##########")
+                nb_nodes = nodes_feeder.count
+                nb_edges = edges_feeder.count
+                # Times are the ones of making the batches, not of the congregation.
+                with profiler.measure("adapter", task.name, clocks = False) as measure:
+                    # NOTE: here, n & e are BioCypher tuples.
+                    for n,e in batches:
+                        nodes_feeder.push(n)
+                        edges_feeder.push(e)
+                        save("node", n)
+                        save("edge", e)
+                measure.add(batches.duration, batches.cpu)
+                measure.rows = batches.counts.get("rows")
+                measure.mapping = batches.counts.get("mapping_s")
+                measure.elements = nodes_feeder.count - nb_nodes + edges_feeder.count - nb_edges
+                if batches.peak_rss is not None:
+                    # Of the worker process.
+                    measure.peak_rss = batches.peak_rss
+                logging.info(f" | OK, wove: {nodes_feeder.count - nb_nodes} nodes, {edges_feeder.count - nb_edges} edges, in {batches.duration:.2f}s.")
+                timings.append((task.name, batches.duration))
+        parallel.report(timings, time.perf_counter() - start)
+        # Only accounts for the adapters run in this process, if they translated anything.
+        translations = sys.modules.get(custom_transformers["translate_sample_ids"])
+        if translations:
+            translations.translation_tables.log_stats()
+
+    elif resume == 1:
+        for kind, tuples in checkpoint.reading(asked.checkpoint_dir, "weaving"):
+            feeders[kind].push(tuples)
+
+    elif resume == 2:
+        for kind, groups in checkpoint.reading(asked.checkpoint_dir, "congregation"):
+            for group in groups:
+                feeders[kind].push(group)
+
+    nodes_feeder.close()
+    edges_feeder.close()
+    congregation.elements = nodes_feeder.count + edges_feeder.count
+    log_peak_memory("weaving and congregation")
+
+    if asked.checkpoint_dir and resume < 2 and asked.fusion_backend == "columnar":
+        logging.warning("There is no congregation checkpoint with the `columnar` fusion backend.")
+    elif asked.checkpoint_dir and resume < 2:
+        with checkpoint.writing(asked.checkpoint_dir, "congregation") as save:
+            for kind, congregaters in [("node", nodes_congregaters), ("edge", edges_congregaters)]:
+                checkpoint.save_chunks(save, kind,
+                    ([e.as_tuple() for e in group] for congregater in congregaters for group in congregater.duplicates.values()))
 
     # def in_nodes(node_id, nodes, progress):
     #     for node in nodes:
@@ -645,10 +920,6 @@ if __name__ == "__main__":
     #                 tips_in_nodes = False
     #     assert tips_in_nodes
 
-    # We need BioCypher's nodes and edges tuples, not OntoWeaver classes.
-    bc_nodes = [n.as_tuple() for n in nodes]
-    bc_edges = [e.as_tuple() for e in edges]
-
     # check_all_edges_in_nodes(bc_nodes, bc_edges)
 
 
@@ -656,93 +927,115 @@ if __name__ == "__main__":
     # Fusion.
     ###################################################
 
+    # NOTE: when resuming from the fusion checkpoint, there is nothing to fuse.
     logging.info(f"Reconciliate properties in elements...")
-    # NODES FUSION
+    fusion = profiler.measure("stage", "fuse")
+    fusion.rows = congregation.elements
+    fusion.start()
     fusion_separator = ","
 
-    # Find duplicates
-    on_ID = ontoweaver.serialize.ID()
-    nodes_congregater = ontoweaver.congregate.Nodes(on_ID)
-
-    logging.info(f" | Congregate nodes")
-    with alive_bar(len(bc_nodes), file=sys.stderr) as progress:
-        for n in nodes_congregater(bc_nodes):
-            progress()
-
-    # Fuse them
-    use_key    = ontoweaver.merge.string.UseKey()
-    identicals = ontoweaver.merge.string.EnsureIdentical()
-    in_lists   = ontoweaver.merge.dictry.Append(fusion_separator)
-    node_fuser = ontoweaver.fuse.Members(ontoweaver.base.Node,
-            merge_ID    = use_key,
-            merge_label = identicals,
-            merge_prop  = in_lists,
-        )
+    if asked.fusion_backend == "columnar":
+        logging.info(f" | Fuse nodes")
+        fnodes = columnar.fuse_nodes(nodes_feeder.tuples, fusion_separator, asked.fusion_cap)
+        logging.info(f" | Fuse edges")
+        fedges = columnar.fuse_edges(edges_feeder.tuples, fusion_separator, asked.fusion_cap)
 
-    nodes_fusioner = ontoweaver.fusion.Reduce(node_fuser)
-    fnodes = set()
-    logging.info(f" | Fuse nodes")
-    with alive_bar(len(nodes_congregater), file=sys.stderr) as progress:
-        for n in nodes_fusioner(nodes_congregater):
-            fnodes.add(n)
-            progress()
-
-    ID_mapping = node_fuser.ID_mapping
-
-    # EDGES REMAP
-    # If we use on_ID/use_key,
-    # we shouldn't have any need to remap sources and target IDs in edges.
-    assert(len(ID_mapping) == 0)
-    # If one change this, you may want to remap like this:
-    # if len(ID_mapping) > 0:
-    #     remaped_edges = []
-    #     logging.info(f" | Remap edges")
-    #     with alive_bar(len(bc_edges), file=sys.stderr) as progress:
-    #         for e in ontoweaver.fusion.remap_edges(bc_edges, ID_mapping):
-    #             remaped_edges.append(e)
-    #             progress()
-    #     # logger.debug("Remaped edges:")
-    #     # for n in remaped_edges:
-    #     #     logger.debug("\t"+repr(n))
-    # else:
-    #     remaped_edges = bc_edges
-
-    # EDGES FUSION
-    # Find duplicates
-    on_STL = ontoweaver.serialize.edge.SourceTargetLabel()
-    edges_congregater = ontoweaver.congregate.Edges(on_STL)
-
-    logging.info(f" | Congregate edges")
-    with alive_bar(len(bc_edges), file=sys.stderr) as progress:
-        for e in edges_congregater(bc_edges):
-            progress()
-
-    # Fuse them
-    set_of_ID       = ontoweaver.merge.string.OrderedSet(fusion_separator)
-    identicals      = ontoweaver.merge.string.EnsureIdentical()
-    in_lists        = ontoweaver.merge.dictry.Append(fusion_separator)
-    use_last_source = ontoweaver.merge.string.UseLast()
-    use_last_target = ontoweaver.merge.string.UseLast()
-    edge_fuser = ontoweaver.fuse.Members(ontoweaver.base.GenericEdge,
-            merge_ID     = set_of_ID,
-            merge_label  = identicals,
-            merge_prop   = in_lists,
-            merge_source = use_last_source,
-            merge_target = use_last_target
-        )
-
-    edges_fusioner = ontoweaver.fusion.Reduce(edge_fuser)
-    fedges = set()
-    logging.info(f" | Fuse edges")
-    with alive_bar(len(edges_congregater), file=sys.stderr) as progress:
-        for e in edges_fusioner(edges_congregater):
-            fedges.add(e)
-            progress()
-
-    f_nodes = [n.as_tuple() for n in fnodes]
-    f_edges = [e.as_tuple() for e in fedges]
+    else:
+        # NODES FUSION
+
+        # Fuse them
+        use_key    = ontoweaver.merge.string.UseKey()
+        identicals = ontoweaver.merge.string.EnsureIdentical()
+        node_props = merge.Accumulate(fusion_separator, asked.fusion_cap)
+        node_fuser = ontoweaver.fuse.Members(ontoweaver.base.Node,
+                merge_ID    = use_key,
+                merge_label = identicals,
+                merge_prop  = node_props,
+            )
+
+        nodes_fusioner = merge.Reduce(node_fuser)
+        if asked.fusion_memory:
+            fnodes = spill.Spool(os.path.join(spill_dir, "fused_nodes.pickle"))
+        else:
+            fnodes = []
+        logging.info(f" | Fuse nodes")
+        with progress_bar(None if asked.fusion_memory else len(nodes_congregaters[0])) as progress:
+            for congregater in nodes_congregaters:
+                for n in nodes_fusioner(congregater):
+                    fnodes.append(n.as_tuple())
+                    progress()
+        node_props.log_dropped("nodes")
+
+        ID_mapping = node_fuser.ID_mapping
+
+        # EDGES REMAP
+        # If we use on_ID/use_key,
+        # we shouldn't have any need to remap sources and target IDs in edges.
+        assert(len(ID_mapping) == 0)
+        # If one change this, you may want to remap like this:
+        # if len(ID_mapping) > 0:
+        #     remaped_edges = []
+        #     logging.info(f" | Remap edges")
+        #     with progress_bar(len(bc_edges)) as progress:
+        #         for e in ontoweaver.fusion.remap_edges(bc_edges, ID_mapping):
+        #             remaped_edges.append(e)
+        #             progress()
+        #     # logger.debug("Remaped edges:")
+        #     # for n in remaped_edges:
+        #     #     logger.debug("\t"+repr(n))
+        # else:
+        #     remaped_edges = bc_edges
+
+        # EDGES FUSION
+        # Fuse them
+        set_of_ID       = ontoweaver.merge.string.OrderedSet(fusion_separator)
+        identicals      = ontoweaver.merge.string.EnsureIdentical()
+        edge_props      = merge.Accumulate(fusion_separator, asked.fusion_cap)
+        use_last_source = ontoweaver.merge.string.UseLast()
+        use_last_target = ontoweaver.merge.string.UseLast()
+        edge_fuser = ontoweaver.fuse.Members(ontoweaver.base.GenericEdge,
+                merge_ID     = set_of_ID,
+                merge_label  = identicals,
+                merge_prop   = edge_props,
+                merge_source = use_last_source,
+                merge_target = use_last_target
+            )
+
+        edges_fusioner = merge.Reduce(edge_fuser)
+        if asked.fusion_memory:
+            fedges = spill.Spool(os.path.join(spill_dir, "fused_edges.pickle"))
+        else:
+            fedges = []
+        logging.info(f" | Fuse edges")
+        with progress_bar(None if asked.fusion_memory else len(edges_congregaters[0])) as progress:
+            for congregater in edges_congregaters:
+                for e in edges_fusioner(congregater):
+                    fedges.append(e.as_tuple())
+                    progress()
+        edge_props.log_dropped("edges")
+
+    # Duplicates are not needed anymore.
+    del feeders, nodes_feeder, edges_feeder
+    if asked.fusion_backend != "columnar":
+        del nodes_congregaters, edges_congregaters
+    fusion.elements = len(fnodes) + len(fedges)
+    fusion.stop()
+    log_peak_memory("fusion")
+
+    if resume < 3:
+        if asked.checkpoint_dir:
+            with checkpoint.writing(asked.checkpoint_dir, "fusion") as save:
+                checkpoint.save_chunks(save, "node", fnodes)
+                checkpoint.save_chunks(save, "edge", fedges)
+
+        nb_nodes, f_nodes = len(fnodes), fnodes
+        nb_edges, f_edges = len(fedges), fedges
+    else:
+        f_nodes = [t for kind, tuples in checkpoint.reading(asked.checkpoint_dir, "fusion", "node") for t in tuples]
+        f_edges = [t for kind, tuples in checkpoint.reading(asked.checkpoint_dir, "fusion", "edge") for t in tuples]
+        nb_nodes, nb_edges = len(f_nodes), len(f_edges)
 
-    logging.info(f"Fused into {len(f_nodes)} nodes and {len(f_edges)} edges.")
+    logging.info(f"Fused into {nb_nodes} nodes and {nb_edges} edges.")
 
     # check_all_edges_in_nodes(f_nodes, f_edges)
 
@@ -751,13 +1044,44 @@ if __name__ == "__main__":
     ###################################################
 
     logging.info(f"Write the final SKG into files...")
-    if nodes:
-        bc.write_nodes(f_nodes)
-    if edges:
-        bc.write_edges(f_edges)
-    #bc.summary()
-    import_file = bc.write_import_call()
+    with profiler.measure("stage", "write") as measure:
+        start = time.perf_counter()
+        # Set BioCypher's ontology, instead of letting it build it.
+        onto = ontology(bc)
+        if onto is not None:
+            bc._ontology = onto
+        logging.info(f" | Ontology ready in {time.perf_counter() - start:.2f}s.")
+        measure.rows = measure.elements = nb_nodes + nb_edges
+        # Otherwise, BioCypher makes its writer when it first writes.
+        if hasattr(bc, "_initialize_writer"):
+            bc._initialize_writer()
+        compress.use(getattr(bc, "_writer", None))
+        if asked.writers > 1:
+            # Empties the lists while writing.
+            with progress_bar(nb_nodes + nb_edges) as progress:
+                export.write(bc, f_nodes, f_edges, asked.writers, asked.config, progress = progress)
+        else:
+            if nb_nodes:
+                bc.write_nodes(f_nodes)
+            if nb_edges:
+                bc.write_edges(f_edges)
+        #bc.summary()
+        import_file = bc.write_import_call()
+    # The import script is written with the other files, in BioCypher's output directory.
+    written = [e.stat().st_size for e in os.scandir(os.path.dirname(os.path.abspath(import_file))) if e.is_file()]
+    logging.info(f" | Wrote {sum(written) / 2**20:.1f} MiB in {len(written)} files.")
+    compress.report()
     logging.info(f"OK, wrote files.")
+    log_peak_memory("export")
+
+    if asked.profile_report:
+        profiler.report()
+        profiler.save(asked.profile_report, command = sys.argv, jobs = asked.jobs, shards = asked.shards,
+            fusion_backend = asked.fusion_backend, written_bytes = sum(written), compression = compress.stats)
+        logging.info(f"Saved the profiling report in `{asked.profile_report}`.")
+
+    if asked.fusion_memory:
+        spill_tmp.cleanup()
 
     # Print on stdout for other scripts to get.
     print(import_file)